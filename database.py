@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert, select
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from contextlib import contextmanager
+from datetime import datetime
 import os
+import queue
+import threading
+import time
+import uuid
 
 # Import all models
 from src.models.user import User
@@ -14,15 +19,62 @@ from src.models.user import Base
 # Database URL - SQLite for development, PostgreSQL for production
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ai_generator.db")
 
+# Connection pool settings for the server (PostgreSQL) path
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Write-behind generation log settings
+GENERATION_LOG_FLUSH_SIZE = int(os.getenv("GENERATION_LOG_FLUSH_SIZE", "50"))
+GENERATION_LOG_FLUSH_INTERVAL = float(os.getenv("GENERATION_LOG_FLUSH_INTERVAL", "2.0"))
+GENERATION_LOG_QUEUE_SIZE = int(os.getenv("GENERATION_LOG_QUEUE_SIZE", "10000"))
+
+
+def _is_memory_sqlite(url):
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
 # Create engine with appropriate configuration
 if DATABASE_URL.startswith("sqlite"):
+    if _is_memory_sqlite(DATABASE_URL):
+        # In-memory databases only exist on a single connection
+        engine = create_engine(
+            DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+    else:
+        # File databases get a real pool so sessions are not serialized
+        # onto one connection; WAL lets readers run alongside the writer
+        engine = create_engine(
+            DATABASE_URL,
+            connect_args={"check_same_thread": False, "timeout": 30},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not _is_memory_sqlite(DATABASE_URL):
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")   # safe with WAL, far fewer fsyncs
+        cursor.execute("PRAGMA busy_timeout=5000")    # wait for the writer instead of failing
+        cursor.execute("PRAGMA cache_size=-16000")    # ~16 MB page cache
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+else:
     engine = create_engine(
         DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True
     )
-else:
-    engine = create_engine(DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -31,6 +83,10 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
+    # create_all() skips indexes on tables that already exist
+    for index in GenerationLog.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
 @contextmanager
 def get_db():
     """Database session context manager"""
@@ -42,4 +98,136 @@ def get_db():
 
 def get_db_session() -> Session:
     """Get database session"""
-    return SessionLocal()
\ No newline at end of file
+    return SessionLocal()
+
+
+# ======================================================
+# WRITE-BEHIND GENERATION LOGGING
+# ======================================================
+class GenerationLogWriter:
+    """
+    Batches GenerationLog inserts through a background thread.
+
+    log() only puts a row on an in-memory queue, so callers on the render
+    path never wait on the database. The writer flushes when `flush_size`
+    rows are pending or every `flush_interval` seconds, whichever is first.
+    """
+
+    def __init__(self, flush_size=GENERATION_LOG_FLUSH_SIZE,
+                 flush_interval=GENERATION_LOG_FLUSH_INTERVAL,
+                 max_queue_size=GENERATION_LOG_QUEUE_SIZE):
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self.dropped = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="generation-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stop the writer and flush whatever is still queued."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def log(self, user_id, keyword, status, num_pages=None, duration=None,
+            video_url=None, credits_used=1, donation_amount=0.0):
+        """Queue a generation log row. Never blocks; drops the row if the queue is full."""
+        row = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "keyword": keyword,
+            "num_pages": num_pages,
+            "duration": duration,
+            "status": status,
+            "video_url": video_url,
+            "credits_used": credits_used,
+            "donation_amount": donation_amount,
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ Generation log queue full, dropped entry ({self.dropped} total)")
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        pending = []
+
+        while not self._stop.is_set():
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                pending.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if len(pending) >= self.flush_size or time.monotonic() >= deadline:
+                self._flush(pending)
+                pending = []
+                deadline = time.monotonic() + self.flush_interval
+
+        # Final drain on shutdown
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(pending) >= self.flush_size:
+                self._flush(pending)
+                pending = []
+        self._flush(pending)
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(GenerationLog), rows)
+        except Exception as e:
+            print(f"⚠️ Failed to write {len(rows)} generation log rows: {e}")
+
+
+generation_log_writer = GenerationLogWriter()
+
+
+def log_generation(**kwargs):
+    """Queue a generation log row on the shared write-behind writer."""
+    generation_log_writer.log(**kwargs)
+
+
+# ======================================================
+# GENERATION LOG QUERIES (served by the composite indexes)
+# ======================================================
+def get_user_generation_history(user_id, limit=50, before=None):
+    """Most recent generations for a user, newest first."""
+    stmt = select(GenerationLog).where(GenerationLog.user_id == user_id)
+    if before is not None:
+        stmt = stmt.where(GenerationLog.created_at < before)
+    stmt = stmt.order_by(GenerationLog.created_at.desc()).limit(limit)
+
+    with get_db() as db:
+        return list(db.scalars(stmt))
+
+
+def get_generations_between(start, end, user_id=None):
+    """Generations created in [start, end), optionally for one user."""
+    stmt = select(GenerationLog).where(
+        GenerationLog.created_at >= start,
+        GenerationLog.created_at < end
+    )
+    if user_id is not None:
+        stmt = stmt.where(GenerationLog.user_id == user_id)
+    stmt = stmt.order_by(GenerationLog.created_at)
+
+    with get_db() as db:
+        return list(db.scalars(stmt))
@@ -0,0 +1,311 @@
+# load_test.py
+"""
+HTTP load test for the API (/generate, /generate/batch, /download-video, /static).
+
+Examples:
+    # Against a running server
+    python load_test.py --url http://localhost:8000 --concurrency 8 --requests 200
+
+    # Spawn a throwaway server with Chromium and ffmpeg stubbed out (any CI box)
+    python load_test.py --spawn --stubs all --concurrency 16 --duration 60 \\
+        --mix generate=1,download=2,static=4
+
+    # Batches of 8 keywords (the spawned server stubs the batch browser too)
+    python load_test.py --spawn --mix batch=1 --batch-size 8 --requests 20
+
+Stub stages are selected with PIPELINE_STUBS (see src/utils/pipeline_stubs.py);
+--spawn sets it for the child server. Only the standard library is used.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+OPERATIONS = ("generate", "batch", "download", "static")
+
+
+# =============================
+# 1. REQUESTS
+# =============================
+def http_request(url, data=None, timeout=300):
+    """Return (status, body_bytes). HTTP errors are returned, not raised."""
+    headers = {}
+    if data is not None:
+        data = json.dumps(data).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data=data, headers=headers, method="POST" if data is not None else "GET")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+class LoadTest:
+    def __init__(self, base_url, mix, payload, timeout, batch_size=4):
+        self.base_url = base_url.rstrip("/")
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.payload = payload
+        self.timeout = timeout
+        self.batch_size = batch_size
+
+        self.lock = threading.Lock()
+        self.results = {op: [] for op in OPERATIONS}   # (latency, status, error)
+        self.videos = []                               # (user_id, static path) of finished jobs
+
+    def _record(self, op, latency, status, error=None):
+        with self.lock:
+            self.results[op].append((latency, status, error))
+
+    def _pick_video(self):
+        with self.lock:
+            return random.choice(self.videos) if self.videos else None
+
+    def generate(self):
+        status, body = http_request(f"{self.base_url}/generate", self.payload, self.timeout)
+        if status == 200:
+            data = json.loads(body)
+            with self.lock:
+                self.videos.append((data["user_id"], urlsplit(data["video_url"]).path))
+        return status
+
+    def batch(self):
+        """One /generate/batch call. Returns (status, error); a failed item line is an error."""
+        items = [{**self.payload, "keyword": f"{self.payload['keyword']} {i}"} for i in range(self.batch_size)]
+        status, body = http_request(f"{self.base_url}/generate/batch", {"items": items}, self.timeout)
+        if status != 200:
+            return status, f"HTTP {status}"
+        results = [json.loads(line) for line in body.splitlines() if line.strip()]
+        with self.lock:
+            self.videos.extend((r["user_id"], urlsplit(r["video_url"]).path)
+                               for r in results if r.get("status") == "success")
+        failed = len(items) - sum(r.get("status") == "success" for r in results)
+        return status, f"{failed} item(s) failed" if failed else None
+
+    def download(self):
+        video = self._pick_video()
+        if not video:
+            return self.generate(), "generate"
+        status, _ = http_request(f"{self.base_url}/download-video/{video[0]}", timeout=self.timeout)
+        return status, "download"
+
+    def static(self):
+        video = self._pick_video()
+        if not video:
+            return self.generate(), "generate"
+        status, _ = http_request(f"{self.base_url}{video[1]}", timeout=self.timeout)
+        return status, "static"
+
+    def run_one(self):
+        op = random.choices(self.ops, self.weights)[0]
+        start = time.perf_counter()
+        try:
+            if op == "batch":
+                status, error = self.batch()
+            else:
+                if op == "generate":
+                    status = self.generate()
+                else:
+                    # Falls back to /generate until there is something to fetch
+                    status, op = getattr(self, op)()
+                error = None if 200 <= status < 300 else f"HTTP {status}"
+        except Exception as e:
+            status, error = None, type(e).__name__
+        self._record(op, time.perf_counter() - start, status, error)
+
+    def run(self, concurrency, total_requests=None, duration=None):
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [total_requests]
+
+        def take_ticket():
+            if deadline is not None:
+                return time.perf_counter() < deadline
+            with self.lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def client():
+            while take_ticket():
+                self.run_one()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(client)
+        return time.perf_counter() - start
+
+
+# =============================
+# 2. REPORT
+# =============================
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(s[0] for s in samples)
+    errors = sum(1 for s in samples if s[2])
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+        "statuses": dict(Counter(str(s[1] if s[1] is not None else s[2]) for s in samples)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def build_report(test, elapsed):
+    every = [s for samples in test.results.values() for s in samples]
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "total": summarize(every, elapsed),
+        "operations": {op: summarize(samples, elapsed) for op, samples in test.results.items() if samples},
+    }
+
+
+def print_report(report):
+    print(f"\n📈 Load test finished in {report['elapsed_seconds']}s")
+    header = f"{'operation':<10} {'reqs':>6} {'rps':>8} {'err%':>7} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9}  statuses"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["operations"].items()) + [("TOTAL", report["total"])]
+    for op, s in rows:
+        print(f"{op:<10} {s['requests']:>6} {s['throughput_rps']:>8} {s['error_rate'] * 100:>6.1f}% "
+              f"{_fmt(s['p50_ms']):>9} {_fmt(s['p95_ms']):>9} {_fmt(s['p99_ms']):>9}  {s['statuses']}")
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+# =============================
+# 3. OPTIONAL SPAWNED SERVER
+# =============================
+def spawn_server(port, stubs, storage_root):
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "PIPELINE_STUBS": stubs,
+        "STORAGE_ROOT": storage_root,
+        # Keep the run's users, jobs and logs out of the real databases
+        "DATABASE_URL": f"sqlite:///{os.path.join(storage_root, 'ai_generator.db')}",
+        "JOB_BROKER_URL": f"sqlite:///{os.path.join(storage_root, 'jobs.db')}",
+        "PUBLIC_BASE_URL": base_url,
+    }
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)]
+    proc = subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            if http_request(f"{base_url}/health", timeout=2)[0] == 200:
+                print(f"🚀 Spawned server at {base_url} (PIPELINE_STUBS={stubs or 'none'})")
+                return proc, base_url
+        except OSError:
+            pass
+        time.sleep(0.5)
+
+    proc.terminate()
+    raise RuntimeError("Server did not become healthy within 60s")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}' (expected {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Mix needs at least one non-zero weight")
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test /generate, /generate/batch, /download-video and /static")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL (ignored with --spawn)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent client threads")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests (unless --duration)")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of --requests")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate=1,download=1,static=2"),
+                        help="Weighted request mix, e.g. generate=1,batch=1,download=2,static=4")
+    parser.add_argument("--batch-size", type=int, default=4, help="Items per /generate/batch request")
+    parser.add_argument("--keyword", default="load test")
+    parser.add_argument("--num-pages", type=int, default=5)
+    parser.add_argument("--duration-per-snapshot", type=float, default=0.2)
+    parser.add_argument("--encoder-profile", default="fast")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn server for the run")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--stubs", default="all", help="PIPELINE_STUBS for --spawn (all, snapshots, ffmpeg, or '')")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    payload = {
+        "keyword": args.keyword,
+        "num_pages": args.num_pages,
+        "duration_per_snapshot": args.duration_per_snapshot,
+        "encoder_profile": args.encoder_profile,
+    }
+
+    proc = storage_root = None
+    base_url = args.url
+    try:
+        if args.spawn:
+            storage_root = tempfile.mkdtemp(prefix="loadtest_storage_")
+            proc, base_url = spawn_server(args.port, args.stubs, storage_root)
+
+        test = LoadTest(base_url, args.mix, payload, args.timeout, batch_size=args.batch_size)
+
+        # One job up front so download/static have something to fetch (not measured)
+        if test.generate() != 200:
+            print("⚠️ Warm-up /generate failed; download/static will fall back to /generate")
+
+        print(f"🔥 {args.concurrency} client(s), mix {args.mix}, "
+              f"{f'{args.duration}s' if args.duration else f'{args.requests} requests'}")
+        elapsed = test.run(args.concurrency, total_requests=args.requests, duration=args.duration)
+
+        report = build_report(test, elapsed)
+        print_report(report)
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Report written to {args.json_path}")
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if storage_root:
+            shutil.rmtree(storage_root, ignore_errors=True)
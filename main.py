@@ -1,36 +1,97 @@
 import os
 import sys
 import uuid
-import asyncio
+import json
+import anyio
 from pathlib import Path
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Optional, List
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 
 
 import os
 import shutil
+import threading
 from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 
 # ---------------------------------------------
 # IMPORT YOUR HTML GENERATOR
 # ---------------------------------------------
-from src.p01_dummy_pages_generator.Dummy_web_creator import generate_all_pages
+from src.p01_dummy_pages_generator.Dummy_web_creator import generate_all_pages, new_title_stats
 
 # ---------------------------------------------
 # IMPORT THE SNAPSHOT PROCESSOR (Playwright)
 # ---------------------------------------------
-from src.p02_screenshoter.Screenhoter import run_snapshot_processing
+# Playwright itself is only imported when a browser is first launched
+from src.p02_screenshoter.Screenhoter import run_snapshot_processing_sync, CAPTURE_MODES, RENDERERS
+from src.p02_screenshoter.browser_pool import browser_pool
 
 # -------------------------------------------------------
 # IMPORT VIDEO COMPILER
 # -------------------------------------------------------
-from src.p03_video_creator.Video_creator import compile_snapshots_to_video
+from src.p03_video_creator.Video_creator import compile_snapshots_to_video, ENCODER_PROFILES, warm_up_encoder
+from src.p03_video_creator.Hls_creator import HlsSegmentWriter, PLAYLIST_NAME
+from src.p03_video_creator.Audio_builder import numpy_available, load_shutter_pcm
+from src.p03_video_creator.Image_exporter import export_snapshots, OUTPUT_FILENAMES, MEDIA_TYPES
+
+# -------------------------------------------------------
+# IMPORT DATABASE (write-behind generation logging)
+# -------------------------------------------------------
+from database import create_tables, generation_log_writer, log_generation
+
+# -------------------------------------------------------
+# IMPORT CREDIT RESERVATION
+# -------------------------------------------------------
+from src.utils.user_manager import (
+    admit_and_reserve, UserNotFound, PageLimitExceeded, InsufficientCredits
+)
+
+# -------------------------------------------------------
+# IMPORT ADMISSION CONTROL (backpressure for render jobs)
+# -------------------------------------------------------
+from src.utils.admission_control import admission_controller, estimate_job_cost, AdmissionRejected, JobCost
+
+# -------------------------------------------------------
+# IMPORT SHARED STORAGE + JOB BROKER
+# -------------------------------------------------------
+from src.p01_dummy_pages_generator.Dummy_web_creator import load_page_assets, list_images
+from src.p01_dummy_pages_generator.image_variants import load_manifest
+from src.utils.file_utils import (
+    STORAGE_ROOT, users_root, user_dirs, static_url,
+    SHARED_IMAGES_DIR, IMAGE_VARIANTS_DIR, TEMPLATE_FILE, CSS_FILE, SNAP_SOUND_FILE
+)
+from src.utils.cleanup import apply_retention
+from src.utils.checkpoint import JobCheckpoint
+from src.utils.progress import progress_bus, JobProgress, broker_status_event, format_sse, TERMINAL_EVENTS
+from src.utils.profiling import JobProfiler, profiling_requested, bundle_path
+from src.utils.pipeline_stubs import stubbed
+from src.workers.job_broker import get_broker
+from src.workers.render_worker import start_worker_threads, resume_interrupted_jobs
+from src.workers.batch_runner import run_batch
+
+# Render workers run inside the API process unless set to 0
+EMBEDDED_RENDER_WORKERS = int(os.getenv("EMBEDDED_RENDER_WORKERS", "1"))
+
+# Upper bound on keywords per /generate/batch call
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "50"))
+
+# Launch the browser pool, load asset caches and run a tiny encode in the
+# background at startup so the first real request is not penalized
+PREWARM = os.getenv("PREWARM", "0").lower() in ("1", "true", "yes")
+
+# Supported GenerateRequest.output_mode values
+OUTPUT_MODES = ("mp4", "hls")
+
+# Seconds between SSE keep-alive comments (the broker status is re-checked as well)
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+# Readiness (separate from /health liveness)
+readiness = {"started": False, "prewarm": "disabled", "prewarm_error": None}
 
 # ======================================================
 # FASTAPI APP
@@ -40,9 +101,10 @@ app = FastAPI(title="Multi-User Dummy Generator API")
 # Get absolute path to app directory
 BASE_DIR = Path(__file__).parent  # This gets D:\19_SAAS\01_build\app
 
-# Mount static files
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "storage")), name="static")
-print(f"📂 Static files mounted: /static → {BASE_DIR / 'storage'}")
+# Mount static files (STORAGE_ROOT is shared between API and render nodes)
+os.makedirs(users_root(), exist_ok=True)
+app.mount("/static", StaticFiles(directory=str(STORAGE_ROOT.resolve())), name="static")
+print(f"📂 Static files mounted: /static → {STORAGE_ROOT.resolve()}")
 
 app.add_middleware(
     CORSMiddleware,
@@ -65,6 +127,17 @@ class GenerateRequest(BaseModel):
     num_pages: int = 10
     duration_per_snapshot: float = 0.2
     use_varied_fonts: bool = True  # NEW: Font variety toggle
+    account_id: Optional[str] = None  # Registered user to charge credits to (anonymous if omitted)
+    encoder_profile: str = "quality"  # quality | balanced | fast (see ENCODER_PROFILES)
+    output_mode: str = "mp4"  # mp4 | hls (progressive playlist while rendering)
+    output_format: str = "mp4"  # mp4 | webp | gif | frames (JPEG frame-strip ZIP)
+    capture_mode: Optional[str] = None  # css | composite (post-capture blur); default CAPTURE_MODE
+    renderer: str = "browser"  # browser (Playwright) | pillow (browserless, headline template only)
+    job_id: Optional[str] = None  # Client-chosen UUID, to follow /jobs/{job_id}/events before the response
+
+
+class BatchGenerateRequest(BaseModel):
+    items: List[GenerateRequest]
 
 # ======================================================
 # CRONJOB DELETE USER FOLDERS OLDER THAN 24 HOURS
@@ -72,7 +145,7 @@ class GenerateRequest(BaseModel):
 
 def cleanup_old_users():
     """Delete user folders older than 24 hours"""
-    storage_path = Path("storage/users")
+    storage_path = users_root()
     
     if not storage_path.exists():
         return
@@ -100,6 +173,9 @@ def cleanup_old_users():
 # Start scheduler when FastAPI starts
 @app.on_event("startup")
 def startup_event():
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.interval import IntervalTrigger
+
     scheduler = BackgroundScheduler()
     
     # Run every 6 hours
@@ -112,14 +188,61 @@ def startup_event():
     )
     
     scheduler.start()
+    app.state.scheduler = scheduler
     print("⏰ Cleanup scheduler started (runs every 6 hours)")
-    
-    # Also run immediately on startup
-    cleanup_old_users()
+
+    # Generation logs are written in batches off the request path
+    create_tables()
+    generation_log_writer.start()
+    print("🗃️ Generation log writer started")
+
+    if EMBEDDED_RENDER_WORKERS > 0:
+        app.state.worker_stop, _ = start_worker_threads(EMBEDDED_RENDER_WORKERS)
+        print(f"👷 Started {EMBEDDED_RENDER_WORKERS} embedded render worker(s)")
+
+    # /generate jobs cut off by the last shutdown or crash continue as queued jobs
+    threading.Thread(target=resume_interrupted_jobs, name="resume-jobs", daemon=True).start()
+
+    # Also run once on startup, without holding up serving traffic
+    threading.Thread(target=cleanup_old_users, name="startup-cleanup", daemon=True).start()
+
+    if PREWARM:
+        readiness["prewarm"] = "running"
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+
+    readiness["started"] = True
+
+
+def prewarm():
+    """Warm browser pool, asset caches and encoder before the first request"""
+    try:
+        load_page_assets(TEMPLATE_FILE, CSS_FILE)
+        list_images(SHARED_IMAGES_DIR)
+        load_manifest(IMAGE_VARIANTS_DIR)
+        warm_up_encoder()
+        if numpy_available():
+            load_shutter_pcm(SNAP_SOUND_FILE)
+        if not stubbed("snapshots"):
+            browser_pool.start()
+        readiness["prewarm"] = "done"
+        print("🔥 Pre-warm complete")
+    except Exception as e:
+        readiness["prewarm"] = "failed"
+        readiness["prewarm_error"] = str(e)
+        print(f"⚠️ Pre-warm failed: {e}")
 
 @app.on_event("shutdown")
 def shutdown_event():
     print("🛑 Shutting down cleanup scheduler")
+    scheduler = getattr(app.state, "scheduler", None)
+    if scheduler:
+        scheduler.shutdown(wait=False)
+    browser_pool.stop()
+    worker_stop = getattr(app.state, "worker_stop", None)
+    if worker_stop:
+        worker_stop.set()
+    generation_log_writer.stop()
+    print("🗃️ Generation log writer flushed")
 
 
 # ======================================================
@@ -134,7 +257,10 @@ def root():
         "documentation": "/docs",
         "endpoints": {
             "generate": "/generate (POST)",
+            "generate_batch": "/generate/batch (POST, NDJSON stream)",
+            "jobs": "/jobs (POST), /jobs/{user_id}",
             "health": "/health",
+            "ready": "/ready",
             "test": "/test-connection",
             "env": "/env (debug)"
         }
@@ -147,8 +273,25 @@ def health_check():
         "service": "Dummy Generator API",
         "timestamp": datetime.now().isoformat(),
         "python_version": sys.version.split()[0],
-        "working_directory": os.getcwd()
+        "working_directory": os.getcwd(),
+        "admission": admission_controller.snapshot()
+    }
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 503 until startup (and pre-warm, if enabled) has finished"""
+    ready = readiness["started"] and readiness["prewarm"] in ("disabled", "done", "failed")
+    body = {
+        "status": "ready" if ready else "starting",
+        "prewarm": readiness["prewarm"],
+        "browser_pool": browser_pool.started,
+        "timestamp": datetime.now().isoformat()
     }
+    if readiness["prewarm_error"]:
+        body["prewarm_error"] = readiness["prewarm_error"]
+    if not ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 @app.get("/test-connection")
 def test_connection():
@@ -161,9 +304,9 @@ def test_connection():
 @app.get("/env")
 def show_environment():
     """Debug endpoint to check environment"""
-    template_path = Path("src/p01_dummy_pages_generator/01_Text_base_tail_templates.txt")
-    css_path = Path("src/p01_dummy_pages_generator/templates/01_medium_headline.css")
-    images_path = Path("src/p01_dummy_pages_generator/unsplash_images")
+    template_path = TEMPLATE_FILE
+    css_path = CSS_FILE
+    images_path = SHARED_IMAGES_DIR
     
     return {
         "python": {
@@ -172,11 +315,11 @@ def show_environment():
         },
         "paths": {
             "current": os.getcwd(),
-            "storage": str(Path("storage").absolute()),
+            "storage": str(STORAGE_ROOT.absolute()),
             "src": str(Path("src").absolute())
         },
         "files": {
-            "storage_exists": os.path.exists("storage"),
+            "storage_exists": STORAGE_ROOT.exists(),
             "src_exists": os.path.exists("src"),
             "template_exists": template_path.exists(),
             "template_content": template_path.read_text()[:100] + "..." if template_path.exists() else "NOT FOUND",
@@ -195,31 +338,133 @@ def show_environment():
 # Add this function - it creates a direct download link
 @app.get("/download-video/{user_id}")
 def download_video(user_id: str):
-    """Direct video download endpoint"""
-    from pathlib import Path
-    from fastapi.responses import FileResponse
-    
-    # Path to the video file
-    video_path = Path(f"storage/users/{user_id}/video/final_video.mp4")
-    
-    # Check if file exists
-    if not video_path.exists():
-        return {"error": "Video not found", "path": str(video_path)}
-    
-    # Return the video file
+    """Direct download of a job's output (mp4, webp, gif or frames ZIP)"""
+    video_dir = user_dirs(user_id)["video"]
+
+    # Whichever output format the job was generated with
+    for output_format, filename in OUTPUT_FILENAMES.items():
+        video_path = video_dir / filename
+        if video_path.exists():
+            break
+    else:
+        return {"error": "Video not found", "path": str(video_dir / OUTPUT_FILENAMES["mp4"])}
+
     return FileResponse(
         video_path,
-        media_type="video/mp4",
-        filename="your_video.mp4"
+        media_type=MEDIA_TYPES[output_format],
+        filename=f"your_video{Path(filename).suffix}"
     )
 
+@app.get("/profile/{user_id}")
+def download_profile(user_id: str):
+    """Profiling bundle (zip) for a job that ran with X-Profile / PROFILE_ALL_JOBS"""
+    archive = bundle_path(user_dirs(user_id)["root"])
+    if not archive.exists():
+        raise HTTPException(status_code=404, detail="No profile recorded for this job")
+
+    return FileResponse(archive, media_type="application/zip", filename=f"profile_{user_id}.zip")
+
+CREDIT_ERRORS = (UserNotFound, PageLimitExceeded, InsufficientCredits)
+
+
+def credit_error_to_http(e):
+    """HTTP error for a failed credit reservation (one of CREDIT_ERRORS)"""
+    status_code = 404 if isinstance(e, UserNotFound) else 403 if isinstance(e, PageLimitExceeded) else 402
+    return HTTPException(status_code=status_code, detail=str(e))
+
+
+def validate_job_id(job_id):
+    """Client-chosen job ids name the storage folder, so they must be canonical UUIDs"""
+    if job_id is None:
+        return
+    try:
+        canonical = str(uuid.UUID(job_id)) == job_id
+    except ValueError:
+        canonical = False
+    if not canonical:
+        raise HTTPException(status_code=400, detail="job_id must be a lower-case UUID")
+
+
+def claim_job_id(job_id):
+    """
+    Create the folder of a client-chosen job id. Ids are never reused: of
+    two concurrent requests with the same id exactly one gets it and the
+    other a 409. Call only once the request passed validation.
+    """
+    if job_id is None:
+        return
+    try:
+        user_dirs(job_id)["root"].mkdir(parents=True, exist_ok=False)
+    except FileExistsError:
+        raise HTTPException(status_code=409, detail="job_id is already in use")
+
+
+def validate_generate_request(req: GenerateRequest):
+    """Reject a GenerateRequest with unknown options (400); shared by /generate, /generate/batch and /jobs"""
+    validate_job_id(req.job_id)
+    if not req.keyword.strip():
+        raise HTTPException(status_code=400, detail="keyword must not be blank")
+    if req.encoder_profile not in ENCODER_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown encoder_profile: {req.encoder_profile}")
+    if req.output_mode not in OUTPUT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown output_mode: {req.output_mode}")
+    if req.output_format not in OUTPUT_FILENAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown output_format: {req.output_format}")
+    if req.capture_mode and req.capture_mode not in CAPTURE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown capture_mode: {req.capture_mode}")
+    if req.renderer not in RENDERERS:
+        raise HTTPException(status_code=400, detail=f"Unknown renderer: {req.renderer}")
+    if req.output_mode == "hls" and req.output_format != "mp4":
+        raise HTTPException(status_code=400, detail="output_mode 'hls' requires output_format 'mp4'")
+
+
 # ======================================================
 # GENERATE ENDPOINT (UPDATED)
 # ======================================================
 @app.post("/generate")
-def create_generation_task(req: GenerateRequest):
+def create_generation_task(req: GenerateRequest, request: Request):
     """Main endpoint to generate dummy pages, take screenshots, and create video"""
-    
+
+    # Nothing is created for a rejected request; a taken id must not fail
+    # someone else's job stream, so events are only published once it is ours
+    validate_generate_request(req)
+    claim_job_id(req.job_id)
+
+    try:
+        # --------------------------------------------------
+        # ADMISSION CONTROL — queue or reject when over budget
+        # --------------------------------------------------
+        cost = estimate_job_cost(req.num_pages, req.duration_per_snapshot, req.encoder_profile, req.output_format,
+                                 req.renderer)
+        user_key = req.account_id or (request.client.host if request.client else "anonymous")
+        try:
+            ticket = admission_controller.acquire(cost, user_key)
+        except AdmissionRejected as e:
+            print(f"🚦 Rejected {cost} for {user_key}: {e}")
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+    except Exception as e:
+        # Whoever follows /jobs/{job_id}/events gets a terminal event for every outcome
+        JobProgress(req.job_id).failed(e.detail if isinstance(e, HTTPException) else e)
+        raise
+
+    # From here on run_generation() publishes the outcome itself
+    try:
+        return run_generation(req, profile=profiling_requested(request.headers))
+    finally:
+        ticket.release()
+
+
+def run_generation(req: GenerateRequest, profile: bool = False):
+    """
+    Run the full pipeline (pages → screenshots → video) for one request.
+    Progress is checkpointed so a restart can finish the job on the workers.
+    """
+
     print(f"🚀 Starting generation for keyword: {req.keyword}")
     print(f"📄 Pages: {req.num_pages}, Duration: {req.duration_per_snapshot}s")
     print(f"🔤 Fonts: {'Varied' if req.use_varied_fonts else 'Poppins only'}")
@@ -227,111 +472,475 @@ def create_generation_task(req: GenerateRequest):
     # --------------------------------------------------
     # CREATE USER SESSION FOLDER
     # --------------------------------------------------
-    user_id = str(uuid.uuid4())
+    user_id = req.job_id or str(uuid.uuid4())
     print(f"👤 User ID: {user_id}")
+    progress = JobProgress(user_id)
+    profiler = reservation = checkpoint = None
 
-    user_root = Path(f"storage/users/{user_id}")
-    pages_dir = user_root / "pages"
-    images_dir = user_root / "images"
-    snapshots_dir = user_root / "snapshots"
-    video_dir = user_root / "video"    
+    try:
+        dirs = user_dirs(user_id, create=True)
+        pages_dir = dirs["pages"]
+        images_dir = dirs["images"]
+        snapshots_dir = dirs["snapshots"]
+        video_dir = dirs["video"]
+        temp_dir = dirs["temp"]
+        print(f"📁 Created: {dirs['root']}")
+
+        # Opt-in profiling (X-Profile header / PROFILE_ALL_JOBS); None means no hooks run
+        profiler = JobProfiler(dirs["root"]) if profile else None
+        if profiler:
+            print(f"📊 Profiling enabled for {user_id}")
+
+        # --------------------------------------------------
+        # SOURCE (shared/global) DIRECTORIES
+        # --------------------------------------------------
+        shared_images = SHARED_IMAGES_DIR
+        template_file = TEMPLATE_FILE
+        css_file = CSS_FILE
+
+        # Validate source files exist
+        if not template_file.exists():
+            raise HTTPException(status_code=500, detail=f"Template file not found: {template_file}")
+        if not css_file.exists():
+            raise HTTPException(status_code=500, detail=f"CSS file not found: {css_file}")
+        if not shared_images.exists():
+            raise HTTPException(status_code=500, detail=f"Images directory not found: {shared_images}")
+
+        print(f"✅ Source files validated")
+
+        # --------------------------------------------------
+        # CREDIT RESERVATION (registered users only)
+        # --------------------------------------------------
+        if req.account_id:
+            try:
+                reservation = admit_and_reserve(req.account_id, req.num_pages)
+            except CREDIT_ERRORS as e:
+                raise credit_error_to_http(e)
+            print(f"💳 Reserved {reservation.amount} credit(s) for account {req.account_id}")
+
+        log_user_id = req.account_id or user_id
+
+        # If this process dies mid-job, resume_interrupted_jobs() re-queues it
+        # from here (same payload shape as POST /jobs)
+        checkpoint = JobCheckpoint(user_id)
+        checkpoint.start({
+            **req.dict(),
+            "user_id": user_id,
+            "credits_reserved": reservation.amount if reservation else 0,
+            "profile": profile,
+        }, stage="pages", via="generate")
+
+        # --------------------------------------------------
+        # STEP 1 — GENERATE HTML PAGES
+        # --------------------------------------------------
+        progress.stage("pages", total=req.num_pages)
+        title_stats = new_title_stats()
+        try:
+            print("🔄 Step 1: Generating HTML pages...")
+            page_args = dict(
+                keyword=req.keyword,
+                num_pages=req.num_pages,
+                pages_dir=str(pages_dir),
+                images_dir=str(images_dir),
+                shared_image_dir=str(shared_images),
+                template_file=str(template_file),
+                css_file=str(css_file),
+                use_varied_fonts=req.use_varied_fonts,
+                title_stats=title_stats,
+                variants_dir=str(IMAGE_VARIANTS_DIR),
+                checkpoint=checkpoint
+            )
+            if profiler:
+                html_files = profiler.profile_call("pages", generate_all_pages, **page_args)
+            else:
+                html_files = generate_all_pages(**page_args)
+            print(f"✅ Generated {len(html_files)} HTML pages")
+        except Exception as e:
+            print(f"❌ HTML generation failed: {e}")
+            log_generation(user_id=log_user_id, keyword=req.keyword, status="failed",
+                           num_pages=req.num_pages, duration=req.duration_per_snapshot, credits_used=0)
+            raise HTTPException(status_code=500, detail=f"HTML generation failed: {str(e)}")
+
+        # --------------------------------------------------
+        # STEP 2 — PLAYWRIGHT SNAPSHOT PROCESSING
+        # --------------------------------------------------
+        hls_writer = None
+        if req.output_mode == "hls":
+            # Frames are encoded into HLS segments as soon as they are captured
+            hls_writer = HlsSegmentWriter(
+                video_dir=video_dir,
+                snap_sound=SNAP_SOUND_FILE,
+                duration=req.duration_per_snapshot,
+                temp_dir=temp_dir,
+                encoder_profile=req.encoder_profile,
+                profiler=profiler,
+                on_segment=progress.segment,
+            )
 
-    for d in [pages_dir, images_dir, snapshots_dir, video_dir]:
-        os.makedirs(d, exist_ok=True)
-        print(f"📁 Created: {d}")
+        def on_snapshot(path):
+            progress.snapshot(path, total=len(html_files))
+            if hls_writer:
+                hls_writer.add_frame(path)
 
-    # --------------------------------------------------
-    # SOURCE (shared/global) DIRECTORIES
-    # --------------------------------------------------
-    shared_images = Path("src/p01_dummy_pages_generator/unsplash_images")
-    template_file = Path("src/p01_dummy_pages_generator/01_Text_base_tail_templates.txt")
-    css_file = Path("src/p01_dummy_pages_generator/templates/01_medium_headline.css")
+        checkpoint.set_stage("snapshots")
+        progress.stage("snapshots", total=len(html_files))
+        try:
+            print("🔄 Step 2: Taking screenshots with Playwright...")
+            snapshot_results = run_snapshot_processing_sync(
+                pages_dir=str(pages_dir),
+                output_dir=str(snapshots_dir),
+                keyword=req.keyword,
+                on_snapshot=on_snapshot,
+                profiler=profiler,
+                capture_mode=req.capture_mode,
+                renderer=req.renderer,
+                checkpoint=checkpoint
+            )
+            print(f"✅ Captured {len(snapshot_results)} screenshots")
+        except Exception as e:
+            print(f"❌ Screenshot capture failed: {e}")
+            if hls_writer:
+                hls_writer.abort()
+            log_generation(user_id=log_user_id, keyword=req.keyword, status="failed",
+                           num_pages=req.num_pages, duration=req.duration_per_snapshot, credits_used=0)
+            raise HTTPException(status_code=500, detail=f"Snapshot processing failed: {str(e)}")
+
+        # Pages and linked images are no longer needed once captured
+        retention = apply_retention(user_id, "snapshots")
+        checkpoint.set_stage("video")
+        progress.stage("video", total=len(snapshot_results))
+
+        # --------------------------------------------------
+        # STEP 3 — VIDEO COMPILATION
+        # --------------------------------------------------
+        try:
+            print("🔄 Step 3: Compiling video...")
+            if hls_writer:
+                final_video_path = hls_writer.finish(str(video_dir / "final_video.mp4"))
+            elif req.output_format != "mp4":
+                # Lightweight formats are built in-process straight from the PNGs
+                export_args = dict(
+                    snapshot_folder=str(snapshots_dir),
+                    output_dir=str(video_dir),
+                    output_format=req.output_format,
+                    duration=req.duration_per_snapshot,
+                )
+                if profiler:
+                    final_video_path = profiler.profile_call("export", export_snapshots, **export_args)
+                else:
+                    final_video_path = export_snapshots(**export_args)
+            else:
+                final_video_path = compile_snapshots_to_video(
+                    snapshot_folder=str(snapshots_dir),
+                    output_video=str(video_dir / "final_video.mp4"),
+                    snap_sound=str(SNAP_SOUND_FILE),
+                    duration=req.duration_per_snapshot,
+                    temp_dir=str(temp_dir),
+                    encoder_profile=req.encoder_profile,
+                    profiler=profiler,
+                    checkpoint=checkpoint,
+                    on_segment=progress.segment,
+                )
+            print(f"✅ Video created: {final_video_path}")
+        except Exception as e:
+            print(f"❌ Video compilation failed: {e}")
+            log_generation(user_id=log_user_id, keyword=req.keyword, status="failed",
+                           num_pages=req.num_pages, duration=req.duration_per_snapshot, credits_used=0)
+            raise HTTPException(status_code=500, detail=f"Video compilation failed: {str(e)}")
+
+        # Snapshots and encoder scratch files are no longer needed
+        retention.update(apply_retention(user_id, "video"))
+        checkpoint.finish("success")
+
+        video_filename = OUTPUT_FILENAMES[req.output_format]
+        video_relative_path = f"users/{user_id}/video/{video_filename}"
+        # --------------------------------------------------
+        # RESPONSE
+        # --------------------------------------------------
+        response = {
+            "user_id": user_id,
+            "keyword": req.keyword,
+            "use_varied_fonts": req.use_varied_fonts,
+            "generated_html": [] if "pages" in retention else html_files,
+            "generated_snapshots": [] if "snapshots" in retention else snapshot_results,
+            "html_count": len(html_files),
+            "snapshot_count": len(snapshot_results),
+            "title_stats": title_stats,
+            "pages_dir": str(pages_dir),
+            "snapshots_dir": str(snapshots_dir),
+            "images_dir": str(images_dir),
+            "video_dir": str(video_dir),
+            "video_path": str(video_dir / video_filename),
+            "video_url": static_url(video_relative_path),
+            "output_format": req.output_format,
+            "retention": retention,
+            "timestamp": datetime.now().isoformat(),
+            "status": "success"
+        }
+        if hls_writer:
+            response["playlist_url"] = static_url(f"users/{user_id}/video/{PLAYLIST_NAME}")
+        if profiler:
+            profiler.bundle()
+            response["profile_url"] = f"/profile/{user_id}"
+
+        if reservation:
+            reservation.commit()
+        log_generation(user_id=log_user_id, keyword=req.keyword, status="success",
+                       num_pages=req.num_pages, duration=req.duration_per_snapshot,
+                       video_url=response["video_url"],
+                       credits_used=reservation.amount if reservation else 0)
+
+        progress.complete(**{k: response[k] for k in ("video_url", "playlist_url", "profile_url") if k in response})
+        print(f"🎉 Generation complete for user {user_id}")
+        return response
+    except Exception as e:
+        # Whatever failed (a stage, retention, logging, the commit), the job ends
+        # here: credits back (no-op once committed), no resume, a terminal event
+        if reservation:
+            reservation.refund()
+        if checkpoint:
+            checkpoint.finish("failed")
+        progress.failed(e.detail if isinstance(e, HTTPException) else e)
+        # Bundle what was recorded so failed jobs can be profiled too
+        if profiler:
+            profiler.bundle()
+        raise
 
-    # Validate source files exist
-    if not template_file.exists():
-        raise HTTPException(status_code=500, detail=f"Template file not found: {template_file}")
-    if not css_file.exists():
-        raise HTTPException(status_code=500, detail=f"CSS file not found: {css_file}")
-    if not shared_images.exists():
-        raise HTTPException(status_code=500, detail=f"Images directory not found: {shared_images}")
 
-    print(f"✅ Source files validated")
+# ======================================================
+# BATCH GENERATE ENDPOINT
+# ======================================================
+@app.post("/generate/batch")
+async def create_batch_generation(batch: BatchGenerateRequest, request: Request):
+    """
+    Generate videos for many keywords in one call.
+
+    Items share templates, one browser and a warmed encoder. Results stream
+    back as newline-delimited JSON, one line per item as it finishes.
+    """
+
+    items = batch.items
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch has no items")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {MAX_BATCH_ITEMS} items")
+    for req in items:
+        validate_generate_request(req)
+        if req.output_mode != "mp4":
+            raise HTTPException(status_code=400, detail="output_mode 'hls' is not supported in batches")
+        if req.job_id:
+            raise HTTPException(status_code=400, detail="job_id is not supported in batches")
+
+    # Fair share and credits are per account, so a batch charges exactly one
+    accounts = {req.account_id for req in items}
+    if len(accounts) > 1:
+        raise HTTPException(status_code=400, detail="All batch items must use the same account_id")
+    account_id = accounts.pop()
 
     # --------------------------------------------------
-    # STEP 1 — GENERATE HTML PAGES
+    # ADMISSION CONTROL — one ticket for the whole batch
     # --------------------------------------------------
+    costs = [estimate_job_cost(r.num_pages, r.duration_per_snapshot, r.encoder_profile, r.output_format, r.renderer)
+             for r in items]
+    cost = JobCost(sum(c.cpu for c in costs), max(c.memory for c in costs))  # one shared browser
+    user_key = account_id or (request.client.host if request.client else "anonymous")
     try:
-        print("🔄 Step 1: Generating HTML pages...")
-        html_files = generate_all_pages(
-            keyword=req.keyword,
-            num_pages=req.num_pages,
-            pages_dir=str(pages_dir),
-            images_dir=str(images_dir),
-            shared_image_dir=str(shared_images),
-            template_file=str(template_file),
-            css_file=str(css_file),
-            use_varied_fonts=req.use_varied_fonts
-        )
-        print(f"✅ Generated {len(html_files)} HTML pages")
-    except Exception as e:
-        print(f"❌ HTML generation failed: {e}")
-        raise HTTPException(status_code=500, detail=f"HTML generation failed: {str(e)}")
+        ticket = await run_in_threadpool(admission_controller.acquire, cost, user_key)
+    except AdmissionRejected as e:
+        print(f"🚦 Rejected batch {cost} for {user_key}: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
     # --------------------------------------------------
-    # STEP 2 — PLAYWRIGHT SNAPSHOT PROCESSING
+    # CREDIT RESERVATION — per item, refunded on failure
     # --------------------------------------------------
+    jobs = []
+    reservations = {}
     try:
-        print("🔄 Step 2: Taking screenshots with Playwright...")
-        snapshot_results = asyncio.run(
-            run_snapshot_processing(
-                pages_dir=str(pages_dir),
-                output_dir=str(snapshots_dir),
-                keyword=req.keyword
-            )
-        )
-        print(f"✅ Captured {len(snapshot_results)} screenshots")
+        for index, req in enumerate(items):
+            user_id = str(uuid.uuid4())
+            if req.account_id:
+                reservations[user_id] = await run_in_threadpool(admit_and_reserve, req.account_id, req.num_pages)
+            jobs.append({**req.dict(), "index": index, "user_id": user_id})
     except Exception as e:
-        print(f"❌ Screenshot capture failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Snapshot processing failed: {str(e)}")
+        ticket.release()
+        for reservation in reservations.values():
+            await run_in_threadpool(reservation.refund)
+        if isinstance(e, CREDIT_ERRORS):
+            raise credit_error_to_http(e)
+        raise
+
+    print(f"📦 Starting batch of {len(jobs)} keywords")
+
+    async def stream_results():
+        results = run_batch(jobs)
+        try:
+            async for result in results:
+                job = jobs[result["index"]]
+                reservation = reservations.get(job["user_id"])
+                if reservation:
+                    if result["status"] == "success":
+                        reservation.commit()
+                    else:
+                        await run_in_threadpool(reservation.refund)
+                log_generation(user_id=job["account_id"] or job["user_id"], keyword=job["keyword"],
+                               status=result["status"], num_pages=job["num_pages"],
+                               duration=job["duration_per_snapshot"], video_url=result.get("video_url"),
+                               credits_used=reservation.amount if reservation and result["status"] == "success" else 0)
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            print(f"❌ Batch failed: {e}")
+            yield json.dumps({"status": "failed", "error": f"Batch failed: {str(e)}"}) + "\n"
+        finally:
+            # Runs while the response is being cancelled when the client goes
+            # away: release and refund without awaiting, then shut the batch
+            # down (browser, in-flight encodes) in a shielded scope
+            ticket.release()
+            # Anything not reported (batch crash / client gone) gets its credits back
+            for reservation in reservations.values():
+                reservation.refund()
+            with anyio.CancelScope(shield=True):
+                await results.aclose()
+            print(f"📦 Batch of {len(jobs)} keywords finished")
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+# ======================================================
+# QUEUED JOBS (render workers behind the job broker)
+# ======================================================
+@app.post("/jobs")
+def submit_generation_job(req: GenerateRequest, request: Request):
+    """Queue a generation for the render workers and return immediately"""
+
+    # Nothing is created for a rejected request; a taken id must not fail
+    # someone else's job stream, so events are only published once it is ours
+    validate_generate_request(req)
+    claim_job_id(req.job_id)
 
-    # --------------------------------------------------
-    # STEP 3 — VIDEO COMPILATION
-    # --------------------------------------------------
     try:
-        print("🔄 Step 3: Compiling video...")
-        final_video_path = compile_snapshots_to_video(
-            snapshot_folder=str(snapshots_dir),
-            output_video=str(video_dir / "final_video.mp4"),
-            snap_sound="src/p03_video_creator/camera_shutter.mp3",
-            duration=req.duration_per_snapshot,
-        )
-        print(f"✅ Video created: {final_video_path}")
+        user_id = req.job_id or str(uuid.uuid4())
+
+        # --------------------------------------------------
+        # ADMISSION CONTROL — the workers' backlog is bounded too
+        # --------------------------------------------------
+        cost = estimate_job_cost(req.num_pages, req.duration_per_snapshot, req.encoder_profile, req.output_format,
+                                 req.renderer)
+        try:
+            depth = get_broker().queue_depth()
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Job broker unavailable: {str(e)}")
+        try:
+            admission_controller.check_broker_depth(depth, cost)
+        except AdmissionRejected as e:
+            print(f"🚦 Rejected queued job {cost}: {e}")
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+        reservation = None
+        if req.account_id:
+            try:
+                reservation = admit_and_reserve(req.account_id, req.num_pages)
+            except CREDIT_ERRORS as e:
+                raise credit_error_to_http(e)
+
+        payload = {
+            **req.dict(),
+            "user_id": user_id,
+            "credits_reserved": reservation.amount if reservation else 0,
+            "profile": profiling_requested(request.headers),
+        }
+
+        try:
+            broker = get_broker()
+            broker.set_job_status(user_id, status="queued", stage="pages", keyword=req.keyword)
+            broker.enqueue(user_id, "pages", payload)
+        except Exception as e:
+            if reservation:
+                reservation.refund()
+            raise HTTPException(status_code=503, detail=f"Job broker unavailable: {str(e)}")
+
+        # From here on the worker owns the credits (refunds on final failure)
+        if reservation:
+            reservation.commit()
+
+        print(f"📨 Queued job {user_id} for keyword: {req.keyword}")
+        response = {
+            "user_id": user_id,
+            "status": "queued",
+            "status_url": f"/jobs/{user_id}",
+            "events_url": f"/jobs/{user_id}/events",
+            "video_url": static_url(f"users/{user_id}/video/{OUTPUT_FILENAMES[req.output_format]}"),
+        }
+        if req.output_mode == "hls":
+            # Playable as soon as the first segment lands, while pages still render
+            response["playlist_url"] = static_url(f"users/{user_id}/video/{PLAYLIST_NAME}")
+        return response
     except Exception as e:
-        print(f"❌ Video compilation failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Video compilation failed: {str(e)}")
-    
-    video_filename = "final_video.mp4"
-    video_relative_path = f"users/{user_id}/video/{video_filename}"
-    # --------------------------------------------------
-    # RESPONSE
-    # --------------------------------------------------
-    response = {
-        "user_id": user_id,
-        "keyword": req.keyword,
-        "use_varied_fonts": req.use_varied_fonts,
-        "generated_html": html_files,
-        "generated_snapshots": snapshot_results,
-        "html_count": len(html_files),
-        "snapshot_count": len(snapshot_results),
-        "pages_dir": str(pages_dir),
-        "snapshots_dir": str(snapshots_dir),
-        "images_dir": str(images_dir),
-        "video_dir": str(video_dir),
-        "video_path": str(video_dir / "final_video.mp4"),
-        "video_url": f"http://localhost:8000/static/users/{user_id}/video/final_video.mp4", 
-        "timestamp": datetime.now().isoformat(),
-        "status": "success"
-    }
-    
-    print(f"🎉 Generation complete for user {user_id}")
-    return response
\ No newline at end of file
+        # Whoever follows /jobs/{job_id}/events gets a terminal event for every outcome
+        JobProgress(req.job_id).failed(e.detail if isinstance(e, HTTPException) else e)
+        raise
+
+
+@app.get("/jobs/{user_id}")
+def get_generation_job(user_id: str):
+    """Status of a queued generation"""
+    status = get_broker().get_job_status(user_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@app.get("/jobs/{user_id}/events")
+async def stream_generation_events(user_id: str, request: Request):
+    """
+    Server-sent events for one generation (POST /jobs, or /generate with a
+    job_id): stage changes, per-page capture and per-frame encode progress,
+    then "complete" with the final URLs or "failed". Recent events are
+    replayed, so the stream can be opened before or after the job starts.
+    """
+    try:
+        uuid.UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job id")
+
+    subscription = progress_bus.subscribe(user_id)
+
+    async def broker_status():
+        try:
+            return await run_in_threadpool(get_broker().get_job_status, user_id)
+        except Exception:
+            return None
+
+    async def events():
+        last_status = None
+        # Nothing buffered here: the job may be running on another host, or long finished
+        message = None
+        if subscription.queue.empty():
+            status = await broker_status()
+            if status:
+                last_status = (status.get("status"), status.get("stage"))
+                message = broker_status_event(user_id, status)
+        try:
+            while not await request.is_disconnected():
+                if message is None:
+                    message = await subscription.get(SSE_KEEPALIVE_SECONDS)
+                if message is None:
+                    status = await broker_status()
+                    if not status or (status.get("status"), status.get("stage")) == last_status:
+                        yield ": keep-alive\n\n"
+                        continue
+                    last_status = (status.get("status"), status.get("stage"))
+                    message = broker_status_event(user_id, status)
+
+                yield format_sse(message, subscription.dropped)
+                subscription.dropped = 0
+                if message["event"] in TERMINAL_EVENTS:
+                    break
+                message = None
+        finally:
+            progress_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Float
+from sqlalchemy import Column, String, Integer, DateTime, Float, Index
 from datetime import datetime
 import uuid
 
@@ -18,7 +18,11 @@ class GenerationLog(Base):
     donation_amount = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    # Index for faster queries
+    # Indexes for faster queries:
+    #   - per-user history  (WHERE user_id = ? ORDER BY created_at DESC)
+    #   - time-range scans  (WHERE created_at BETWEEN ? AND ?)
     __table_args__ = (
+        Index("ix_generation_logs_user_created", "user_id", "created_at"),
+        Index("ix_generation_logs_created_at", "created_at"),
         {'sqlite_autoincrement': True},
     )
\ No newline at end of file
@@ -1,10 +1,19 @@
 # generator.py
 
+import html as html_lib
 import os
 import random
 import shutil
+from functools import lru_cache
 from pathlib import Path
 
+from .image_variants import load_manifest, pick_variant
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Random BASE/TAIL draws per page before falling back to a keyword-first title
+MAX_TITLE_ATTEMPTS = int(os.getenv("MAX_TITLE_ATTEMPTS", "20"))
+
 
 # =============================
 # 1. LOAD TEMPLATES
@@ -41,6 +50,49 @@ def load_css(css_path):
         return "<style>\n" + f.read() + "\n</style>\n"
 
 
+# =============================
+# 2b. CACHED ASSETS (shared across requests)
+# =============================
+@lru_cache(maxsize=8)
+def _load_page_assets(template_file, css_file, template_mtime, css_mtime):
+    lorem, base, tail, fonts = load_templates(template_file)
+    css = load_css(css_file)
+    return lorem, base, tail, fonts, css
+
+
+def load_page_assets(template_file, css_file):
+    """
+    Parsed templates + CSS as (lorem, base, tail, fonts, css).
+    Cached per process and reloaded when either file changes on disk.
+    """
+    template_file, css_file = str(template_file), str(css_file)
+    css_mtime = os.path.getmtime(css_file) if os.path.exists(css_file) else None
+    return _load_page_assets(template_file, css_file, os.path.getmtime(template_file), css_mtime)
+
+
+@lru_cache(maxsize=8)
+def _list_images(image_dir, dir_mtime):
+    return tuple(sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS)))
+
+
+def list_images(image_dir):
+    """Image file names in image_dir, cached until the folder changes."""
+    image_dir = str(image_dir)
+    if not os.path.exists(image_dir):
+        return ()
+    return _list_images(image_dir, os.path.getmtime(image_dir))
+
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst (no data copied), falling back to a real copy."""
+    if os.path.exists(dst):
+        return
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+
 # =============================
 # 3. FONT CONFIGURATION
 # =============================
@@ -245,27 +297,92 @@ def random_paragraph(lorem):
 # =============================
 # 5. PICK RANDOM IMAGE
 # =============================
-def pick_random_image(image_dir):
-    if not os.path.exists(image_dir):
-        return None
-
-    files = [f for f in os.listdir(image_dir)
-             if f.lower().endswith((".jpg", ".jpeg", ".png"))]
+def pick_random_image(image_dir, image_files=None):
+    if image_files is None:
+        if not os.path.exists(image_dir):
+            return None
+        image_files = [f for f in os.listdir(image_dir)
+                       if f.lower().endswith(IMAGE_EXTENSIONS)]
 
-    return random.choice(files) if files else None
+    return random.choice(image_files) if image_files else None
 
 
 # =============================
 # 6. TITLE GENERATION
 # =============================
+def compose_title(keyword, index, base, tail):
+    if "#" in tail:
+        tail = tail.format(index)
+
+    return f"{base.format(keyword=keyword)} — {tail}"
+
+
 def generate_dynamic_title(keyword, index, base_templates, tail_templates):
     base = random.choice(base_templates)
     tail = random.choice(tail_templates)
 
-    if "#" in tail:
-        tail = tail.format(index)
+    return compose_title(keyword, index, base, tail)
+
+
+def title_matches_keyword(title, keyword):
+    """
+    Python mirror of highlight_keyword_in_h1(): the <h1> text, lower-cased,
+    must contain the lower-cased keyword. Holds exactly because the title
+    is HTML-escaped into the page, so the browser's textContent == title.
+    """
+    kw = keyword.lower()
+    return bool(kw) and kw in title.lower()
+
+
+def new_title_stats():
+    return {"attempts": 0, "valid": 0, "fallbacks": 0, "per_template": {}}
 
-    return f"{base.format(keyword=keyword)} — {tail}"
+
+def generate_valid_title(keyword, index, base_templates, tail_templates, stats=None,
+                         max_attempts=MAX_TITLE_ATTEMPTS):
+    """
+    Draw titles until one will match the highlighter, so no browser time is
+    spent on pages that would be skipped. Per-BASE-template match rates are
+    recorded in `stats`. After `max_attempts` misses, falls back to a title
+    that starts with the keyword.
+    """
+    stats = stats if stats is not None else new_title_stats()
+
+    for _ in range(max_attempts):
+        base = random.choice(base_templates)
+        tail = random.choice(tail_templates)
+        try:
+            title = compose_title(keyword, index, base, tail)
+        except (KeyError, IndexError, ValueError):
+            # Template with stray braces
+            title = None
+
+        matched = title is not None and title_matches_keyword(title, keyword)
+
+        entry = stats["per_template"].setdefault(base, {"attempts": 0, "matches": 0})
+        entry["attempts"] += 1
+        stats["attempts"] += 1
+        if matched:
+            entry["matches"] += 1
+            stats["valid"] += 1
+            return title
+
+    stats["fallbacks"] += 1
+    stats["valid"] += 1
+    tail = random.choice(tail_templates) if tail_templates else ""
+    try:
+        return compose_title(keyword, index, "{keyword}", tail)
+    except (KeyError, IndexError, ValueError):
+        # The tail has stray braces too; the keyword alone still matches
+        return keyword
+
+
+def summarize_title_stats(stats):
+    """Add match_rate to each template entry and the totals."""
+    for entry in stats["per_template"].values():
+        entry["match_rate"] = round(entry["matches"] / entry["attempts"], 3) if entry["attempts"] else None
+    stats["match_rate"] = round((stats["valid"] - stats["fallbacks"]) / stats["attempts"], 3) if stats["attempts"] else None
+    return stats
 
 
 # =============================
@@ -274,7 +391,8 @@ def generate_dynamic_title(keyword, index, base_templates, tail_templates):
 # =============================
 # 7. BUILD HTML
 # =============================
-def build_dummy_html(title, keyword, css, image_dir, lorem, font_css, use_varied_fonts=True):
+def build_dummy_html(title, keyword, css, image_dir, lorem, font_css, use_varied_fonts=True, image_files=None,
+                     preblurred=False):
     html = "<html><head>"
     html += css
     
@@ -311,12 +429,15 @@ def build_dummy_html(title, keyword, css, image_dir, lorem, font_css, use_varied
     html += "</head><body>"
     html += f"<div class='tagline'>The Daily Post — your dummy-pages-generated news used for entertainment</div>"
 
-    html += f"<h1>{title}</h1>"
-    html += f"<div class='author'>Written by AI • Keyword: <b>{keyword}</b></div>"
+    # Escaped so the rendered <h1> text is exactly `title` (see title_matches_keyword)
+    html += f"<h1>{html_lib.escape(title, quote=False)}</h1>"
+    html += f"<div class='author'>Written by AI • Keyword: <b>{html_lib.escape(keyword, quote=False)}</b></div>"
 
-    img_file = pick_random_image(image_dir)
+    img_file = pick_random_image(image_dir, image_files)
     if img_file:
-        html += f'<img class="inline" src="../images/{img_file}" alt="img">'
+        # Pre-blurred variants are left out of the capture-time CSS blur
+        marker = " data-preblurred" if preblurred else ""
+        html += f'<img class="inline" src="../images/{img_file}" alt="img"{marker}>'
 
     # Paragraphs
     for _ in range(random.randint(4, 7)):
@@ -337,7 +458,11 @@ def generate_all_pages(
     shared_image_dir,   # src/.../unsplash_images
     template_file,
     css_file,
-    use_varied_fonts=True  # NEW PARAMETER: Font variety toggle
+    use_varied_fonts=True,  # NEW PARAMETER: Font variety toggle
+    assets=None,            # Preloaded load_page_assets() result (batch runs)
+    title_stats=None,       # Optional dict filled with per-template match rates
+    variants_dir=None,      # Pre-resized image variants (see image_variants.py)
+    checkpoint=None         # JobCheckpoint: pages already written are kept on resume
 ):
 
     pages_dir = Path(pages_dir)
@@ -347,18 +472,27 @@ def generate_all_pages(
     pages_dir.mkdir(parents=True, exist_ok=True)
     images_dir.mkdir(parents=True, exist_ok=True)
 
-    # Copy stock images → storage/users/<id>/images/
-    for img in os.listdir(shared_image_dir):
-        if img.lower().endswith((".jpg", ".jpeg", ".png")):
-            shutil.copy(shared_image_dir / img, images_dir / img)
+    # Stock images are picked from the shared library; only the ones a page
+    # actually uses are linked into storage/users/<id>/images/ below
+    shared_images = list_images(shared_image_dir)
 
-    # Load templates + CSS
-    lorem, base, tail, fonts = load_templates(template_file)
-    css = load_css(css_file)
+    # Display-sized variants when built; originals otherwise
+    manifest = load_manifest(variants_dir) if variants_dir else None
+
+    # Load templates + CSS (cached across requests)
+    lorem, base, tail, fonts, css = assets or load_page_assets(template_file, css_file)
 
     generated_files = []
+    stats = title_stats if title_stats is not None else new_title_stats()
 
     for i in range(1, num_pages + 1):
+        outfile = pages_dir / f"page_{i}.html"
+        if checkpoint and checkpoint.is_done(outfile):
+            # Pages are random: regenerating one would invalidate its snapshot
+            generated_files.append(str(outfile))
+            print(f"Kept page {i} from checkpoint")
+            continue
+
         # Get font configuration
         primary_font, secondary_font, font_style = get_font_configuration(
             fonts, 
@@ -374,19 +508,33 @@ def generate_all_pages(
         )
         
         # Generate title and HTML
-        title = generate_dynamic_title(keyword, i, base, tail)
+        title = generate_valid_title(keyword, i, base, tail, stats)
+        img_file = pick_random_image(shared_image_dir, shared_images)
+        variant = pick_variant(manifest, img_file) if img_file else None
+        if variant:
+            img_file = variant["file"]
+            link_or_copy(Path(variants_dir) / img_file, images_dir / img_file)
+        elif img_file:
+            link_or_copy(shared_image_dir / img_file, images_dir / img_file)
+
         html = build_dummy_html(
             title, keyword, css, images_dir, lorem, font_css,
-            use_varied_fonts=use_varied_fonts
+            use_varied_fonts=use_varied_fonts,
+            image_files=[img_file] if img_file else [],
+            preblurred=bool(variant and variant["preblurred"])
         )
 
-        outfile = pages_dir / f"page_{i}.html"
         outfile.write_text(html, encoding="utf-8")
         generated_files.append(str(outfile))
+        if checkpoint:
+            checkpoint.record(outfile, "pages")
         
         if use_varied_fonts:
             print(f"Generated page {i}: {title} | Fonts: {primary_font.split(',')[0]} + {secondary_font.split(',')[0]} | Style: {font_style}")
         else:
             print(f"Generated page {i}: {title} | Using default fonts")
 
+    summarize_title_stats(stats)
+    print(f"Title match rate: {stats['match_rate']} over {stats['attempts']} draws, {stats['fallbacks']} fallback(s)")
+
     return generated_files
\ No newline at end of file
@@ -0,0 +1,198 @@
+# src/p01_dummy_pages_generator/image_variants.py
+
+import argparse
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from src.utils.file_utils import SHARED_IMAGES_DIR, IMAGE_VARIANTS_DIR
+
+
+# Pages are 420 CSS px wide and captured at device_scale_factor=3, so no
+# image is ever shown wider than 1260 device pixels.
+DISPLAY_WIDTH = int(os.getenv("IMAGE_VARIANT_WIDTH", "1260"))
+
+# Screenhoter blurs everything but the highlight with `blur(6px)`; at DPR 3
+# that is a Gaussian of ~18 device pixels.
+PREBLUR_RADIUS = float(os.getenv("IMAGE_VARIANT_BLUR_RADIUS", "18"))
+
+VARIANT_FORMATS = {
+    "webp": {"ext": ".webp", "pil": "WEBP", "options": {"quality": 80, "method": 4}},
+    "jpeg": {"ext": ".jpg", "pil": "JPEG", "options": {"quality": 82, "optimize": True, "progressive": True}},
+}
+
+# Which variant pages reference: display | blurred | off (original files)
+IMAGE_VARIANT = os.getenv("IMAGE_VARIANT", "display").lower()
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "webp").lower()
+
+MANIFEST_NAME = "manifest.json"
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+# =============================
+# 1. BUILD
+# =============================
+def _settings(formats, preblur):
+    return {"display_width": DISPLAY_WIDTH, "blur_radius": PREBLUR_RADIUS if preblur else None,
+            "formats": sorted(formats)}
+
+
+def _read_manifest(variants_dir):
+    path = Path(variants_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {"settings": None, "images": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(variants_dir, manifest):
+    path = Path(variants_dir) / MANIFEST_NAME
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _save_variant(img, out_path, fmt):
+    spec = VARIANT_FORMATS[fmt]
+    img.save(out_path, format=spec["pil"], **spec["options"])
+    return {"file": out_path.name, "width": img.width, "height": img.height,
+            "bytes": out_path.stat().st_size}
+
+
+def _build_one(src_path, variants_dir, formats, preblur):
+    from PIL import Image, ImageFilter, ImageOps
+
+    with Image.open(src_path) as img:
+        source_size = img.size
+        # Let the JPEG decoder skip detail we are about to throw away
+        img.draft("RGB", (DISPLAY_WIDTH, DISPLAY_WIDTH * 4))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        if img.width > DISPLAY_WIDTH:
+            img = img.resize((DISPLAY_WIDTH, round(img.height * DISPLAY_WIDTH / img.width)), Image.LANCZOS)
+
+    blurred = img.filter(ImageFilter.GaussianBlur(PREBLUR_RADIUS)) if preblur else None
+
+    entry = {"source_width": source_size[0], "source_height": source_size[1], "variants": {}}
+    stem = src_path.stem
+    for fmt in formats:
+        ext = VARIANT_FORMATS[fmt]["ext"]
+        entry["variants"][f"display.{fmt}"] = _save_variant(img, variants_dir / f"{stem}.display{ext}", fmt)
+        if blurred is not None:
+            entry["variants"][f"blurred.{fmt}"] = _save_variant(blurred, variants_dir / f"{stem}.blurred{ext}", fmt)
+    return entry
+
+
+def build_variants(source_dir=SHARED_IMAGES_DIR, variants_dir=IMAGE_VARIANTS_DIR,
+                   formats=("webp",), preblur=True, force=False):
+    """
+    Build display-sized (and optionally pre-blurred) variants of every
+    source image, plus manifest.json with their dimensions and sizes.
+
+    Incremental: images whose size/mtime and the build settings are
+    unchanged are skipped, and variants of deleted sources are removed.
+    Returns (built, skipped, removed) counts.
+    """
+    unknown = set(formats) - set(VARIANT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown variant formats: {', '.join(sorted(unknown))}")
+
+    source_dir, variants_dir = Path(source_dir), Path(variants_dir)
+    variants_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = _read_manifest(variants_dir)
+    settings = _settings(formats, preblur)
+    if manifest.get("settings") != settings:
+        force = True
+    old_images = manifest.get("images", {})
+    images = {}
+    built = skipped = 0
+
+    for src_path in sorted(source_dir.iterdir()):
+        if not src_path.name.lower().endswith(SOURCE_EXTENSIONS):
+            continue
+        stat = src_path.stat()
+        old = old_images.get(src_path.name)
+        if (not force and old and old.get("source_mtime") == stat.st_mtime
+                and old.get("source_bytes") == stat.st_size
+                and all((variants_dir / v["file"]).exists() for v in old["variants"].values())):
+            images[src_path.name] = old
+            skipped += 1
+            continue
+
+        entry = _build_one(src_path, variants_dir, formats, preblur)
+        entry.update(source_mtime=stat.st_mtime, source_bytes=stat.st_size)
+        images[src_path.name] = entry
+        built += 1
+        print(f"🖼️  {src_path.name}: {stat.st_size // 1024} KB → "
+              + ", ".join(f"{k} {v['bytes'] // 1024} KB" for k, v in entry["variants"].items()))
+
+    # Drop variants whose source is gone (or that the new settings no longer produce)
+    keep = {v["file"] for entry in images.values() for v in entry["variants"].values()}
+    removed = 0
+    for entry in old_images.values():
+        for v in entry["variants"].values():
+            if v["file"] not in keep and (variants_dir / v["file"]).exists():
+                (variants_dir / v["file"]).unlink()
+                removed += 1
+
+    _write_manifest(variants_dir, {"settings": settings, "images": images})
+    print(f"✅ Image variants: {built} built, {skipped} up to date, {removed} removed → {variants_dir}")
+    return built, skipped, removed
+
+
+# =============================
+# 2. LOOKUP (used by the generator)
+# =============================
+@lru_cache(maxsize=4)
+def _load_manifest(variants_dir, manifest_mtime):
+    return _read_manifest(variants_dir)
+
+
+def load_manifest(variants_dir=IMAGE_VARIANTS_DIR):
+    """Parsed manifest, cached until the file changes. None if not built."""
+    path = Path(variants_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    return _load_manifest(str(variants_dir), os.path.getmtime(path))
+
+
+def pick_variant(manifest, image_name, variant=IMAGE_VARIANT, fmt=IMAGE_VARIANT_FORMAT):
+    """
+    Manifest entry {"file", "width", "height", "bytes", "preblurred"} to use
+    for a source image, or None to fall back to the original file.
+    """
+    if not manifest or variant == "off":
+        return None
+    variants = manifest["images"].get(image_name, {}).get("variants", {})
+
+    chosen = variants.get(f"{variant}.{fmt}")
+    if chosen is None and variant == "blurred":
+        # Not built with pre-blur: the display size still saves the decode
+        variant = "display"
+        chosen = variants.get(f"display.{fmt}")
+    if chosen is None:
+        return None
+    return {**chosen, "preblurred": variant == "blurred"}
+
+
+# =============================
+# 3. CLI
+# =============================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build display-sized variants of the stock image library")
+    parser.add_argument("--source", default=str(SHARED_IMAGES_DIR))
+    parser.add_argument("--output", default=str(IMAGE_VARIANTS_DIR))
+    parser.add_argument("--formats", default="webp,jpeg", help="Comma-separated: webp,jpeg")
+    parser.add_argument("--no-preblur", action="store_true", help="Skip the pre-blurred variants")
+    parser.add_argument("--force", action="store_true", help="Rebuild everything")
+    args = parser.parse_args()
+
+    build_variants(
+        source_dir=args.source,
+        variants_dir=args.output,
+        formats=tuple(f.strip() for f in args.formats.split(",") if f.strip()),
+        preblur=not args.no_preblur,
+        force=args.force,
+    )
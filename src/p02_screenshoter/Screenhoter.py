@@ -2,27 +2,54 @@
 
 import asyncio
 import math
+import os
+import re
 from pathlib import Path
-from playwright.async_api import async_playwright
-import nest_asyncio
 
-nest_asyncio.apply()
+from .blur_compositor import composite_batch, COMPOSITE_BATCH_SIZE
+
+# Playwright is imported inside the functions that launch a browser so that
+# importing this module (e.g. from main.py) stays cheap.
 
 
 CAMERA_WIDTH = 420
 CAMERA_HEIGHT = 800
+DEVICE_SCALE_FACTOR = 3
+
+# css:       blur every element with CSS filters, screenshot the result
+# composite: screenshot the sharp clip, blur it afterwards in Python
+#            (blur_compositor.py); far less raster work for Chromium
+CAPTURE_MODES = ("css", "composite")
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "css").lower()
+
+# browser: Playwright/Chromium; pillow: pillow_renderer.py draws the
+# headline template directly (no browser process)
+RENDERERS = ("browser", "pillow")
+
+
+def safe_filename_part(text):
+    """Keyword as a filename fragment (no path separators or shell-hostile characters)."""
+    return re.sub(r"[^\w\-]+", "_", text).strip("_")[:60] or "keyword"
+
+
+def snapshot_path(file_path, keyword, output_dir):
+    """Where the screenshot of one page is saved."""
+    return Path(output_dir) / f"{Path(file_path).stem}_{safe_filename_part(keyword)}.png"
 
 
 # -------------------------------------------------
 # Highlight Keyword
 # -------------------------------------------------
-async def highlight_keyword_in_h1(page, keyword):
-    js = f"""
-    (() => {{
-        const kw = "{keyword}".toLowerCase();
+async def highlight_keyword_in_h1(page, keyword, blur_chars=True):
+    # The keyword is passed as an argument rather than spliced into the
+    # source, so quotes/backslashes in it cannot break the script.
+    # blur_chars=False leaves the heading text sharp (composite mode).
+    js = """
+    ([keyword, blurChars]) => {
+        const kw = keyword.toLowerCase();
         let count = 0;
 
-        document.querySelectorAll("h1").forEach(h1 => {{
+        document.querySelectorAll("h1").forEach(h1 => {
             const text = h1.textContent;
             const lower = text.toLowerCase();
             const idx = lower.indexOf(kw);
@@ -35,12 +62,13 @@ async def highlight_keyword_in_h1(page, keyword):
             const newH1 = document.createElement("h1");
 
             // Blur before
-            for (let c of before) {{
+            if (!blurChars) newH1.append(before);
+            else for (let c of before) {
                 const span = document.createElement("span");
                 span.textContent = c;
                 span.style.filter = "blur(4px)";
                 newH1.appendChild(span);
-            }}
+            }
 
             // Highlight
             const mark = document.createElement("mark");
@@ -52,36 +80,43 @@ async def highlight_keyword_in_h1(page, keyword):
             newH1.appendChild(mark);
 
             // Blur after
-            for (let c of after) {{
+            if (!blurChars) newH1.append(after);
+            else for (let c of after) {
                 const span = document.createElement("span");
                 span.textContent = c;
                 span.style.filter = "blur(4px)";
                 newH1.appendChild(span);
-            }}
+            }
 
             h1.replaceWith(newH1);
             count++;
-        }});
+        });
 
         return count;
-    }})();
+    }
     """
-    return await page.evaluate(js)
+    return await page.evaluate(js, [keyword, blur_chars])
 
 
 # -------------------------------------------------
 # Process Single Page
 # -------------------------------------------------
-async def process_page(page, file_path: Path, keyword: str, output_dir: Path):
+async def process_page(page, file_path: Path, keyword: str, output_dir: Path, capture_mode: str = "css"):
+    """
+    Highlight the keyword and capture the clip around it. In "css" mode the
+    saved PNG path is returned; in "composite" mode a frame dict for
+    composite_batch() is returned and nothing is written yet.
+    """
 
     print(f"Processing: {file_path.name}")
 
     url = file_path.resolve().as_uri()
     await page.goto(url)
 
-    found = await highlight_keyword_in_h1(page, keyword)
+    composite = capture_mode == "composite"
+    found = await highlight_keyword_in_h1(page, keyword, blur_chars=not composite)
     if found == 0:
-        print(f"  No <h1> containing keyword → skipped")
+        print("  No <h1> containing keyword → skipped")
         return None
 
     print(f"  Highlighted {found} <h1>")
@@ -97,15 +132,17 @@ async def process_page(page, file_path: Path, keyword: str, output_dir: Path):
         print("  Cannot read bounding box")
         return None
 
-    # Blur everything except highlighted area
-    await page.evaluate("""
-        document.querySelectorAll('body *').forEach(el => {
-            if (!el.querySelector("mark[data-auto]") &&
-                !el.matches("mark[data-auto]")) {
-                el.style.filter = "blur(6px)";
-            }
-        });
-    """)
+    if not composite:
+        # Blur everything except highlighted area
+        await page.evaluate("""
+            document.querySelectorAll('body *').forEach(el => {
+                if (!el.querySelector("mark[data-auto]") &&
+                    !el.matches("mark[data-auto]") &&
+                    !el.matches("img[data-preblurred]")) {
+                    el.style.filter = "blur(6px)";
+                }
+            });
+        """)
 
     center_x = box["x"] + box["width"] / 2
     center_y = box["y"] + box["height"] / 2
@@ -119,7 +156,19 @@ async def process_page(page, file_path: Path, keyword: str, output_dir: Path):
 
     # Save output
     output_dir.mkdir(parents=True, exist_ok=True)
-    save_path = output_dir / f"{file_path.stem}_{keyword}.png"
+    save_path = snapshot_path(file_path, keyword, output_dir)
+
+    if composite:
+        preblurred = await page.evaluate("""() =>
+            [...document.querySelectorAll("img[data-preblurred]")].map(img => {
+                const r = img.getBoundingClientRect();
+                return {x: r.x, y: r.y, width: r.width, height: r.height};
+            })
+        """)
+        png = await page.screenshot(clip=clip)
+        print("  Captured sharp clip →", save_path.name)
+        return {"png": png, "clip": clip, "mark": box, "preblurred": preblurred,
+                "scale": DEVICE_SCALE_FACTOR, "save_path": save_path}
 
     await page.screenshot(path=str(save_path), clip=clip)
     print("  Saved →", save_path)
@@ -128,15 +177,23 @@ async def process_page(page, file_path: Path, keyword: str, output_dir: Path):
 
 
 # -------------------------------------------------
-# Main Function (YOU CALL THIS)
+# Capture With An Existing Browser
 # -------------------------------------------------
-async def run_snapshot_processing(pages_dir: str, output_dir: str, keyword: str):
+async def capture_pages(browser, pages_dir, output_dir, keyword: str, on_snapshot=None, profiler=None,
+                        capture_mode=None, checkpoint=None):
     """
-    pages_dir: folder containing .html pages
-    output_dir: folder to save screenshots
-    keyword: highlight keyword
+    Screenshot every page in pages_dir using an already-launched browser.
+    Lets batch runs share one Chromium across many keywords.
+    on_snapshot(path) is called as each screenshot is saved (progressive output).
+    profiler (JobProfiler) records a DevTools trace and metrics per page.
+    capture_mode is "css" or "composite" (defaults to CAPTURE_MODE).
+    checkpoint (JobCheckpoint) skips pages whose snapshot survived a restart.
     """
 
+    capture_mode = capture_mode or CAPTURE_MODE
+    if capture_mode not in CAPTURE_MODES:
+        raise ValueError(f"Unknown capture_mode: {capture_mode}")
+
     pages_dir = Path(pages_dir)
     output_dir = Path(output_dir)
 
@@ -146,22 +203,139 @@ async def run_snapshot_processing(pages_dir: str, output_dir: str, keyword: str)
         return []
 
     results = []
+    sources = {}
+
+    def collect(path):
+        results.append(path)
+        if checkpoint and str(path) in sources:
+            checkpoint.record(path, "snapshots", source=sources[str(path)])
+        if on_snapshot:
+            on_snapshot(path)
+
+    # Composite mode: sharp frames are blurred in batches on a worker thread
+    # while the browser moves on (one batch in flight keeps the order)
+    pending = []
+    composite_task = None
+
+    async def composite(batch):
+        for path in await asyncio.to_thread(composite_batch, batch):
+            collect(path)
+
+    context = await browser.new_context(
+        viewport={"width": 1680, "height": 3200},
+        device_scale_factor=DEVICE_SCALE_FACTOR
+    )
+
+    try:
+        page = await context.new_page()
+
+        for html in html_files:
+            if checkpoint and checkpoint.is_done(snapshot_path(html, keyword, output_dir), source=html):
+                # Captured before a restart; flush in-flight frames first to keep the order
+                if composite_task:
+                    await composite_task
+                    composite_task = None
+                if pending:
+                    await composite(pending)
+                    pending = []
+                print(f"Kept snapshot of {html.name} from checkpoint")
+                collect(str(snapshot_path(html, keyword, output_dir)))
+                continue
+
+            if profiler:
+                async with profiler.trace_page(page, html.stem):
+                    result = await process_page(page, html, keyword, output_dir, capture_mode)
+            else:
+                result = await process_page(page, html, keyword, output_dir, capture_mode)
+            if not result:
+                continue
+            sources[str(result if capture_mode != "composite" else result["save_path"])] = html
+
+            if capture_mode != "composite":
+                collect(result)
+                continue
+
+            pending.append(result)
+            if len(pending) >= COMPOSITE_BATCH_SIZE:
+                if composite_task:
+                    await composite_task
+                composite_task = asyncio.create_task(composite(pending))
+                pending = []
+    finally:
+        await context.close()
+
+    if composite_task:
+        await composite_task
+    if pending:
+        await composite(pending)
+
+    return results
+
+
+# -------------------------------------------------
+# Main Function (YOU CALL THIS)
+# -------------------------------------------------
+async def run_snapshot_processing(pages_dir: str, output_dir: str, keyword: str, on_snapshot=None,
+                                  profiler=None, capture_mode=None, checkpoint=None):
+    """
+    pages_dir: folder containing .html pages
+    output_dir: folder to save screenshots
+    keyword: highlight keyword
+    on_snapshot: optional callback(path) per saved screenshot
+    capture_mode: "css" | "composite" (see CAPTURE_MODES)
+    """
+
+    if not list(Path(pages_dir).glob("*.html")):
+        print("No HTML files found for snapshot processing.")
+        return []
+
+    from playwright.async_api import async_playwright
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
+        try:
+            return await capture_pages(browser, pages_dir, output_dir, keyword, on_snapshot, profiler,
+                                       capture_mode, checkpoint)
+        finally:
+            await browser.close()
 
-        context = await browser.new_context(
-            viewport={"width": 1680, "height": 3200},
-            device_scale_factor=3
-        )
 
-        page = await context.new_page()
+# -------------------------------------------------
+# Sync Entry Point (FastAPI handlers / workers)
+# -------------------------------------------------
+def run_snapshot_processing_sync(pages_dir: str, output_dir: str, keyword: str, on_snapshot=None,
+                                 profiler=None, capture_mode=None, renderer=None, checkpoint=None):
+    """
+    Blocking wrapper around the capture step.
 
-        for html in html_files:
-            result = await process_page(page, html, keyword, output_dir)
-            if result:
-                results.append(result)
+    Uses the pre-warmed browser pool when it is running; otherwise launches
+    a one-off browser. nest_asyncio is only applied when called from inside
+    a running event loop (e.g. a notebook), instead of at import time.
+    renderer="pillow" skips the browser entirely (see pillow_renderer.py).
+    """
+    from src.utils.pipeline_stubs import stubbed, stub_snapshot_processing
+    if stubbed("snapshots"):
+        return stub_snapshot_processing(pages_dir, output_dir, keyword, on_snapshot)
+
+    if renderer == "pillow":
+        from .pillow_renderer import render_pages
+        return render_pages(pages_dir, output_dir, keyword, on_snapshot, checkpoint)
+
+    from .browser_pool import browser_pool
+
+    if browser_pool.started:
+        return browser_pool.run(
+            lambda browser: capture_pages(browser, pages_dir, output_dir, keyword, on_snapshot, profiler,
+                                          capture_mode, checkpoint)
+        )
 
-        await browser.close()
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        import nest_asyncio
+        nest_asyncio.apply()
 
-    return results
\ No newline at end of file
+    return asyncio.run(run_snapshot_processing(pages_dir, output_dir, keyword, on_snapshot, profiler,
+                                               capture_mode, checkpoint))
@@ -0,0 +1,125 @@
+# src/p02_screenshoter/blur_compositor.py
+
+import io
+import os
+
+
+# CSS blur radius of the "css" capture mode, in CSS pixels: filter: blur(6px)
+# on every element. The <h1> characters get blur(4px) first, but they match
+# `body *` too and that pass overwrites it, so the heading renders at 6px.
+BODY_BLUR_CSS_PX = 6
+
+# Frames composited together in one vectorized pass
+COMPOSITE_BATCH_SIZE = int(os.getenv("COMPOSITE_BATCH_SIZE", "4"))
+
+
+def _box_sizes_for_gauss(sigma, n=3):
+    """Widths of n box blurs approximating a Gaussian of std dev `sigma`."""
+    w_ideal = (12 * sigma * sigma / n + 1) ** 0.5
+    wl = int(w_ideal)
+    if wl % 2 == 0:
+        wl -= 1
+    wu = wl + 2
+    m = round((12 * sigma * sigma - n * wl * wl - 4 * n * wl - 3 * n) / (-4 * wl - 4))
+    return [wl if i < m else wu for i in range(n)]
+
+
+def _box_blur_axis(np, a, radius, axis):
+    """Running-sum box blur of a (N, H, W, C) array along `axis`, edges clamped."""
+    if radius < 1:
+        return a
+    n = a.shape[axis]
+    pad = [(0, 0)] * a.ndim
+    pad[axis] = (radius + 1, radius)
+    csum = np.cumsum(np.pad(a, pad, mode="edge"), axis=axis, dtype=np.float32)
+
+    hi = [slice(None)] * a.ndim
+    lo = [slice(None)] * a.ndim
+    hi[axis] = slice(2 * radius + 1, 2 * radius + 1 + n)
+    lo[axis] = slice(0, n)
+    return (csum[tuple(hi)] - csum[tuple(lo)]) / (2 * radius + 1)
+
+
+def gaussian_blur_batch(frames, sigma):
+    """
+    Blur a list of same-sized RGB PIL images with one NumPy pass over the
+    stacked batch (three separable box blurs ≈ Gaussian). Falls back to
+    Pillow's per-frame GaussianBlur when NumPy is not installed.
+    """
+    from PIL import Image, ImageFilter
+
+    try:
+        import numpy as np
+    except ImportError:
+        return [f.filter(ImageFilter.GaussianBlur(sigma)) for f in frames]
+
+    stack = np.stack([np.asarray(f, dtype=np.float32) for f in frames])
+    for width in _box_sizes_for_gauss(sigma):
+        radius = (width - 1) // 2
+        stack = _box_blur_axis(np, stack, radius, axis=1)
+        stack = _box_blur_axis(np, stack, radius, axis=2)
+
+    out = np.clip(stack + 0.5, 0, 255).astype(np.uint8)
+    return [Image.fromarray(frame, "RGB") for frame in out]
+
+
+def _to_pixels(box, clip, scale, size):
+    """CSS-pixel page box → device-pixel box inside the clipped screenshot."""
+    left = round((box["x"] - clip["x"]) * scale)
+    top = round((box["y"] - clip["y"]) * scale)
+    right = round((box["x"] + box["width"] - clip["x"]) * scale)
+    bottom = round((box["y"] + box["height"] - clip["y"]) * scale)
+    left, right = max(0, left), min(size[0], right)
+    top, bottom = max(0, top), min(size[1], bottom)
+    if right <= left or bottom <= top:
+        return None
+    return left, top, right, bottom
+
+
+def composite_batch(frames):
+    """
+    Turn sharp clip screenshots into the blurred look of the "css" mode.
+
+    Each frame is a dict from process_page(capture_mode="composite") or the
+    Pillow renderer: {"png" | "image", "clip", "mark", "preblurred", "scale",
+    "save_path"}. Everything is blurred, then the keyword <mark> and the
+    `preblurred` boxes (img[data-preblurred], which CSS mode leaves alone)
+    are pasted back from the sharp frame. The blur runs at CSS-pixel resolution
+    (1/scale) and is upscaled: a 6px Gaussian leaves no detail finer than
+    that, and it is `scale`² less work. Returns the saved paths in order.
+    """
+    from PIL import Image
+
+    if not frames:
+        return []
+
+    # Frames carry screenshot bytes ("png") or an already-drawn PIL image ("image")
+    sharp = [f["image"] if "image" in f else Image.open(io.BytesIO(f["png"])).convert("RGB") for f in frames]
+
+    # Group by (size, scale) so each stack is uniform (clips are all the same size in practice)
+    groups = {}
+    for i, (frame, img) in enumerate(zip(frames, sharp)):
+        groups.setdefault((img.size, frame["scale"]), []).append(i)
+
+    body = [None] * len(frames)
+    for (size, scale), indices in groups.items():
+        factor = max(1, int(round(scale)))
+        small = [sharp[i].reduce(factor) if factor > 1 else sharp[i] for i in indices]
+        for i, img in zip(indices, gaussian_blur_batch(small, BODY_BLUR_CSS_PX)):
+            body[i] = img.resize(size, Image.BILINEAR)
+
+    saved = []
+    for frame, img, out in zip(frames, sharp, body):
+        # Already blurred at build time; blurring again would double it
+        for box in frame.get("preblurred", ()):
+            image_box = _to_pixels(box, frame["clip"], frame["scale"], img.size)
+            if image_box:
+                out.paste(img.crop(image_box), image_box[:2])
+
+        mark_box = _to_pixels(frame["mark"], frame["clip"], frame["scale"], img.size)
+        if mark_box:
+            out.paste(img.crop(mark_box), mark_box[:2])
+
+        out.save(frame["save_path"], format="PNG")
+        saved.append(str(frame["save_path"]))
+    return saved
@@ -0,0 +1,94 @@
+# src/p02_screenshoter/browser_pool.py
+
+import asyncio
+import os
+import threading
+
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+
+
+class BrowserPool:
+    """
+    Long-lived Chromium instances owned by one background event loop.
+
+    Playwright objects are bound to the loop that created them, so the pool
+    runs its own loop in a daemon thread and callers from any thread submit
+    work with run(). This removes the per-request browser launch and the
+    asyncio.run() inside sync FastAPI handlers.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE):
+        self.size = max(1, size)
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browsers = None   # asyncio.Queue of idle browsers
+        self._all = []
+        self._lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        """Launch the loop thread and browsers. Safe to call more than once."""
+        with self._lock:
+            if self.started:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._launch(), self._loop).result()
+            self.started = True
+            print(f"🌐 Browser pool ready ({self.size} Chromium instance(s))")
+
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        self._browsers = asyncio.Queue()
+        for _ in range(self.size):
+            browser = await self._playwright.chromium.launch(headless=True)
+            self._all.append(browser)
+            self._browsers.put_nowait(browser)
+
+    async def _with_browser(self, fn):
+        browser = await self._browsers.get()
+        try:
+            if not browser.is_connected():
+                # Chromium crashed (OOM...): replace it before use
+                browser = await self._playwright.chromium.launch(headless=True)
+                self._all.append(browser)
+            return await fn(browser)
+        finally:
+            self._browsers.put_nowait(browser)
+
+    def run(self, fn, timeout=None):
+        """
+        Run `await fn(browser)` on a pooled browser and return its result.
+        Blocks the calling thread; must not be called from the pool's own loop.
+        """
+        if not self.started:
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(self._with_browser(fn), self._loop)
+        return future.result(timeout)
+
+    def stop(self):
+        with self._lock:
+            if not self.started:
+                return
+
+            async def _close():
+                for browser in self._all:
+                    try:
+                        await browser.close()
+                    except Exception:
+                        pass
+                await self._playwright.stop()
+
+            asyncio.run_coroutine_threadsafe(_close(), self._loop).result(timeout=30)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._all = []
+            self.started = False
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,736 @@
+# src/p02_screenshoter/pillow_renderer.py
+
+import argparse
+import math
+import os
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+from pathlib import Path
+
+from src.utils.file_utils import SOURCE_ROOT
+from .blur_compositor import composite_batch, COMPOSITE_BATCH_SIZE
+
+
+# Must match Screenhoter: 1680px viewport at device_scale_factor=3 and a
+# 420x800 CSS-pixel camera clip centred on the highlighted keyword.
+VIEWPORT_WIDTH = 1680
+SCALE = 3
+CAMERA_WIDTH = 420
+CAMERA_HEIGHT = 800
+
+# 01_medium_headline.css: body { max-width: 420px; margin: auto; padding: 16px }
+BODY_WIDTH = 420
+BODY_PADDING = 16
+ROOT_FONT_SIZE = 16
+
+# Fonts shipped with the app (the Google Fonts families the pages load, see
+# fonts/README.txt); system folders are searched next and DejaVu is the last
+# resort for the other families.
+FONT_DIR = Path(os.getenv("RENDERER_FONT_DIR", str(SOURCE_ROOT / "p02_screenshoter" / "fonts")))
+SYSTEM_FONT_DIRS = ("/usr/share/fonts", "/usr/local/share/fonts", "/Library/Fonts", "C:/Windows/Fonts")
+
+# Shipped in FONT_DIR: a missing file is a broken install, never substituted
+BUNDLED_FAMILIES = ("poppins", "merriweather", "inter", "open sans")
+
+# Minimum mean similarity for compare_renderers() to pass
+SIMILARITY_THRESHOLD = float(os.getenv("RENDERER_SIMILARITY_THRESHOLD", "0.85"))
+
+# CSS family → (regular, bold, italic) file stems. Variable fonts ("[...wght]")
+# get the CSS weight on their axes; "-Regular" families also try the static
+# file for the exact weight first (Poppins-SemiBold, Poppins-LightItalic).
+FAMILY_FILES = {
+    "poppins": ("Poppins-Regular", "Poppins-Bold", "Poppins-Italic"),
+    "merriweather": ("Merriweather[opsz,wdth,wght]", "Merriweather[opsz,wdth,wght]",
+                     "Merriweather-Italic[opsz,wdth,wght]"),
+    "inter": ("Inter[opsz,wght]", "Inter[opsz,wght]", "Inter-Italic[opsz,wght]"),
+    "open sans": ("OpenSans[wdth,wght]", "OpenSans[wdth,wght]", "OpenSans-Italic[wdth,wght]"),
+    "georgia": ("georgia", "georgiab", "georgiai"),
+    "arial": ("arial", "arialbd", "ariali"),
+    "verdana": ("verdana", "verdanab", "verdanai"),
+    "times new roman": ("times", "timesbd", "timesi"),
+    "courier new": ("cour", "courbd", "couri"),
+}
+GENERIC_FILES = {
+    "serif": ("DejaVuSerif", "DejaVuSerif-Bold", "DejaVuSerif-Italic"),
+    "sans-serif": ("DejaVuSans", "DejaVuSans-Bold", "DejaVuSans-Oblique"),
+    "monospace": ("DejaVuSansMono", "DejaVuSansMono-Bold", "DejaVuSansMono-Oblique"),
+}
+SERIF_FAMILIES = ("georgia", "times", "palatino", "garamond", "merriweather", "book antiqua")
+WEIGHT_NAMES = {100: "Thin", 200: "ExtraLight", 300: "Light", 400: "Regular", 500: "Medium",
+                600: "SemiBold", 700: "Bold", 800: "ExtraBold", 900: "Black"}
+
+INHERITED = ("font-family", "font-size", "font-weight", "font-style", "line-height",
+             "color", "text-align", "text-transform", "letter-spacing")
+
+
+# =============================
+# 1. PARSE THE GENERATED PAGE
+# =============================
+VOID_TAGS = ("img", "link", "meta", "br", "hr", "input")
+
+
+class _PageParser(HTMLParser):
+    """Pulls the fixed headline-template structure out of a generated page."""
+
+    def __init__(self):
+        super().__init__()
+        self.styles, self.paragraphs = [], []
+        self.tagline = self.title = self.author = self.author_keyword = ""
+        self.image = self.image_size = None
+        self.image_preblurred = False
+        self._stack = []   # (tag, name) — divs are named by their class
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "img" and "inline" in (attrs.get("class") or ""):
+            self.image = attrs.get("src")
+            self.image_preblurred = "data-preblurred" in attrs
+        if tag in VOID_TAGS:
+            return
+        if tag == "p":
+            self.paragraphs.append("")
+        name = (attrs.get("class") or tag) if tag == "div" else tag
+        self._stack.append((tag, name))
+
+    def handle_endtag(self, tag):
+        while self._stack:
+            if self._stack.pop()[0] == tag:
+                break
+
+    def handle_data(self, data):
+        names = [name for _, name in self._stack]
+        where = names[-1] if names else None
+        if where == "style":
+            self.styles.append(data)
+        elif where == "tagline":
+            self.tagline += data
+        elif where == "h1":
+            self.title += data
+        elif where == "author":
+            self.author += data
+        elif where == "b" and "author" in names:
+            self.author_keyword += data
+        elif where == "p":
+            self.paragraphs[-1] += data
+
+
+# =============================
+# 2. MINIMAL CSS CASCADE
+# =============================
+# Only what the headline template uses: type/class selectors, px/rem/em
+# lengths, margin/padding shorthands, and inheritance of font properties.
+SELECTOR_SPECIFICITY = {"*": 0, "body": 1, "div": 1, "h1": 1, "p": 1, "b": 1, "strong": 1,
+                        ".tagline": 10, ".author": 10, "img.inline": 11}
+ELEMENT_SELECTORS = {
+    "body": ("*", "body"),
+    "tagline": ("*", "div", ".tagline"),
+    "h1": ("*", "h1"),
+    "author": ("*", "div", ".author"),
+    "author_b": ("*", "b", "strong"),
+    "p": ("*", "p"),
+    "img": ("*", "img.inline"),
+}
+UA_DEFAULTS = {
+    "body": {"font-size": "16px", "line-height": "normal", "color": "#000", "font-family": "serif"},
+    "h1": {"font-weight": "700"},
+    "author_b": {"font-weight": "700"},
+}
+
+
+def parse_css(css_texts):
+    css = re.sub(r"/\*.*?\*/", "", "\n".join(css_texts), flags=re.S)
+    css = re.sub(r"@import[^;]+;", "", css)
+    rules = []
+    for selectors, body in re.findall(r"([^{}]+)\{([^{}]*)\}", css):
+        decls = []
+        for decl in body.split(";"):
+            if ":" in decl:
+                name, value = decl.split(":", 1)
+                decls.append((name.strip().lower(), value.strip()))
+        for selector in selectors.split(","):
+            rules.append((selector.strip(), decls))
+    return rules
+
+
+def _length(value, font_size, default=0.0):
+    value = (value or "").strip()
+    m = re.match(r"^(-?[\d.]+)(px|rem|em)?$", value)
+    if not m:
+        return default
+    number, unit = float(m.group(1)), m.group(2)
+    if unit == "rem":
+        return number * ROOT_FONT_SIZE
+    if unit == "em":
+        return number * font_size
+    return number
+
+
+def _edges(value, font_size):
+    """margin/padding shorthand → {top, right, bottom, left}."""
+    parts = [_length(p, font_size) for p in value.split()] or [0.0]
+    if len(parts) == 1:
+        parts = parts * 4
+    elif len(parts) == 2:
+        parts = [parts[0], parts[1], parts[0], parts[1]]
+    elif len(parts) == 3:
+        parts = [parts[0], parts[1], parts[2], parts[1]]
+    return dict(zip(("top", "right", "bottom", "left"), parts[:4]))
+
+
+def compute_style(element, rules, parent=None):
+    """Cascaded + inherited style for one template element, lengths in CSS px."""
+    selectors = ELEMENT_SELECTORS[element]
+    matched = sorted(
+        ((SELECTOR_SPECIFICITY.get(sel, 1), order, decls)
+         for order, (sel, decls) in enumerate(rules) if sel in selectors),
+        key=lambda r: (r[0], r[1]),
+    )
+
+    raw = {k: v for k, v in (parent or {}).get("_raw", {}).items() if k in INHERITED}
+    if parent:
+        # font-size and letter-spacing inherit as computed lengths, not the parent's em/rem text
+        raw["font-size"] = f"{parent['font_size']}px"
+        raw["letter-spacing"] = f"{parent['letter_spacing']}px"
+    raw.update(UA_DEFAULTS.get(element, {}))
+    for _, _, decls in matched:
+        for name, value in decls:
+            if name in ("margin", "padding"):
+                # Shorthand resets longhands declared earlier
+                for side in ("top", "right", "bottom", "left"):
+                    raw.pop(f"{name}-{side}", None)
+            raw[name] = value
+
+    parent_size = parent["font_size"] if parent else ROOT_FONT_SIZE
+    font_size = _length(raw.get("font-size"), parent_size, parent_size)
+
+    line_height = raw.get("line-height", "normal")
+    if re.match(r"^[\d.]+$", line_height):
+        line_height = float(line_height) * font_size
+    elif line_height == "normal":
+        line_height = 1.2 * font_size
+    else:
+        line_height = _length(line_height, font_size, 1.2 * font_size)
+
+    style = {"_raw": raw, "font_size": font_size, "line_height": line_height,
+             "letter_spacing": _length(raw.get("letter-spacing"), font_size)}
+    for name in ("margin", "padding"):
+        edges = _edges(raw.get(name, "0"), font_size)
+        for side in edges:
+            if f"{name}-{side}" in raw:
+                edges[side] = _length(raw[f"{name}-{side}"], font_size)
+        style[name] = edges
+
+    weight = raw.get("font-weight", "400")
+    style["weight"] = int(weight) if weight.isdigit() else 700 if weight in ("bold", "bolder") else 400
+    style["italic"] = raw.get("font-style") in ("italic", "oblique")
+    style["family"] = raw.get("font-family", "serif")
+    style["color"] = _color(raw.get("color", "#000"), raw.get("opacity"))
+    style["align"] = raw.get("text-align", "left")
+    style["uppercase"] = raw.get("text-transform") == "uppercase"
+    style["max_height"] = _length(raw.get("max-height"), font_size, None) if "max-height" in raw else None
+    style["radius"] = _length(raw.get("border-radius"), font_size)
+    return style
+
+
+def _color(value, opacity=None):
+    value = value.strip()
+    if value.startswith("#"):
+        hex_ = value[1:]
+        if len(hex_) == 3:
+            hex_ = "".join(c * 2 for c in hex_)
+        rgb = tuple(int(hex_[i:i + 2], 16) for i in (0, 2, 4))
+    else:
+        rgb = (0, 0, 0)
+    if opacity:
+        # Over the white page background
+        alpha = float(opacity)
+        rgb = tuple(round(c * alpha + 255 * (1 - alpha)) for c in rgb)
+    return rgb
+
+
+# =============================
+# 3. FONTS
+# =============================
+@lru_cache(maxsize=1)
+def _font_index():
+    index = {}
+    for root in (FONT_DIR, *SYSTEM_FONT_DIRS):
+        if not os.path.isdir(root):
+            continue
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                if name.lower().endswith((".ttf", ".otf")):
+                    index.setdefault(os.path.splitext(name)[0].lower(), os.path.join(dirpath, name))
+    return index
+
+
+def _weight_stem(stem, weight, italic):
+    """Static file for an exact weight: Poppins-Regular → Poppins-SemiBoldItalic"""
+    if not stem.endswith("-Regular"):
+        return None
+    name = WEIGHT_NAMES[min(900, max(100, round(weight / 100) * 100))]
+    if italic:
+        name = "Italic" if name == "Regular" else f"{name}Italic"
+    return f"{stem[:-len('Regular')]}{name}"
+
+
+def _set_axes(font, weight, optical_size):
+    """Pick the instance Chromium would: wght = CSS weight, opsz = CSS px size (font-optical-sizing: auto)"""
+    try:
+        axes = font.get_variation_axes()
+    except (OSError, AttributeError):
+        return
+    wanted = {b"weight": weight, b"optical size": optical_size}
+    values = []
+    for axis in axes:
+        value = wanted.get(axis["name"].lower())
+        value = axis["default"] if value is None else min(axis["maximum"], max(axis["minimum"], value))
+        values.append(value)
+    font.set_variation_by_axes(values)
+
+
+@lru_cache(maxsize=256)
+def load_font(family_list, weight, italic, size, optical_size=None):
+    """
+    First resolvable family of a CSS font-family list, at `size` device px.
+    Raises RuntimeError if a BUNDLED_FAMILIES font is missing from FONT_DIR.
+    """
+    from PIL import ImageFont
+
+    index = _font_index()
+    families = [f.strip().strip("'\"").lower() for f in family_list.split(",")]
+    candidates = [(f, FAMILY_FILES[f]) for f in families if f in FAMILY_FILES]
+    generic = "sans-serif"
+    for f in families:
+        if f in GENERIC_FILES:
+            generic = f
+            break
+        if any(s in f for s in SERIF_FAMILIES):
+            generic = "serif"
+            break
+    candidates.append((generic, GENERIC_FILES[generic]))
+
+    bold = weight >= 600
+    slot = 2 if italic else 1 if bold else 0
+    for family, stems in candidates:
+        for stem in (_weight_stem(stems[0], weight, italic), stems[slot], stems[1 if bold else 0], stems[0]):
+            path = index.get(stem.lower()) if stem else None
+            if path:
+                if family == generic and len(candidates) > 1:
+                    _warn_fallback(family_list)
+                font = ImageFont.truetype(path, size)
+                if "[" in stem:
+                    _set_axes(font, weight, optical_size)
+                return font
+        if family in BUNDLED_FAMILIES:
+            raise RuntimeError(f"Font '{family}' is missing from {FONT_DIR} (see fonts/README.txt); "
+                               "the Pillow renderer will not substitute it")
+    _warn_fallback(family_list)
+    return ImageFont.load_default(size)
+
+
+def check_fonts():
+    """Fail before rendering anything if a bundled family is not installed."""
+    for family in BUNDLED_FAMILIES:
+        load_font(family, 400, False, 16)
+
+
+@lru_cache(maxsize=None)
+def _warn_fallback(family_list):
+    # Once per family list: metrics will differ from Chromium's frames
+    print(f"⚠️ No font file for {family_list} in {FONT_DIR}; using a generic fallback")
+
+
+def _font(style, weight=None, scale=SCALE):
+    return load_font(style["family"], style["weight"] if weight is None else weight, style["italic"],
+                     max(1, round(style["font_size"] * scale)), style["font_size"])
+
+
+# =============================
+# 4. LAYOUT + DRAW
+# =============================
+def _text_width(text, font, spacing=0.0):
+    """Advance width in device px; `spacing` (device px) follows every character, as in CSS."""
+    return font.getlength(text) + spacing * len(text)
+
+
+def _wrap(text, font, max_width, spacing=0.0):
+    """Greedy word wrap. Returns [(start, end)] character ranges of `text`."""
+    words = [m.span() for m in re.finditer(r"\S+", text)]
+    lines, start, end = [], None, None
+    for w_start, w_end in words:
+        if start is None:
+            start, end = w_start, w_end
+        elif _text_width(text[start:w_end], font, spacing) <= max_width:
+            end = w_end
+        else:
+            lines.append((start, end))
+            start, end = w_start, w_end
+    if start is not None:
+        lines.append((start, end))
+    return lines
+
+
+class _Canvas:
+    """Page coordinates in CSS px, drawn into the clip at device scale."""
+
+    def __init__(self, clip, scale=SCALE):
+        from PIL import Image, ImageDraw
+
+        self.clip, self.scale = clip, scale
+        self.image = Image.new("RGB", (round(clip["width"] * scale), round(clip["height"] * scale)), "white")
+        self.draw = ImageDraw.Draw(self.image)
+
+    def xy(self, x, y):
+        return (x - self.clip["x"]) * self.scale, (y - self.clip["y"]) * self.scale
+
+    def text(self, x, y, text, font, fill, spacing=0.0):
+        """Draw `text` at (x, y); `spacing` is CSS letter-spacing in CSS px."""
+        if not spacing:
+            self.draw.text(self.xy(x, y), text, font=font, fill=fill)
+            return
+        # Character by character, each at its kerned advance plus the spacing so far
+        for i, char in enumerate(text):
+            offset = _text_width(text[:i], font, spacing * self.scale) / self.scale
+            self.draw.text(self.xy(x + offset, y), char, font=font, fill=fill)
+
+    def rect(self, x, y, w, h, fill):
+        x0, y0 = self.xy(x, y)
+        self.draw.rectangle((x0, y0, x0 + w * self.scale, y0 + h * self.scale), fill=fill)
+
+    def paste_image(self, img, x, y, radius):
+        from PIL import Image, ImageDraw
+
+        mask = Image.new("L", img.size, 0)
+        ImageDraw.Draw(mask).rounded_rectangle((0, 0, img.width - 1, img.height - 1),
+                                               radius=round(radius * self.scale), fill=255)
+        x0, y0 = self.xy(x, y)
+        self.image.paste(img, (round(x0), round(y0)), mask)
+
+
+def _draw_lines(canvas, style, lines, x, y, width):
+    """Draw already-wrapped lines of one block, honouring text-align."""
+    font = _font(style)
+    ascent, descent = font.getmetrics()
+    half_leading = (style["line_height"] - (ascent + descent) / SCALE) / 2
+
+    spacing = style["letter_spacing"]
+
+    for i, line in enumerate(lines):
+        line_width = _text_width(line, font, spacing * SCALE) / SCALE
+        left = x + (width - line_width) / 2 if style["align"] == "center" else x
+        canvas.text(left, y + i * style["line_height"] + half_leading, line, font, style["color"], spacing)
+
+
+def layout_page(page, keyword):
+    """
+    Lay the parsed page out like Chromium would (block flow, collapsed
+    vertical margins) and locate the keyword mark. Returns a dict of boxes
+    in CSS px, or None when the <h1> does not contain the keyword.
+    """
+    rules = parse_css(page.styles)
+    body = compute_style("body", rules)
+    styles = {el: compute_style(el, rules, body) for el in ("tagline", "h1", "author", "p", "img")}
+    styles["author_b"] = compute_style("author_b", rules, styles["author"])
+
+    title = page.title
+    idx = title.lower().find(keyword.lower()) if keyword else -1
+    if idx == -1:
+        return None
+
+    x = (VIEWPORT_WIDTH - (BODY_WIDTH + 2 * BODY_PADDING)) / 2 + BODY_PADDING
+    y = BODY_PADDING
+    blocks = []
+    prev_margin = 0.0
+
+    def block(kind, style, height_fn):
+        nonlocal y, prev_margin
+        y += max(prev_margin, style["margin"]["top"]) if blocks else style["margin"]["top"]
+        top = y
+        height = height_fn(top)
+        blocks.append({"kind": kind, "style": style, "x": x, "y": top, "height": height})
+        y = top + height
+        prev_margin = style["margin"]["bottom"]
+        return blocks[-1]
+
+    # Tagline
+    tagline_style = styles["tagline"]
+    tagline = page.tagline.upper() if tagline_style["uppercase"] else page.tagline
+    tagline_font = _font(tagline_style)
+    tagline_lines = [tagline[s:e] for s, e in _wrap(tagline, tagline_font, BODY_WIDTH * SCALE,
+                                                     tagline_style["letter_spacing"] * SCALE)]
+    blk = block("tagline", tagline_style, lambda top: len(tagline_lines) * tagline_style["line_height"])
+    blk["lines"] = tagline_lines
+
+    # Heading with the mark
+    h1 = styles["h1"]
+    h1_font = _font(h1)
+    ascent, descent = h1_font.getmetrics()
+    content = (ascent + descent) / SCALE
+    half_leading = (h1["line_height"] - content) / 2
+    h1_spacing = h1["letter_spacing"] * SCALE
+    ranges = _wrap(title, h1_font, BODY_WIDTH * SCALE, h1_spacing)
+    kw_start, kw_end = idx, idx + len(keyword)
+    marks = []
+
+    def h1_height(top):
+        text_top = top + h1["padding"]["top"]
+        for i, (s, e) in enumerate(ranges):
+            a, b = max(s, kw_start), min(e, kw_end)
+            if a < b:
+                mx = x + _text_width(title[s:a], h1_font, h1_spacing) / SCALE
+                mw = _text_width(title[a:b], h1_font, h1_spacing) / SCALE
+                marks.append({"x": mx, "y": text_top + i * h1["line_height"] + half_leading,
+                              "width": mw, "height": content, "line": i, "range": (a, b)})
+        return h1["padding"]["top"] + len(ranges) * h1["line_height"] + h1["padding"]["bottom"]
+
+    heading = block("h1", h1, h1_height)
+    heading.update(ranges=ranges, marks=marks, text_top=heading["y"] + h1["padding"]["top"],
+                   half_leading=half_leading)
+
+    # Author line (flex row: text, 10px gap, bold keyword)
+    author = styles["author"]
+    block("author", author, lambda top: max(author["line_height"], styles["author_b"]["line_height"]))
+
+    # Inline image: sits on the baseline of an anonymous line box, which has
+    # no margins of its own, so nothing collapses around it
+    img_style = styles["img"]
+    if page.image:
+        natural = page.image_size
+        height = BODY_WIDTH * natural[1] / natural[0] if natural else (img_style["max_height"] or 0)
+        if img_style["max_height"]:
+            height = min(height, img_style["max_height"])
+        b_ascent, b_descent = _font(body).getmetrics()
+        strut_below = (body["line_height"] - (b_ascent + b_descent) / SCALE) / 2 + b_descent / SCALE
+
+        y += prev_margin
+        prev_margin = 0.0
+        blocks.append({"kind": "img", "style": img_style, "x": x, "y": y,
+                       "image_top": y + img_style["margin"]["top"], "image_height": height})
+        y += img_style["margin"]["top"] + height + img_style["margin"]["bottom"] + strut_below
+
+    # Paragraphs
+    p_style = styles["p"]
+    p_font = _font(p_style)
+    for text in page.paragraphs:
+        lines = [text[s:e] for s, e in _wrap(text, p_font, BODY_WIDTH * SCALE, p_style["letter_spacing"] * SCALE)]
+        blk = block("p", p_style, lambda top, n=len(lines): n * p_style["line_height"])
+        blk["lines"] = lines
+
+    mark_box = {
+        "x": min(m["x"] for m in marks),
+        "y": min(m["y"] for m in marks),
+        "width": max(m["x"] + m["width"] for m in marks) - min(m["x"] for m in marks),
+        "height": max(m["y"] + m["height"] for m in marks) - min(m["y"] for m in marks),
+    }
+    # Pre-blurred image variants are left sharp by the compositor
+    preblurred = [{"x": x, "y": blk["image_top"], "width": BODY_WIDTH, "height": blk["image_height"]}
+                  for blk in blocks if blk["kind"] == "img" and page.image_preblurred]
+    return {"blocks": blocks, "styles": styles, "body": body, "title": title, "marks": marks,
+            "mark": mark_box, "preblurred": preblurred, "content_x": x}
+
+
+def draw_page(page, layout, page_path):
+    """Draw the sharp (unblurred) clip around the mark. Returns (image, clip)."""
+    from PIL import Image, ImageOps
+
+    mark = layout["mark"]
+    center_x = mark["x"] + mark["width"] / 2
+    center_y = mark["y"] + mark["height"] / 2
+    clip = {
+        "x": max(0, math.floor(center_x - CAMERA_WIDTH / 2)),
+        "y": max(0, math.floor(center_y - CAMERA_HEIGHT / 2)),
+        "width": CAMERA_WIDTH,
+        "height": CAMERA_HEIGHT,
+    }
+    canvas = _Canvas(clip)
+    x = layout["content_x"]
+
+    for blk in layout["blocks"]:
+        style = blk["style"]
+        if blk["kind"] in ("tagline", "p"):
+            _draw_lines(canvas, style, blk["lines"], x, blk["y"], BODY_WIDTH)
+
+        elif blk["kind"] == "h1":
+            font = _font(style)
+            title = layout["title"]
+            for i, (s, e) in enumerate(blk["ranges"]):
+                line_y = blk["text_top"] + i * style["line_height"] + blk["half_leading"]
+                canvas.text(x, line_y, title[s:e], font, style["color"], style["letter_spacing"])
+            for m in blk["marks"]:
+                # <mark>: yellow inline background, black bold text
+                a, b = m["range"]
+                canvas.rect(m["x"], m["y"], m["width"], m["height"], (255, 255, 0))
+                canvas.text(m["x"], m["y"], title[a:b], _font(style, weight=700), (0, 0, 0), style["letter_spacing"])
+
+        elif blk["kind"] == "author":
+            b_style = layout["styles"]["author_b"]
+            label = page.author.strip()
+            font, b_font = _font(style), _font(b_style)
+            ascent, descent = font.getmetrics()
+            line_y = blk["y"] + (blk["height"] - (ascent + descent) / SCALE) / 2
+            canvas.text(x, line_y, label, font, style["color"], style["letter_spacing"])
+            if page.author_keyword:
+                kx = x + _text_width(label, font, style["letter_spacing"] * SCALE) / SCALE + 10  # flex gap
+                b_ascent, b_descent = b_font.getmetrics()
+                canvas.text(kx, blk["y"] + (blk["height"] - (b_ascent + b_descent) / SCALE) / 2,
+                            page.author_keyword, b_font, b_style["color"], b_style["letter_spacing"])
+
+        elif blk["kind"] == "img":
+            src = (Path(page_path).parent / page.image).resolve()
+            if src.exists():
+                size = (round(BODY_WIDTH * SCALE), max(1, round(blk["image_height"] * SCALE)))
+                with Image.open(src) as img:
+                    img.draft("RGB", size)
+                    # object-fit: cover
+                    fitted = ImageOps.fit(img.convert("RGB"), size, Image.LANCZOS)
+                canvas.paste_image(fitted, x, blk["image_top"], style["radius"])
+
+    return canvas.image, clip
+
+
+def _image_size(page_path, src):
+    from PIL import Image
+
+    path = (Path(page_path).parent / src).resolve()
+    if not path.exists():
+        return None
+    with Image.open(path) as img:
+        return img.size
+
+
+def render_frame(page_path, keyword, save_path):
+    """
+    Parse one generated page and draw its camera frame without a browser.
+    Returns a composite_batch() frame dict, or None if the <h1> lacks the keyword.
+    """
+    parser = _PageParser()
+    parser.feed(Path(page_path).read_text(encoding="utf-8"))
+    parser.image_size = _image_size(page_path, parser.image) if parser.image else None
+
+    layout = layout_page(parser, keyword)
+    if layout is None:
+        print("  No <h1> containing keyword → skipped")
+        return None
+
+    image, clip = draw_page(parser, layout, page_path)
+    return {"image": image, "clip": clip, "mark": layout["mark"], "preblurred": layout["preblurred"],
+            "scale": SCALE, "save_path": save_path}
+
+
+def render_pages(pages_dir, output_dir, keyword, on_snapshot=None, checkpoint=None):
+    """
+    Browserless counterpart of run_snapshot_processing_sync(): same inputs,
+    same PNG names, same blur/highlight look, no Chromium.
+    """
+    from .Screenhoter import snapshot_path
+
+    pages_dir, output_dir = Path(pages_dir), Path(output_dir)
+    html_files = sorted(pages_dir.glob("*.html"))
+    if not html_files:
+        print("No HTML files found for snapshot processing.")
+        return []
+    check_fonts()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results, pending = [], []
+
+    def collect(path, html=None):
+        results.append(path)
+        if checkpoint and html is not None:
+            checkpoint.record(path, "snapshots", source=html)
+        if on_snapshot:
+            on_snapshot(path)
+
+    def flush():
+        sources = [frame["page"] for frame in pending]
+        for path, html in zip(composite_batch(pending), sources):
+            collect(path, html)
+        pending.clear()
+
+    for html in html_files:
+        save_path = snapshot_path(html, keyword, output_dir)
+        if checkpoint and checkpoint.is_done(save_path, source=html):
+            flush()
+            print(f"Kept snapshot of {html.name} from checkpoint")
+            collect(str(save_path))
+            continue
+
+        print(f"Rendering: {html.name}")
+        frame = render_frame(html, keyword, save_path)
+        if frame:
+            frame["page"] = html
+            pending.append(frame)
+        if len(pending) >= COMPOSITE_BATCH_SIZE:
+            flush()
+    flush()
+    return results
+
+
+# =============================
+# 5. SIMILARITY CHECK
+# =============================
+def frame_similarity(path_a, path_b, size=(105, 200)):
+    """
+    Global SSIM of two frames on downscaled grayscale (1.0 = identical).
+    Coarse on purpose: it checks layout, blur and highlight placement, not
+    anti-aliasing differences between Chromium and FreeType.
+    """
+    from PIL import Image, ImageChops, ImageStat
+
+    with Image.open(path_a) as a, Image.open(path_b) as b:
+        a = a.convert("L").resize(size, Image.BILINEAR)
+        b = b.convert("L").resize(size, Image.BILINEAR)
+
+    stat_a, stat_b = ImageStat.Stat(a), ImageStat.Stat(b)
+    mu_a, mu_b = stat_a.mean[0], stat_b.mean[0]
+    var_a, var_b = stat_a.var[0], stat_b.var[0]
+    pixels_a, pixels_b = a.getdata(), b.getdata()
+    cov = sum((pa - mu_a) * (pb - mu_b) for pa, pb in zip(pixels_a, pixels_b)) / (size[0] * size[1])
+
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    mae = ImageStat.Stat(ImageChops.difference(a, b)).mean[0] / 255
+    return {"ssim": round(ssim, 4), "mae": round(mae, 4)}
+
+
+def compare_renderers(pages_dir, keyword, output_dir, threshold=SIMILARITY_THRESHOLD):
+    """
+    Render pages_dir with Playwright and with Pillow and score each frame
+    pair. Returns (passed, scores).
+    """
+    from .Screenhoter import run_snapshot_processing_sync
+
+    output_dir = Path(output_dir)
+    browser_frames = run_snapshot_processing_sync(str(pages_dir), str(output_dir / "browser"), keyword)
+    pillow_frames = render_pages(pages_dir, output_dir / "pillow", keyword)
+
+    by_name = {Path(p).name: p for p in pillow_frames}
+    scores = {}
+    for path in browser_frames:
+        other = by_name.get(Path(path).name)
+        scores[Path(path).name] = frame_similarity(path, other) if other else None
+
+    found = [s["ssim"] for s in scores.values() if s]
+    passed = bool(found) and len(found) == len(scores) and sum(found) / len(found) >= threshold
+    return passed, scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render frames without a browser, or compare against Playwright")
+    parser.add_argument("pages_dir")
+    parser.add_argument("keyword")
+    parser.add_argument("--output", default="renderer_check")
+    parser.add_argument("--compare", action="store_true", help="Also capture with Playwright and score similarity")
+    args = parser.parse_args()
+
+    if not args.compare:
+        frames = render_pages(args.pages_dir, args.output, args.keyword)
+        print(f"✅ Rendered {len(frames)} frame(s) → {args.output}")
+    else:
+        passed, scores = compare_renderers(args.pages_dir, args.keyword, args.output)
+        for name, score in scores.items():
+            print(f"  {name}: {score or 'missing from Pillow output'}")
+        print("✅ Renderers match" if passed else f"❌ Below similarity threshold {SIMILARITY_THRESHOLD}")
+        raise SystemExit(0 if passed else 1)
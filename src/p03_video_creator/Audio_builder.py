@@ -0,0 +1,117 @@
+import os
+import subprocess
+import wave
+from functools import lru_cache
+
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# Shutter level in the mix (1.0 = as recorded)
+SHUTTER_GAIN = float(os.getenv("SHUTTER_GAIN", "1.0"))
+
+
+def numpy_available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# =============================
+# 1. DECODE (once per process)
+# =============================
+@lru_cache(maxsize=8)
+def _decode(path, mtime, sample_rate, channels):
+    import numpy as np
+    from src.utils.pipeline_stubs import stubbed
+
+    if stubbed("ffmpeg"):
+        return np.zeros((0, channels), dtype=np.float32)
+
+    cmd = [
+        "ffmpeg",
+        "-v", "error",
+        "-i", path,
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "-"
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not decode {path}: {result.stderr.decode(errors='replace').strip()}")
+
+    pcm = np.frombuffer(result.stdout, dtype="<i2").reshape(-1, channels)
+    return pcm.astype(np.float32) / 32768.0
+
+
+def load_shutter_pcm(path, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    """
+    Decoded shutter sound as a read-only float32 (samples, channels) array
+    in [-1, 1]. Cached until the file changes, so ffmpeg decodes it once.
+    """
+    path = str(path)
+    pcm = _decode(path, os.path.getmtime(path), sample_rate, channels)
+    pcm.flags.writeable = False
+    return pcm
+
+
+# =============================
+# 2. MIX
+# =============================
+def build_soundtrack(durations, shutters, sample_rate=SAMPLE_RATE, gains=SHUTTER_GAIN, variants=None):
+    """
+    Lay out the whole soundtrack in one array: a shutter at the start of
+    every frame, cut off at the frame boundary (as the per-segment encode
+    did with -shortest).
+
+    durations: seconds per frame. shutters: list of PCM arrays (variants).
+    gains: scalar or one per frame. variants: index into `shutters` per
+    frame (default: all the first one). Returns int16 (samples, channels).
+    """
+    import numpy as np
+
+    durations = np.asarray(durations, dtype=np.float64)
+    n = len(durations)
+    channels = shutters[0].shape[1]
+
+    # Frame boundaries from the cumulative time, so rounding never drifts
+    bounds = np.round(np.concatenate(([0.0], np.cumsum(durations))) * sample_rate).astype(np.int64)
+    starts, frame_samples = bounds[:-1], np.diff(bounds)
+
+    track = np.zeros((bounds[-1], channels), dtype=np.float32)
+    gains = np.broadcast_to(np.asarray(gains, dtype=np.float32), (n,))
+    variants = np.zeros(n, dtype=np.int64) if variants is None else np.asarray(variants) % len(shutters)
+
+    for v, pcm in enumerate(shutters):
+        frames = np.flatnonzero(variants == v)
+        if not frames.size or not len(pcm):
+            continue
+        lengths = np.minimum(frame_samples[frames], len(pcm))
+
+        # Flattened (frame, sample) pairs for every shutter sample that fits
+        owner = np.repeat(np.arange(frames.size), lengths)
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+        # Frames never overlap, so each output sample is written at most once
+        track[starts[frames][owner] + within] += pcm[within] * gains[frames][owner, None]
+
+    return (np.clip(track, -1.0, 1.0) * 32767).astype("<i2")
+
+
+def write_wav(path, track, sample_rate=SAMPLE_RATE):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(track.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(track.tobytes())
+    return str(path)
+
+
+def build_soundtrack_wav(snap_sound, durations, wav_path, gains=SHUTTER_GAIN, variant_sounds=None, variants=None):
+    """Decode (cached), mix and write the soundtrack for a video. Returns wav_path."""
+    shutters = [load_shutter_pcm(snap_sound)] + [load_shutter_pcm(s) for s in (variant_sounds or [])]
+    return write_wav(wav_path, build_soundtrack(durations, shutters, gains=gains, variants=variants))
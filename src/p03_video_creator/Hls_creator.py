@@ -0,0 +1,176 @@
+import math
+import os
+import queue
+import threading
+
+from .Video_creator import ENCODER_PROFILES, encode_snapshot_segment, concat_segments, run_ffmpeg
+
+
+PLAYLIST_NAME = "playlist.m3u8"
+FRAMES_PER_SEGMENT = int(os.getenv("HLS_FRAMES_PER_SEGMENT", "5"))
+
+
+class HlsSegmentWriter:
+    """
+    Encode snapshots while they are still being captured and publish them
+    as an HLS EVENT playlist in video_dir.
+
+    add_frame() only queues the PNG; a background thread encodes each frame
+    into a clip (same settings as compile_snapshots_to_video), stream-copies
+    every `frames_per_segment` clips into an MPEG-TS segment and appends it
+    to the playlist. Players can start on the first segment while later
+    pages are still rendering. finish() flushes the tail, ends the playlist
+    and concatenates the clips into the usual final MP4 (copy, no re-encode).
+    on_segment(done, None) is called from the encoder thread per clip.
+
+    If an encode fails, the stream is aborted: later frames are refused
+    (add_frame raises, which stops the capture), the playlist is ended so
+    players stop polling, and finish() raises the ffmpeg error.
+
+    Unlike compile_snapshots_to_video, clips keep their own shutter audio
+    instead of one NumPy-mixed soundtrack muxed at the end: segments are
+    published while capture is still running, so each has to carry its
+    sound already (the same reason the clips are not re-encoded later).
+    """
+
+    def __init__(self, video_dir, snap_sound, duration=0.2, temp_dir=None,
+                 encoder_profile="quality", frames_per_segment=FRAMES_PER_SEGMENT, profiler=None,
+                 on_segment=None):
+        self.video_dir = str(video_dir)
+        self.temp_dir = str(temp_dir or os.path.join(self.video_dir, "frames"))
+        self.snap_sound = str(snap_sound)
+        self.duration = duration
+        self.profile = ENCODER_PROFILES.get(encoder_profile, ENCODER_PROFILES["quality"])
+        self.frames_per_segment = max(1, frames_per_segment)
+        self.profiler = profiler
+        self.on_segment = on_segment
+
+        self.playlist_path = os.path.join(self.video_dir, PLAYLIST_NAME)
+        self.target_duration = max(1, math.ceil(self.duration * self.frames_per_segment))
+
+        self._frames = queue.Queue()
+        self._clips = []
+        self._segments = []   # (filename, seconds)
+        self._pending = []
+        self._offset = 0.0
+        self._error = None
+
+        os.makedirs(self.video_dir, exist_ok=True)
+        os.makedirs(self.temp_dir, exist_ok=True)
+        self._write_playlist(ended=False)
+
+        self._thread = threading.Thread(target=self._run, name="hls-writer", daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------
+    # Producer side (capture loop)
+    # -------------------------------------------------
+    def add_frame(self, img_path):
+        if self._error:
+            raise RuntimeError(f"HLS encoding failed: {self._error}")
+        self._frames.put(str(img_path))
+
+    def finish(self, output_video=None):
+        """Wait for all segments, close the playlist, and build the MP4."""
+        self._frames.put(None)
+        self._thread.join()
+
+        if self._error:
+            raise RuntimeError(f"HLS encoding failed: {self._error}")
+        if not self._clips:
+            raise RuntimeError("No PNG snapshots found to compile!")
+
+        self._write_playlist(ended=True)
+
+        output_video = output_video or os.path.join(self.video_dir, "final_video.mp4")
+        return concat_segments(self._clips, output_video, self.temp_dir, self.profiler)
+
+    def abort(self):
+        """Stop the encoder thread without finishing the playlist."""
+        self._frames.put(None)
+        self._thread.join()
+
+    # -------------------------------------------------
+    # Encoder thread
+    # -------------------------------------------------
+    def _run(self):
+        while True:
+            img_path = self._frames.get()
+            if img_path is None:
+                break
+            if self._error:
+                continue
+            try:
+                clip = os.path.join(self.temp_dir, f"clip_{len(self._clips):05d}.mp4")
+                encode_snapshot_segment(img_path, clip, self.snap_sound, self.duration, self.profile, self.profiler)
+                self._clips.append(clip)
+                self._pending.append(clip)
+                if self.on_segment:
+                    self.on_segment(len(self._clips), None)
+                if len(self._pending) >= self.frames_per_segment:
+                    self._emit_segment()
+            except Exception as e:
+                self._fail(e)
+
+        if self._pending and not self._error:
+            try:
+                self._emit_segment()
+            except Exception as e:
+                self._fail(e)
+
+    def _fail(self, error):
+        print(f"❌ HLS stream aborted: {error}")
+        self._error = error
+        try:
+            # Segments already published stay playable; players stop waiting
+            self._write_playlist(ended=True)
+        except OSError:
+            pass
+
+    def _emit_segment(self):
+        name = f"segment_{len(self._segments):05d}.ts"
+        seconds = self.duration * len(self._pending)
+
+        concat_path = os.path.join(self.temp_dir, f"{name}.txt")
+        with open(concat_path, "w") as f:
+            for clip in self._pending:
+                f.write(f"file '{os.path.abspath(clip)}'\n")
+
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", concat_path,
+            "-c", "copy",
+            "-bsf:v", "h264_mp4toannexb",
+            "-output_ts_offset", f"{self._offset:.3f}",
+            "-f", "mpegts",
+            os.path.join(self.video_dir, name)
+        ]
+        run_ffmpeg(cmd, self.profiler, name=name)
+
+        self._segments.append((name, seconds))
+        self._offset += seconds
+        self._pending = []
+        self._write_playlist(ended=False)
+
+    def _write_playlist(self, ended):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for name, seconds in self._segments:
+            lines.append(f"#EXTINF:{seconds:.3f},")
+            lines.append(name)
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+
+        # Write-then-rename so players never see a half-written playlist
+        tmp_path = self.playlist_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
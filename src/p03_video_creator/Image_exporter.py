@@ -0,0 +1,172 @@
+import io
+import json
+import os
+import zipfile
+
+
+# Output file written for each GenerateRequest.output_format
+OUTPUT_FILENAMES = {
+    "mp4": "final_video.mp4",
+    "webp": "final_animation.webp",
+    "gif": "final_animation.gif",
+    "frames": "frames.zip",
+}
+
+MEDIA_TYPES = {
+    "mp4": "video/mp4",
+    "webp": "image/webp",
+    "gif": "image/gif",
+    "frames": "application/zip",
+}
+
+# Snapshots are captured at 3x DPR (1260x2400); lightweight formats are
+# downscaled to this width, which is plenty for a phone-sized autoplay clip.
+EXPORT_MAX_WIDTH = int(os.getenv("EXPORT_MAX_WIDTH", "540"))
+WEBP_QUALITY = int(os.getenv("EXPORT_WEBP_QUALITY", "80"))
+JPEG_QUALITY = int(os.getenv("EXPORT_JPEG_QUALITY", "85"))
+GIF_COLORS = int(os.getenv("EXPORT_GIF_COLORS", "128"))
+
+# Snapshot clip aspect (CAMERA_WIDTH x CAMERA_HEIGHT in Screenhoter.py)
+SNAPSHOT_ASPECT = 800 / 420
+
+# Bytes per pixel each format keeps in memory per frame until it is written:
+# webp holds RGB frames, gif holds palette frames, frames (ZIP) streams.
+HELD_BYTES_PER_PIXEL = {"webp": 3, "gif": 1, "frames": 0}
+
+
+def frame_memory_mb(output_format):
+    """Memory held per snapshot while exporting `output_format` (for admission control)."""
+    pixels = EXPORT_MAX_WIDTH * round(EXPORT_MAX_WIDTH * SNAPSHOT_ASPECT)
+    return pixels * HELD_BYTES_PER_PIXEL.get(output_format, 0) / (1024 * 1024)
+
+
+def _require_pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError("Pillow is required for webp/gif/frames output (pip install Pillow)")
+    return Image
+
+
+def list_snapshots(snapshot_folder):
+    """PNG snapshots in the same order compile_snapshots_to_video uses."""
+    return [
+        os.path.join(snapshot_folder, f)
+        for f in sorted(os.listdir(snapshot_folder))
+        if f.lower().endswith(".png")
+    ]
+
+
+def iter_frames(snapshot_paths, max_width=EXPORT_MAX_WIDTH):
+    """Open snapshots one at a time as RGB frames, downscaled to max_width."""
+    Image = _require_pillow()
+
+    for path in snapshot_paths:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+        if max_width and img.width > max_width:
+            height = round(img.height * max_width / img.width)
+            img = img.resize((max_width, height), Image.LANCZOS)
+        yield img
+
+
+def load_frames(snapshot_paths, max_width=EXPORT_MAX_WIDTH):
+    """All snapshots as RGB frames (for encoders that need the whole sequence)."""
+    return list(iter_frames(snapshot_paths, max_width))
+
+
+# =============================
+# 1. ANIMATED WEBP
+# =============================
+def export_animated_webp(snapshot_paths, output_path, duration=0.2, quality=WEBP_QUALITY):
+    frames = load_frames(snapshot_paths)
+    frames[0].save(
+        output_path,
+        format="WEBP",
+        save_all=True,
+        append_images=frames[1:],
+        duration=int(duration * 1000),
+        loop=0,
+        quality=quality,
+        method=4,
+    )
+    return output_path
+
+
+# =============================
+# 2. OPTIMIZED GIF
+# =============================
+def export_gif(snapshot_paths, output_path, duration=0.2, colors=GIF_COLORS):
+    """
+    GIF with one palette shared by every frame: the palette is built once from
+    a strip of all frames, so frames quantize consistently (no flicker) and
+    the encoder can store frame deltas.
+    """
+    Image = _require_pillow()
+
+    # Build the palette from small thumbnails of every frame side by side
+    # (first pass; only the thumbnails are kept)
+    thumb_w = 64
+    thumbs = [f.resize((thumb_w, max(1, round(f.height * thumb_w / f.width)))) for f in iter_frames(snapshot_paths)]
+    strip = Image.new("RGB", (thumb_w * len(thumbs), max(t.height for t in thumbs)), "white")
+    for i, thumb in enumerate(thumbs):
+        strip.paste(thumb, (i * thumb_w, 0))
+    palette = strip.quantize(colors=colors, method=Image.MEDIANCUT)
+
+    # Second pass: only the 1-byte-per-pixel palette frames stay in memory
+    quantized = [f.quantize(palette=palette, dither=Image.FLOYDSTEINBERG) for f in iter_frames(snapshot_paths)]
+    quantized[0].save(
+        output_path,
+        format="GIF",
+        save_all=True,
+        append_images=quantized[1:],
+        duration=int(duration * 1000),
+        loop=0,
+        optimize=True,
+        disposal=1,
+    )
+    return output_path
+
+
+# =============================
+# 3. FRAME STRIP (MJPEG ZIP)
+# =============================
+def export_frame_strip(snapshot_paths, output_path, duration=0.2, quality=JPEG_QUALITY):
+    """
+    ZIP of JPEG frames plus a manifest.json with per-frame timing, for
+    clients that animate frames themselves. JPEGs are stored, not deflated.
+    Frames are decoded and written one at a time.
+    """
+    manifest = {"duration": duration, "frames": []}
+
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for i, frame in enumerate(iter_frames(snapshot_paths)):
+            name = f"frame_{i:04d}.jpg"
+            buf = io.BytesIO()
+            frame.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+            zf.writestr(name, buf.getvalue())
+            manifest["frames"].append({"file": name, "width": frame.width, "height": frame.height})
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    return output_path
+
+
+EXPORTERS = {
+    "webp": export_animated_webp,
+    "gif": export_gif,
+    "frames": export_frame_strip,
+}
+
+
+def export_snapshots(snapshot_folder, output_dir, output_format, duration=0.2):
+    """Build a non-MP4 output straight from the captured PNGs (no ffmpeg)."""
+    if output_format not in EXPORTERS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    snapshot_paths = list_snapshots(snapshot_folder)
+    if not snapshot_paths:
+        raise RuntimeError("No PNG snapshots found to compile!")
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, OUTPUT_FILENAMES[output_format])
+    return EXPORTERS[output_format](snapshot_paths, output_path, duration)
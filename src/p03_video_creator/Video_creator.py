@@ -1,18 +1,126 @@
 import subprocess
 import os
 
+from src.utils.pipeline_stubs import stubbed, stub_ffmpeg
+from .Audio_builder import numpy_available, build_soundtrack_wav
+
+# libx264 settings per encoder profile. `cpu_weight` is the relative
+# encode cost (quality = 1.0) used by admission control.
+ENCODER_PROFILES = {
+    "quality": {"preset": "slow", "crf": "15", "cpu_weight": 1.0},
+    "balanced": {"preset": "medium", "crf": "20", "cpu_weight": 0.5},
+    "fast": {"preset": "veryfast", "crf": "23", "cpu_weight": 0.2},
+}
+
+def run_ffmpeg(cmd, profiler=None, name=None):
+    """
+    Run an ffmpeg command; with a JobProfiler, add -benchmark and keep its output.
+    Raises RuntimeError (with the end of ffmpeg's stderr) if ffmpeg fails.
+    """
+    if stubbed("ffmpeg"):
+        return stub_ffmpeg(cmd)
+    name = name or os.path.basename(cmd[-1])
+    if profiler is None:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    else:
+        result = subprocess.run(profiler.ffmpeg_command(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        profiler.record_ffmpeg(name, result.stderr)
+
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(f"ffmpeg failed on {name} (exit {result.returncode}): {' '.join(stderr[-3:])}")
+    return result
+
+
+def encode_snapshot_segment(img_path, seg_path, snap_sound, duration, profile, profiler=None):
+    """
+    Encode one still + shutter sound into a `duration`-second clip.
+    snap_sound=None encodes video only (the soundtrack is muxed in later).
+    """
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-loop", "1",
+        "-t", str(duration),
+        "-i", img_path,
+    ]
+    if snap_sound:
+        cmd += ["-i", snap_sound]
+    cmd += [
+        "-c:v", "libx264",
+        "-preset", profile["preset"],
+        "-crf", profile["crf"],
+        "-pix_fmt", "yuv420p",
+    ]
+    cmd += ["-c:a", "aac", "-shortest"] if snap_sound else ["-an"]
+    cmd.append(seg_path)
+    run_ffmpeg(cmd, profiler)
+    return seg_path
+
+
+def concat_segments(segment_paths, output_video, temp_dir, profiler=None):
+    """Stream-copy already-encoded clips into one file (no re-encode)."""
+    concat_path = os.path.join(temp_dir, "list.txt")
+    with open(concat_path, "w") as f:
+        for seg in segment_paths:
+            f.write(f"file '{os.path.abspath(seg)}'\n")
+
+    cmd_concat = [
+        "ffmpeg",
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", concat_path,
+        "-c", "copy",
+        output_video
+    ]
+    run_ffmpeg(cmd_concat, profiler, name="concat")
+    return output_video
+
+
+def mux_soundtrack(video_path, wav_path, output_video, profiler=None):
+    """Copy the video stream and AAC-encode the soundtrack once."""
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i", video_path,
+        "-i", wav_path,
+        "-map", "0:v",
+        "-map", "1:a",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        output_video
+    ]
+    run_ffmpeg(cmd, profiler, name="mux")
+    return output_video
+
+
 def compile_snapshots_to_video(
     snapshot_folder: str,
     output_video: str = "final_video.mp4",
     snap_sound: str = "camera_shutter.mp3",
     duration: float = 0.2,
-    temp_dir: str = "temp_video"
+    temp_dir: str = "temp_video",
+    encoder_profile: str = "quality",
+    profiler=None,
+    checkpoint=None,
+    on_segment=None
 ):
     """
     Create a video from PNG snapshots in snapshot_folder.
     Each snapshot is shown for `duration` seconds with a camera shutter sound.
+    `encoder_profile` selects libx264 settings from ENCODER_PROFILES.
+    `profiler` (JobProfiler) records ffmpeg -benchmark output per encode.
+    `checkpoint` (JobCheckpoint) keeps segments encoded before a restart.
+    `on_segment(done, total)` is called as each segment is ready.
+
+    With NumPy, segments are video-only and the shutter track is mixed once
+    (Audio_builder.py) and muxed in at the end, instead of decoding and
+    AAC-encoding the same sound for every segment.
     """
 
+    profile = ENCODER_PROFILES.get(encoder_profile, ENCODER_PROFILES["quality"])
+
     os.makedirs(temp_dir, exist_ok=True)
 
     # Get all PNG files
@@ -24,46 +132,72 @@ def compile_snapshots_to_video(
         raise RuntimeError("No PNG snapshots found to compile!")
 
     segment_paths = []
+    reused = 0
+    mixed_audio = numpy_available()
+    segment_sound = None if mixed_audio else snap_sound
+    segment_prefix = "vseg" if mixed_audio else "seg"
 
     # Create a small video segment for each image
     for i, img in enumerate(image_files):
         img_path = os.path.join(snapshot_folder, img)
-        seg_path = os.path.join(temp_dir, f"seg_{i}.mp4")
-        segment_paths.append(seg_path)
-
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-loop", "1",
-            "-t", str(duration),
-            "-i", img_path,
-            "-i", snap_sound,
-            "-c:v", "libx264",
-            "-preset", "slow",
-            "-crf", "15",
-            "-pix_fmt", "yuv420p",
-            "-c:a", "aac",
-            "-shortest",
-            seg_path
-        ]
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    # Concat list
-    concat_path = os.path.join(temp_dir, "list.txt")
-    with open(concat_path, "w") as f:
-        for seg in segment_paths:
-            f.write(f"file '{os.path.abspath(seg)}'\n")
+        seg_path = os.path.join(temp_dir, f"{segment_prefix}_{i}.mp4")
+        if checkpoint and checkpoint.is_done(seg_path, source=img_path):
+            segment_paths.append(seg_path)
+            reused += 1
+        else:
+            segment_paths.append(
+                encode_snapshot_segment(img_path, seg_path, segment_sound, duration, profile, profiler)
+            )
+            if checkpoint:
+                checkpoint.record(seg_path, "video", source=img_path)
+        if on_segment:
+            on_segment(len(segment_paths), len(image_files))
+
+    if checkpoint and reused:
+        print(f"Kept {reused}/{len(segment_paths)} segment(s) from checkpoint")
+        if reused == len(segment_paths) and checkpoint.is_done(output_video):
+            return output_video
 
     # Final concatenation
-    cmd_concat = [
+    if mixed_audio:
+        video_only = concat_segments(segment_paths, os.path.join(temp_dir, "video_only.mp4"), temp_dir, profiler)
+        wav_path = build_soundtrack_wav(snap_sound, [duration] * len(segment_paths),
+                                        os.path.join(temp_dir, "soundtrack.wav"))
+        mux_soundtrack(video_only, wav_path, output_video, profiler)
+    else:
+        concat_segments(segment_paths, output_video, temp_dir, profiler)
+    if checkpoint:
+        checkpoint.record(output_video, "video")
+    return output_video
+
+
+_encoder_warmed = False
+
+def warm_up_encoder():
+    """
+    Run a tiny throwaway libx264/AAC encode so the ffmpeg binary, codec
+    libraries and page cache are hot before the first real segment.
+    Only runs once per process.
+    """
+    global _encoder_warmed
+    if _encoder_warmed:
+        return
+
+    cmd = [
         "ffmpeg",
         "-y",
-        "-f", "concat",
-        "-safe", "0",
-        "-i", concat_path,
-        "-c", "copy",
-        output_video
+        "-f", "lavfi", "-i", "color=c=white:s=64x64:d=0.1",
+        "-f", "lavfi", "-i", "anullsrc=r=44100:cl=mono",
+        "-c:v", "libx264",
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-shortest",
+        "-f", "null", "-"
     ]
-    subprocess.run(cmd_concat, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    return output_video
+    try:
+        run_ffmpeg(cmd, name="warm-up")
+    except RuntimeError as e:
+        # Only a warm-up: the real encode reports the problem for its job
+        print(f"⚠️ Encoder warm-up failed: {e}")
+        return
+    _encoder_warmed = True
@@ -0,0 +1,233 @@
+# src/utils/admission_control.py
+
+import math
+import os
+import threading
+import time
+
+from src.p03_video_creator.Video_creator import ENCODER_PROFILES
+from src.p03_video_creator.Image_exporter import frame_memory_mb
+
+
+# =============================
+# 1. COST MODEL
+# =============================
+# Rough per-unit costs, measured on a CPU-only host. CPU is in CPU-seconds,
+# memory in MB.
+PAGE_CPU_SECONDS = float(os.getenv("ADMISSION_PAGE_CPU_SECONDS", "1.5"))      # render + screenshot at 3x DPR
+FRAME_CPU_SECONDS = float(os.getenv("ADMISSION_FRAME_CPU_SECONDS", "0.05"))   # libx264 "slow" per output frame
+EXPORT_CPU_SECONDS = float(os.getenv("ADMISSION_EXPORT_CPU_SECONDS", "0.1"))   # webp/gif/jpeg per snapshot
+PILLOW_PAGE_CPU_SECONDS = float(os.getenv("ADMISSION_PILLOW_PAGE_CPU_SECONDS", "0.15"))  # browserless renderer
+VIDEO_FPS = 25
+BROWSER_MEMORY_MB = float(os.getenv("ADMISSION_BROWSER_MEMORY_MB", "600"))
+ENCODER_MEMORY_MB = float(os.getenv("ADMISSION_ENCODER_MEMORY_MB", "150"))
+PILLOW_MEMORY_MB = float(os.getenv("ADMISSION_PILLOW_MEMORY_MB", "200"))
+
+# Budgets for all in-flight work on this process
+CPU_BUDGET = float(os.getenv("ADMISSION_CPU_BUDGET", str((os.cpu_count() or 1) * 60)))
+MEMORY_BUDGET_MB = float(os.getenv("ADMISSION_MEMORY_BUDGET_MB", "4096"))
+
+# Share of the budget held back for small jobs, and the cost under which a job counts as small
+SMALL_JOB_RESERVE = float(os.getenv("ADMISSION_SMALL_JOB_RESERVE", "0.25"))
+SMALL_JOB_CPU_SECONDS = float(os.getenv("ADMISSION_SMALL_JOB_CPU_SECONDS", "30"))
+
+# Per-user fair share
+USER_MAX_SHARE = float(os.getenv("ADMISSION_USER_MAX_SHARE", "0.5"))
+USER_MAX_JOBS = int(os.getenv("ADMISSION_USER_MAX_JOBS", "2"))
+
+# Queueing
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "15"))
+MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "32"))
+
+# Unfinished tasks the job broker may hold before POST /jobs is rejected
+BROKER_MAX_DEPTH = int(os.getenv("ADMISSION_BROKER_MAX_DEPTH", "256"))
+
+
+class JobCost:
+    def __init__(self, cpu, memory):
+        self.cpu = cpu
+        self.memory = memory
+
+    @property
+    def is_small(self):
+        return self.cpu <= SMALL_JOB_CPU_SECONDS
+
+    def __repr__(self):
+        return f"JobCost(cpu={self.cpu:.1f}s, memory={self.memory:.0f}MB)"
+
+
+def estimate_job_cost(num_pages, duration_per_snapshot, encoder_profile="quality", output_format="mp4",
+                      renderer="browser"):
+    """Estimate CPU-seconds and peak memory for one /generate request."""
+    profile = ENCODER_PROFILES.get(encoder_profile, ENCODER_PROFILES["quality"])
+    num_pages = max(0, num_pages)
+
+    if output_format == "mp4":
+        frames = num_pages * max(1, math.ceil(duration_per_snapshot * VIDEO_FPS))
+        encode_cpu = frames * FRAME_CPU_SECONDS * profile["cpu_weight"]
+    else:
+        # In-process image encoders work once per snapshot, not per video frame
+        encode_cpu = num_pages * EXPORT_CPU_SECONDS
+    page_cpu = PILLOW_PAGE_CPU_SECONDS if renderer == "pillow" else PAGE_CPU_SECONDS
+    cpu = num_pages * page_cpu + encode_cpu
+
+    # One browser page is reused for every HTML file, so memory is mostly flat,
+    # except for animated exports that hold every frame until they are written
+    memory = (PILLOW_MEMORY_MB if renderer == "pillow" else BROWSER_MEMORY_MB) + ENCODER_MEMORY_MB
+    memory += num_pages * frame_memory_mb(output_format)
+
+    return JobCost(cpu, memory)
+
+
+# =============================
+# 2. ADMISSION CONTROLLER
+# =============================
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    def __init__(self, controller, cost, user_key, is_small):
+        self.controller = controller
+        self.cost = cost
+        self.user_key = user_key
+        self.is_small = is_small
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Tracks the cost of in-flight render jobs against CPU and memory budgets.
+
+    Jobs that do not fit wait (up to `queue_timeout` seconds, at most
+    `max_queued` waiters) and are rejected otherwise. Large jobs may only use
+    the part of the CPU and memory budgets not reserved for small jobs, so
+    bursts of big renders cannot starve small ones. Each user may hold at most
+    `user_max_share` of the CPU budget and `user_max_jobs` jobs at once.
+    """
+
+    def __init__(self, cpu_budget=CPU_BUDGET, memory_budget=MEMORY_BUDGET_MB,
+                 small_job_reserve=SMALL_JOB_RESERVE, user_max_share=USER_MAX_SHARE,
+                 user_max_jobs=USER_MAX_JOBS, queue_timeout=QUEUE_TIMEOUT,
+                 max_queued=MAX_QUEUED):
+        self.cpu_budget = cpu_budget
+        self.memory_budget = memory_budget
+        self.large_cpu_budget = cpu_budget * (1 - small_job_reserve)
+        self.large_memory_budget = memory_budget * (1 - small_job_reserve)
+        self.user_max_cpu = cpu_budget * user_max_share
+        self.user_max_jobs = user_max_jobs
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+
+        self._cond = threading.Condition()
+        self.cpu_in_flight = 0.0
+        self.memory_in_flight = 0.0
+        self.large_cpu_in_flight = 0.0
+        self.large_memory_in_flight = 0.0
+        self.queued = 0
+        self._per_user = {}  # user_key -> (jobs, cpu)
+
+    def _clamp(self, cost):
+        # A job larger than its lane can still run, but only on its own
+        cpu_lane = self.cpu_budget if cost.is_small else self.large_cpu_budget
+        memory_lane = self.memory_budget if cost.is_small else self.large_memory_budget
+        return JobCost(min(cost.cpu, cpu_lane, self.user_max_cpu), min(cost.memory, memory_lane))
+
+    def _fits(self, cost, is_small, user_key):
+        jobs, user_cpu = self._per_user.get(user_key, (0, 0.0))
+        if jobs >= self.user_max_jobs or user_cpu + cost.cpu > self.user_max_cpu:
+            return False
+        if self.cpu_in_flight + cost.cpu > self.cpu_budget:
+            return False
+        if self.memory_in_flight + cost.memory > self.memory_budget:
+            return False
+        if not is_small and self.large_cpu_in_flight + cost.cpu > self.large_cpu_budget:
+            return False
+        if not is_small and self.large_memory_in_flight + cost.memory > self.large_memory_budget:
+            return False
+        return True
+
+    def _retry_after(self):
+        # Time to drain current work if it were spread over every core
+        seconds = self.cpu_in_flight / (os.cpu_count() or 1)
+        return int(min(300, max(1, math.ceil(seconds))))
+
+    def acquire(self, cost, user_key):
+        """Block until `cost` fits the budget, or raise AdmissionRejected."""
+        is_small = cost.is_small
+        cost = self._clamp(cost)
+
+        with self._cond:
+            if not self._fits(cost, is_small, user_key):
+                if self.queued >= self.max_queued:
+                    raise AdmissionRejected("Server is busy, try again later", self._retry_after())
+
+                self.queued += 1
+                try:
+                    deadline = time.monotonic() + self.queue_timeout
+                    while not self._fits(cost, is_small, user_key):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise AdmissionRejected("Server is busy, try again later", self._retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+
+            self.cpu_in_flight += cost.cpu
+            self.memory_in_flight += cost.memory
+            if not is_small:
+                self.large_cpu_in_flight += cost.cpu
+                self.large_memory_in_flight += cost.memory
+            jobs, user_cpu = self._per_user.get(user_key, (0, 0.0))
+            self._per_user[user_key] = (jobs + 1, user_cpu + cost.cpu)
+
+        return AdmissionTicket(self, cost, user_key, is_small)
+
+    def _release(self, ticket):
+        cost = ticket.cost
+        with self._cond:
+            self.cpu_in_flight = max(0.0, self.cpu_in_flight - cost.cpu)
+            self.memory_in_flight = max(0.0, self.memory_in_flight - cost.memory)
+            if not ticket.is_small:
+                self.large_cpu_in_flight = max(0.0, self.large_cpu_in_flight - cost.cpu)
+                self.large_memory_in_flight = max(0.0, self.large_memory_in_flight - cost.memory)
+
+            jobs, user_cpu = self._per_user.get(ticket.user_key, (1, cost.cpu))
+            if jobs <= 1:
+                self._per_user.pop(ticket.user_key, None)
+            else:
+                self._per_user[ticket.user_key] = (jobs - 1, max(0.0, user_cpu - cost.cpu))
+
+            self._cond.notify_all()
+
+    def check_broker_depth(self, depth, cost, max_depth=BROKER_MAX_DEPTH):
+        """
+        Admission for queued jobs (POST /jobs), which run on the workers and
+        hold no ticket here: reject once the broker backlog is too deep.
+        Retry-After is the time to drain that backlog at this job's cost.
+        """
+        if depth >= max_depth:
+            seconds = depth * cost.cpu / (os.cpu_count() or 1)
+            raise AdmissionRejected("Job queue is full, try again later",
+                                    int(min(300, max(1, math.ceil(seconds)))))
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "cpu_in_flight": round(self.cpu_in_flight, 1),
+                "cpu_budget": self.cpu_budget,
+                "memory_in_flight_mb": round(self.memory_in_flight),
+                "memory_budget_mb": self.memory_budget,
+                "queued": self.queued,
+                "active_users": len(self._per_user),
+            }
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,228 @@
+# src/utils/checkpoint.py
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from src.utils.file_utils import users_root, user_root
+
+
+CHECKPOINT_NAME = "checkpoint.json"
+RESUME_LOCK_NAME = "resume.lock"
+
+# A running job owned by a process on another host (which can't be checked)
+# is considered abandoned once its checkpoint has not been touched for this long
+CHECKPOINT_STALE_SECONDS = float(os.getenv("CHECKPOINT_STALE_SECONDS", "300"))
+
+# Recorded artifacts are written out every N records or T seconds (and on
+# every stage change), not one rewrite of the whole file per artifact
+CHECKPOINT_SAVE_EVERY = int(os.getenv("CHECKPOINT_SAVE_EVERY", "32"))
+CHECKPOINT_SAVE_SECONDS = float(os.getenv("CHECKPOINT_SAVE_SECONDS", "5"))
+
+# Identifies this process; the random part survives PID reuse across restarts
+PROCESS_TOKEN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobCheckpoint:
+    """
+    Progress record for one job in storage/users/<id>/checkpoint.json.
+
+    Every finished page, snapshot, encoded segment and final output is
+    recorded with its SHA-256. A resumed run asks is_done(path) and skips
+    work whose output is still on disk with the recorded checksum, so
+    captures and encodes that already succeeded are never redone.
+
+    Records are saved in batches; a crash loses at most the last batch,
+    which is simply redone. Call flush() when a stage ends.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.root = user_root(user_id)
+        self.path = self.root / CHECKPOINT_NAME
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._saved_at = time.time()
+        self.state = read_checkpoint(self.path) or {
+            "job_id": user_id,
+            "status": "new",
+            "stage": None,
+            "via": None,
+            "request": None,
+            "artifacts": {},
+        }
+
+    # -------------------------------------------------
+    # Job lifecycle
+    # -------------------------------------------------
+    def start(self, request, stage, via):
+        """
+        Mark the job as running in this process. `via` is "generate" for the
+        synchronous endpoint (resumed on restart) or "broker" (the broker's
+        lease expiry already retries those).
+        """
+        with self._lock:
+            self.state.update(request=request, stage=stage, via=via, status="running", owner=PROCESS_TOKEN)
+            self._save()
+
+    def set_stage(self, stage):
+        with self._lock:
+            self.state["stage"] = stage
+            self._save()
+
+    def finish(self, status):
+        with self._lock:
+            self.state["status"] = status
+            self._save()
+
+    # -------------------------------------------------
+    # Artifacts
+    # -------------------------------------------------
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+
+    def _source_sha(self, source):
+        entry = self.state["artifacts"].get(self._key(source))
+        return entry["sha256"] if entry else file_sha256(source)
+
+    def record(self, path, stage, source=None):
+        """
+        Checksum a finished output. `source` ties it to the input it was built
+        from (page → snapshot → segment), so a regenerated input invalidates it.
+        """
+        if not os.path.exists(path):
+            return  # the step failed quietly; nothing to keep
+        entry = {"stage": stage, "sha256": file_sha256(path), "bytes": os.path.getsize(path)}
+        if source is not None:
+            entry["source"] = self._source_sha(source)
+        with self._lock:
+            self.state["artifacts"][self._key(path)] = entry
+            self._unsaved += 1
+            if self._unsaved >= CHECKPOINT_SAVE_EVERY or time.time() - self._saved_at >= CHECKPOINT_SAVE_SECONDS:
+                self._save()
+
+    def flush(self):
+        """Write out records still held back by batching."""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    def is_done(self, path, source=None):
+        entry = self.state["artifacts"].get(self._key(path))
+        if not entry or not os.path.exists(path):
+            return False
+        if os.path.getsize(path) != entry["bytes"]:
+            return False
+        if source is not None and (not os.path.exists(source) or entry.get("source") != self._source_sha(source)):
+            return False
+        return file_sha256(path) == entry["sha256"]
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a torn checkpoint
+        self.state["updated_at"] = time.time()
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+        self._saved_at = time.time()
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# =============================
+# RESTART RECOVERY
+# =============================
+def _owner_is_local(owner):
+    return not owner or owner.split(":")[0] == socket.gethostname()
+
+
+def _owner_is_dead(owner):
+    if owner == PROCESS_TOKEN:
+        return False
+    if not owner:
+        return True
+    host, pid, _ = (owner.split(":") + ["", "", ""])[:3]
+    if host != socket.gethostname():
+        return False  # can't tell; rely on staleness
+    try:
+        pid = int(pid)
+        if pid == os.getpid():
+            return True   # same PID, different token: we are the restarted process
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except (ValueError, PermissionError, OSError):
+        return False
+    return False
+
+
+def find_interrupted_jobs():
+    """Checkpoints of /generate jobs whose process died before finishing."""
+    root = users_root()
+    if not root.exists():
+        return []
+
+    interrupted = []
+    now = time.time()
+    for job_dir in root.iterdir():
+        state = read_checkpoint(job_dir / CHECKPOINT_NAME)
+        if not state or state.get("status") != "running" or state.get("via") != "generate":
+            continue
+        owner = state.get("owner")
+        if _owner_is_local(owner):
+            # A live local owner may just be in a long step; only a dead one counts
+            dead = _owner_is_dead(owner)
+        else:
+            # Another host's process can't be checked; fall back to staleness
+            dead = now - state.get("updated_at", 0) > CHECKPOINT_STALE_SECONDS
+        if dead:
+            interrupted.append(state)
+    return interrupted
+
+
+def claim_for_resume(user_id):
+    """
+    Take the resume lock for a job so only one restarted process resumes it.
+    Returns a JobCheckpoint, or None if someone else already claimed it.
+    """
+    lock = user_root(user_id) / RESUME_LOCK_NAME
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if time.time() - os.path.getmtime(lock) < CHECKPOINT_STALE_SECONDS:
+            return None
+        os.unlink(lock)
+        return claim_for_resume(user_id)
+
+    try:
+        os.write(fd, PROCESS_TOKEN.encode())
+        checkpoint = JobCheckpoint(user_id)
+        if checkpoint.state.get("status") != "running" or checkpoint.state.get("via") != "generate":
+            return None
+        # From here on the broker owns retries for this job
+        checkpoint.state["via"] = "broker"
+        checkpoint.finish("queued")
+        return checkpoint
+    finally:
+        os.close(fd)
+        os.unlink(lock)
@@ -0,0 +1,119 @@
+# src/utils/cleanup.py
+
+import os
+import shutil
+import zipfile
+
+from src.utils.file_utils import user_dirs
+
+
+# =============================
+# 1. RETENTION POLICY
+# =============================
+# Actions per intermediate artifact once the stage that consumes it is done:
+#   keep    - leave it for the 24h sweep
+#   delete  - remove it immediately
+#   compact - keep a small copy (pages → pages.zip, snapshots → small JPEGs)
+RETENTION_ACTIONS = ("keep", "delete", "compact")
+
+DEFAULT_RETENTION = {
+    "pages": "delete",
+    "images": "delete",
+    "snapshots": "delete",
+    "temp": "delete",
+}
+
+# Stage whose completion makes each artifact obsolete
+CONSUMED_AFTER = {
+    "pages": "snapshots",
+    "images": "snapshots",
+    "snapshots": "video",
+    "temp": "video",
+}
+
+COMPACT_SNAPSHOT_WIDTH = int(os.getenv("RETENTION_COMPACT_SNAPSHOT_WIDTH", "420"))
+
+
+def load_retention_policy():
+    """Policy from RETENTION_<ARTIFACT> env vars (e.g. RETENTION_SNAPSHOTS=compact)."""
+    policy = {}
+    for artifact, default in DEFAULT_RETENTION.items():
+        action = os.getenv(f"RETENTION_{artifact.upper()}", default).lower()
+        if action not in RETENTION_ACTIONS:
+            print(f"⚠️ Invalid RETENTION_{artifact.upper()}={action}, using {default}")
+            action = default
+        policy[artifact] = action
+    return policy
+
+
+RETENTION_POLICY = load_retention_policy()
+
+
+# =============================
+# 2. COMPACTION
+# =============================
+def compact_pages(pages_dir):
+    """Replace pages/ with pages.zip next to it."""
+    archive = pages_dir.parent / "pages.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for f in sorted(pages_dir.glob("*.html")):
+            zf.write(f, arcname=f.name)
+    shutil.rmtree(pages_dir, ignore_errors=True)
+    return archive
+
+
+def compact_snapshots(snapshots_dir, width=COMPACT_SNAPSHOT_WIDTH):
+    """Replace full-resolution PNGs with small JPEG previews (needs Pillow)."""
+    from PIL import Image
+
+    for png in sorted(snapshots_dir.glob("*.png")):
+        with Image.open(png) as img:
+            img = img.convert("RGB")
+            if img.width > width:
+                img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+            img.save(png.with_suffix(".jpg"), format="JPEG", quality=80, optimize=True)
+        png.unlink()
+    return snapshots_dir
+
+
+COMPACTORS = {
+    "pages": compact_pages,
+    "snapshots": compact_snapshots,
+}
+
+
+# =============================
+# 3. APPLY AFTER EACH STAGE
+# =============================
+def apply_retention(user_id, completed_stage, policy=None):
+    """
+    Drop or compact the artifacts `completed_stage` has just consumed.
+    Returns {artifact: action} for what was handled.
+    """
+    policy = policy or RETENTION_POLICY
+    dirs = user_dirs(user_id)
+    applied = {}
+
+    for artifact, stage in CONSUMED_AFTER.items():
+        if stage != completed_stage:
+            continue
+
+        path = dirs[artifact]
+        action = policy.get(artifact, "keep")
+        if action == "keep" or not path.exists():
+            continue
+
+        try:
+            if action == "compact" and artifact in COMPACTORS:
+                COMPACTORS[artifact](path)
+            else:
+                # Artifacts without a compact form are deleted
+                action = "delete"
+                shutil.rmtree(path, ignore_errors=True)
+            applied[artifact] = action
+        except Exception as e:
+            print(f"⚠️ Retention '{action}' failed for {artifact} of {user_id}: {e}")
+
+    if applied:
+        print(f"🧹 Retention after {completed_stage} for {user_id}: {applied}")
+    return applied
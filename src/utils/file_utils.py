@@ -0,0 +1,51 @@
+# src/utils/file_utils.py
+
+import os
+from pathlib import Path
+
+
+# Shared storage root. API and render nodes must point this at the same
+# volume (NFS, EFS, a bind mount...) so workers can read each other's output.
+STORAGE_ROOT = Path(os.getenv("STORAGE_ROOT", "storage"))
+
+# Base URL the API is reachable at, used to build /static links
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+
+# Shared (read-only) source assets
+SOURCE_ROOT = Path(os.getenv("SOURCE_ROOT", "src"))
+SHARED_IMAGES_DIR = SOURCE_ROOT / "p01_dummy_pages_generator" / "unsplash_images"
+# Display-sized copies of SHARED_IMAGES_DIR (built by image_variants.py)
+IMAGE_VARIANTS_DIR = Path(os.getenv("IMAGE_VARIANTS_DIR", str(SOURCE_ROOT / "p01_dummy_pages_generator" / "unsplash_variants")))
+TEMPLATE_FILE = SOURCE_ROOT / "p01_dummy_pages_generator" / "01_Text_base_tail_templates.txt"
+CSS_FILE = SOURCE_ROOT / "p01_dummy_pages_generator" / "templates" / "01_medium_headline.css"
+SNAP_SOUND_FILE = SOURCE_ROOT / "p03_video_creator" / "camera_shutter.mp3"
+
+
+def users_root():
+    return STORAGE_ROOT / "users"
+
+
+def user_root(user_id):
+    return users_root() / user_id
+
+
+def user_dirs(user_id, create=False):
+    """Per-job folders under storage/users/<id>/"""
+    root = user_root(user_id)
+    dirs = {
+        "root": root,
+        "pages": root / "pages",
+        "images": root / "images",
+        "snapshots": root / "snapshots",
+        "video": root / "video",
+        "temp": root / "temp_video",
+    }
+    if create:
+        for d in dirs.values():
+            os.makedirs(d, exist_ok=True)
+    return dirs
+
+
+def static_url(relative_path):
+    """Public URL for a path relative to STORAGE_ROOT"""
+    return f"{PUBLIC_BASE_URL}/static/{Path(relative_path).as_posix()}"
@@ -0,0 +1,77 @@
+# src/utils/pipeline_stubs.py
+
+import os
+import struct
+import subprocess
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+
+# Stages replaced by stand-ins so the HTTP layer can be load-tested on a box
+# without Chromium or ffmpeg, e.g. PIPELINE_STUBS=snapshots,ffmpeg (or "all").
+#   snapshots - run_snapshot_processing_sync writes placeholder PNGs
+#   ffmpeg    - run_ffmpeg writes an empty output file instead of encoding
+STUBBABLE = ("snapshots", "ffmpeg")
+
+_raw = {s.strip().lower() for s in os.getenv("PIPELINE_STUBS", "").split(",") if s.strip()}
+PIPELINE_STUBS = frozenset(STUBBABLE) if "all" in _raw else frozenset(_raw & set(STUBBABLE))
+
+# Simulated latency so stubs still hold threads/slots like the real stages
+STUB_CAPTURE_SECONDS = float(os.getenv("STUB_CAPTURE_SECONDS", "0.05"))   # per page
+STUB_FFMPEG_SECONDS = float(os.getenv("STUB_FFMPEG_SECONDS", "0.02"))     # per ffmpeg call
+
+# Same size as a real 420x800 clip at device_scale_factor=3
+STUB_PNG_SIZE = (1260, 2400)
+
+
+def stubbed(stage):
+    return stage in PIPELINE_STUBS
+
+
+@lru_cache(maxsize=4)
+def placeholder_png(width, height):
+    """Solid white RGB PNG built with zlib only (no Pillow needed)."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + b"\xff" * (width * 3)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height, 9))
+        + chunk(b"IEND", b"")
+    )
+
+
+def stub_snapshot_processing(pages_dir, output_dir, keyword, on_snapshot=None):
+    """Stand-in for the Playwright capture: one placeholder PNG per page."""
+    from src.p02_screenshoter.Screenhoter import safe_filename_part
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    png = placeholder_png(*STUB_PNG_SIZE)
+
+    results = []
+    for html in sorted(Path(pages_dir).glob("*.html")):
+        time.sleep(STUB_CAPTURE_SECONDS)
+        save_path = output_dir / f"{html.stem}_{safe_filename_part(keyword)}.png"
+        save_path.write_bytes(png)
+        results.append(str(save_path))
+        if on_snapshot:
+            on_snapshot(str(save_path))
+    return results
+
+
+def stub_ffmpeg(cmd):
+    """Stand-in for an ffmpeg call: touch the output file and report success."""
+    time.sleep(STUB_FFMPEG_SECONDS)
+    output = cmd[-1]
+    if output != "-":
+        Path(output).write_bytes(b"")
+    return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+
+
+if PIPELINE_STUBS:
+    print(f"🧪 Pipeline stubs active: {', '.join(sorted(PIPELINE_STUBS))}")
@@ -0,0 +1,190 @@
+# src/utils/profiling.py
+
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+
+# =============================
+# 1. OPT-IN
+# =============================
+# A request is profiled when it sends `X-Profile: <PROFILING_TOKEN>` or when
+# the admin flag PROFILE_ALL_JOBS=1 is set. Without a token the header is
+# ignored, so anonymous clients cannot turn on the (expensive) tracing.
+PROFILE_HEADER = "X-Profile"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILE_ALL_JOBS = os.getenv("PROFILE_ALL_JOBS", "0").lower() in ("1", "true", "yes")
+
+PROFILE_DIRNAME = "profile"
+BUNDLE_NAME = "profile.zip"
+
+_BENCH_RE = re.compile(r"bench:\s*(\w+)=([\d.]+)(\w*)")
+
+
+def profiling_requested(headers):
+    """True if this request (FastAPI/Starlette headers) asked for profiling."""
+    if PROFILE_ALL_JOBS:
+        return True
+    value = headers.get(PROFILE_HEADER)
+    return bool(PROFILING_TOKEN and value and value == PROFILING_TOKEN)
+
+
+def bundle_path(job_root):
+    return Path(job_root) / BUNDLE_NAME
+
+
+# =============================
+# 2. PER-JOB PROFILER
+# =============================
+class JobProfiler:
+    """
+    Collects profiling output for one job under <job root>/profile/:
+
+      pages.html / pages.txt     pyinstrument sampling profile (cProfile
+                                 pages.prof / pages.txt if not installed)
+      traces/<page>.json         Chrome DevTools performance trace per page
+      ffmpeg/<clip>.log          ffmpeg -benchmark stderr per encode
+      summary.json               stage timings, Performance.getMetrics,
+                                 parsed ffmpeg bench lines
+
+    bundle() zips it all into <job root>/profile.zip. Pipeline functions take
+    `profiler=None`; when profiling is off nothing here is touched.
+    """
+
+    def __init__(self, job_root):
+        self.job_root = Path(job_root)
+        self.dir = self.job_root / PROFILE_DIRNAME
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.summary = {"stages": {}, "pages": {}, "ffmpeg": {}}
+
+        # Stages may run in separate worker processes: keep what earlier ones recorded
+        summary_path = self.dir / "summary.json"
+        if summary_path.exists():
+            try:
+                self.summary.update(json.loads(summary_path.read_text()))
+            except ValueError:
+                pass
+
+    # -------------------------------------------------
+    # Python: sampling profiler around a call
+    # -------------------------------------------------
+    def profile_call(self, name, fn, *args, **kwargs):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            Profiler = None
+
+        start = time.perf_counter()
+        try:
+            if Profiler is not None:
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    profiler.stop()
+                    (self.dir / f"{name}.html").write_text(profiler.output_html())
+                    (self.dir / f"{name}.txt").write_text(profiler.output_text(unicode=True))
+            return self._cprofile_call(name, fn, *args, **kwargs)
+        finally:
+            self._record("stages", name, {"seconds": round(time.perf_counter() - start, 4)})
+
+    def _cprofile_call(self, name, fn, *args, **kwargs):
+        import cProfile
+        import io
+        import pstats
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            profile.dump_stats(str(self.dir / f"{name}.prof"))
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(40)
+            (self.dir / f"{name}.txt").write_text(out.getvalue())
+
+    # -------------------------------------------------
+    # Chromium: DevTools trace + Performance.getMetrics
+    # -------------------------------------------------
+    @asynccontextmanager
+    async def trace_page(self, page, name):
+        """Trace everything done to `page` inside the block (Chromium only)."""
+        trace_dir = self.dir / "traces"
+        trace_dir.mkdir(exist_ok=True)
+        browser = page.context.browser
+
+        cdp = tracing = None
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            await cdp.send("Performance.enable")
+            await browser.start_tracing(page=page, path=str(trace_dir / f"{name}.json"))
+            tracing = True
+        except Exception as e:
+            print(f"⚠️ Page trace unavailable for {name}: {e}")
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {"seconds": round(time.perf_counter() - start, 4)}
+            try:
+                if tracing:
+                    await browser.stop_tracing()
+                if cdp:
+                    metrics = await cdp.send("Performance.getMetrics")
+                    entry["metrics"] = {m["name"]: m["value"] for m in metrics.get("metrics", [])}
+                    await cdp.detach()
+            except Exception as e:
+                entry["error"] = str(e)
+            self._record("pages", name, entry)
+
+    # -------------------------------------------------
+    # ffmpeg: -benchmark output per encode
+    # -------------------------------------------------
+    @staticmethod
+    def ffmpeg_command(cmd):
+        """Insert the global -benchmark flag after the binary name."""
+        return [cmd[0], "-benchmark", *cmd[1:]]
+
+    def record_ffmpeg(self, name, stderr):
+        text = stderr.decode("utf-8", "replace") if isinstance(stderr, bytes) else (stderr or "")
+        ffmpeg_dir = self.dir / "ffmpeg"
+        ffmpeg_dir.mkdir(exist_ok=True)
+        (ffmpeg_dir / f"{name}.log").write_text(text)
+
+        bench = {key: f"{value}{unit}" for key, value, unit in _BENCH_RE.findall(text)}
+        self._record("ffmpeg", name, bench)
+
+    # -------------------------------------------------
+    # Bundle
+    # -------------------------------------------------
+    def _record(self, section, name, value):
+        with self._lock:
+            self.summary[section][name] = value
+
+    def bundle(self):
+        """Write summary.json and (re)build profile.zip. Returns the zip path."""
+        with self._lock:
+            (self.dir / "summary.json").write_text(json.dumps(self.summary, indent=2))
+
+        archive = bundle_path(self.job_root)
+        tmp_path = archive.with_suffix(".zip.tmp")
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for f in sorted(self.dir.rglob("*")):
+                if f.is_file():
+                    zf.write(f, arcname=str(f.relative_to(self.dir)))
+        os.replace(tmp_path, archive)
+        print(f"📊 Profile bundle written: {archive}")
+        return archive
@@ -0,0 +1,173 @@
+# src/utils/progress.py
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+# Events buffered per subscriber; a slow client loses the oldest ones
+PROGRESS_QUEUE_SIZE = int(os.getenv("PROGRESS_QUEUE_SIZE", "256"))
+
+# Recent events kept per job and replayed to clients that connect late
+PROGRESS_HISTORY = int(os.getenv("PROGRESS_HISTORY", "64"))
+
+# How long a job's history is kept after it finished / went quiet
+PROGRESS_RETAIN_SECONDS = float(os.getenv("PROGRESS_RETAIN_SECONDS", "300"))
+PROGRESS_IDLE_SECONDS = float(os.getenv("PROGRESS_IDLE_SECONDS", "3600"))
+
+# The stream ends after one of these
+TERMINAL_EVENTS = ("complete", "failed")
+
+
+# =============================
+# 1. SUBSCRIBER
+# =============================
+class Subscription:
+    """
+    One listener on one job. Events are handed over on the listener's event
+    loop; when the bounded queue is full the oldest event is dropped and
+    counted, so a stalled client never holds memory or blocks the pipeline.
+    """
+
+    def __init__(self, job_id, loop, maxsize):
+        self.job_id = job_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def _put(self, message):
+        # Always runs on self.loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout):
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+# =============================
+# 2. BUS
+# =============================
+class ProgressBus:
+    """
+    In-process pub/sub for generation progress.
+
+    Pipeline code (request threads, embedded workers) calls publish();
+    SSE handlers subscribe() from the event loop. Publishing with nobody
+    listening only appends to a short per-job history.
+    """
+
+    def __init__(self, queue_size=PROGRESS_QUEUE_SIZE, history=PROGRESS_HISTORY):
+        self.queue_size = queue_size
+        self.history_size = history
+        self._lock = threading.Lock()
+        self._subscribers = {}   # job_id -> set of Subscription
+        self._history = {}       # job_id -> deque of events
+        self._last_event = {}    # job_id -> (timestamp, finished)
+        self._seq = 0
+
+    def publish(self, job_id, event, **data):
+        if not job_id:
+            return
+        now = time.time()
+        with self._lock:
+            self._seq += 1
+            message = {"event": event, "job_id": job_id, "seq": self._seq, "time": round(now, 3), **data}
+            self._history.setdefault(job_id, deque(maxlen=self.history_size)).append(message)
+            self._last_event[job_id] = (now, event in TERMINAL_EVENTS)
+            subscribers = list(self._subscribers.get(job_id, ()))
+            self._prune(now)
+
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, message)
+            except RuntimeError:
+                pass  # loop already closed; the handler cleans up
+
+    def subscribe(self, job_id, maxsize=None):
+        """Subscribe from inside the event loop; recent history is replayed first."""
+        sub = Subscription(job_id, asyncio.get_running_loop(), maxsize or self.queue_size)
+        with self._lock:
+            for message in self._history.get(job_id, ()):
+                sub._put(message)
+            self._subscribers.setdefault(job_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.job_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.job_id]
+
+    def _prune(self, now):
+        # Called with the lock held
+        for job_id, (last, finished) in list(self._last_event.items()):
+            age = now - last
+            if (finished and age > PROGRESS_RETAIN_SECONDS) or age > PROGRESS_IDLE_SECONDS:
+                if job_id not in self._subscribers:
+                    self._history.pop(job_id, None)
+                    del self._last_event[job_id]
+
+
+progress_bus = ProgressBus()
+
+
+# =============================
+# 3. PUBLISHER HELPERS
+# =============================
+class JobProgress:
+    """Publishing side for one job, used by run_generation() and the render workers."""
+
+    def __init__(self, job_id, bus=None):
+        self.job_id = job_id
+        self.bus = bus or progress_bus
+        self.captured = 0
+
+    def stage(self, stage, status="running", **data):
+        self.bus.publish(self.job_id, "stage", stage=stage, status=status, **data)
+
+    def snapshot(self, path, total=None):
+        """on_snapshot hook: one page captured."""
+        self.captured += 1
+        self.bus.publish(self.job_id, "capture", done=self.captured, total=total,
+                         snapshot=os.path.basename(str(path)))
+
+    def segment(self, done, total=None):
+        """on_segment hook: one frame encoded (total is None while HLS is still capturing)."""
+        self.bus.publish(self.job_id, "encode", done=done, total=total)
+
+    def complete(self, **result):
+        self.bus.publish(self.job_id, "complete", **result)
+
+    def failed(self, error):
+        self.bus.publish(self.job_id, "failed", error=str(error))
+
+
+def broker_status_event(job_id, status):
+    """
+    Event for a job's broker status record, for jobs whose workers run in
+    another process (or whose history has already been pruned here).
+    """
+    if status.get("status") == "success":
+        return {"event": "complete", "job_id": job_id, **status.get("result", {})}
+    if status.get("status") == "failed":
+        return {"event": "failed", "job_id": job_id, "error": status.get("error")}
+    return {"event": "stage", "job_id": job_id, "stage": status.get("stage"), "status": status.get("status")}
+
+
+def format_sse(message, dropped=0):
+    """One server-sent event frame (id only for events that came through the bus)."""
+    if dropped:
+        message = {**message, "dropped": dropped}
+    frame = f"id: {message['seq']}\n" if "seq" in message else ""
+    return frame + f"event: {message['event']}\ndata: {json.dumps(message)}\n\n"
@@ -0,0 +1,264 @@
+# src/utils/user_manager.py
+
+import os
+import threading
+import time
+
+from sqlalchemy import case, select, update
+
+from database import engine
+from src.models.user import User
+
+
+# =============================
+# 1. TIER LIMITS
+# =============================
+TIER_LIMITS = {
+    "free": {"max_pages": 25, "credits_per_generation": 1},
+    "premium": {"max_pages": 200, "credits_per_generation": 1},
+}
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+
+
+class CreditError(Exception):
+    """Base class for admission failures on the credit path."""
+
+
+class UserNotFound(CreditError):
+    pass
+
+
+class PageLimitExceeded(CreditError):
+    pass
+
+
+class InsufficientCredits(CreditError):
+    pass
+
+
+# =============================
+# 2. SHORT-TTL USER CACHE
+# =============================
+class UserCache:
+    """
+    Thread-safe TTL cache of user tier, limits and a "known out of credits"
+    flag. Only read-mostly data lives here; the credit balance itself is
+    always decided by the conditional UPDATE in reserve_credits().
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return value
+
+    def put(self, user_id, value):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, value)
+
+    def mark_exhausted(self, user_id, exhausted=True):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, value = entry
+                self._entries[user_id] = (expires_at, {**value, "exhausted": exhausted})
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def _tier_limit(key):
+    """SQL expression for TIER_LIMITS[<user's tier>][key] (unknown tiers count as free)."""
+    return case(
+        *[(User.subscription_tier == tier, limits[key]) for tier, limits in TIER_LIMITS.items()],
+        else_=TIER_LIMITS["free"][key],
+    )
+
+
+def _cache_limits(user_id, tier, credits_remaining):
+    tier = tier or "free"
+    limits = {
+        "tier": tier,
+        **TIER_LIMITS.get(tier, TIER_LIMITS["free"]),
+        "exhausted": (credits_remaining or 0) <= 0,
+    }
+    user_cache.put(user_id, limits)
+    return limits
+
+
+def get_user_limits(user_id):
+    """
+    Return {"tier", "max_pages", "credits_per_generation", "exhausted"} for an
+    active user, or None if the user does not exist or is inactive.
+    Served from cache when possible, otherwise one SELECT.
+    """
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    stmt = select(User.subscription_tier, User.is_active, User.credits_remaining).where(User.id == user_id)
+    with engine.connect() as conn:
+        row = conn.execute(stmt).first()
+
+    if row is None or not row.is_active:
+        return None
+
+    return _cache_limits(user_id, row.subscription_tier, row.credits_remaining)
+
+
+# =============================
+# 3. ATOMIC CREDIT OPERATIONS
+# =============================
+def reserve_credits(user_id, amount=1):
+    """
+    Take `amount` credits in a single conditional UPDATE.
+    Returns True if the credits were reserved, False if the balance was too low.
+    """
+    stmt = (
+        update(User)
+        .where(
+            User.id == user_id,
+            User.is_active.is_(True),
+            User.credits_remaining >= amount,
+        )
+        .values(
+            credits_remaining=User.credits_remaining - amount,
+            total_generations=User.total_generations + 1,
+        )
+    )
+    with engine.begin() as conn:
+        reserved = conn.execute(stmt).rowcount == 1
+
+    if not reserved:
+        user_cache.mark_exhausted(user_id)
+    return reserved
+
+
+def reserve_credits_for_pages(user_id, num_pages):
+    """
+    Tier page limit, active flag and balance checked and credits taken in one
+    conditional UPDATE ... RETURNING. Returns the credits taken, or None if
+    any check failed (the caller reads the user once to say which).
+    """
+    amount = _tier_limit("credits_per_generation")
+    stmt = (
+        update(User)
+        .where(
+            User.id == user_id,
+            User.is_active.is_(True),
+            _tier_limit("max_pages") >= num_pages,
+            User.credits_remaining >= amount,
+        )
+        .values(
+            credits_remaining=User.credits_remaining - amount,
+            total_generations=User.total_generations + 1,
+        )
+        .returning(User.subscription_tier, User.credits_remaining)
+    )
+    with engine.begin() as conn:
+        row = conn.execute(stmt).first()
+
+    if row is None:
+        return None
+    limits = _cache_limits(user_id, row.subscription_tier, row.credits_remaining)
+    return limits["credits_per_generation"]
+
+
+def refund_credits(user_id, amount=1):
+    """Give back credits taken by reserve_credits() for a job that failed."""
+    stmt = (
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            credits_remaining=User.credits_remaining + amount,
+            total_generations=User.total_generations - 1,
+        )
+    )
+    with engine.begin() as conn:
+        conn.execute(stmt)
+
+    user_cache.mark_exhausted(user_id, exhausted=False)
+
+
+class CreditReservation:
+    """
+    Credits held for one generation. The credits are already deducted when
+    this object exists; call refund() if the job fails. Refunding is
+    idempotent, and commit() makes a later refund() a no-op.
+    """
+
+    def __init__(self, user_id, amount):
+        self.user_id = user_id
+        self.amount = amount
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def commit(self):
+        with self._lock:
+            self._settled = True
+
+    def refund(self):
+        with self._lock:
+            if self._settled:
+                return
+            self._settled = True
+        try:
+            refund_credits(self.user_id, self.amount)
+            print(f"↩️ Refunded {self.amount} credit(s) to {self.user_id}")
+        except Exception as e:
+            print(f"⚠️ Could not refund credits for {self.user_id}: {e}")
+
+
+def admit_and_reserve(user_id, num_pages):
+    """
+    Admission check for /generate.
+
+    Rejects from cache (no database round trip) when the user is known to be
+    out of credits or over their tier's page limit; otherwise reserves credits
+    with one conditional UPDATE. On a cache miss the limit checks ride along
+    in that UPDATE, and the user is only read when it is refused.
+    """
+    limits = user_cache.get(user_id)
+    if limits is None and engine.dialect.update_returning:
+        amount = reserve_credits_for_pages(user_id, num_pages)
+        if amount is not None:
+            return CreditReservation(user_id, amount)
+        # Refused: one read to report why (and cache the answer)
+        limits = get_user_limits(user_id)
+        if limits is not None and num_pages <= limits["max_pages"] and not limits["exhausted"]:
+            user_cache.mark_exhausted(user_id)
+            raise InsufficientCredits("No credits remaining")
+    elif limits is None:
+        limits = get_user_limits(user_id)
+
+    if limits is None:
+        raise UserNotFound(f"User not found or inactive: {user_id}")
+
+    if num_pages > limits["max_pages"]:
+        raise PageLimitExceeded(
+            f"{limits['tier']} tier allows at most {limits['max_pages']} pages per generation"
+        )
+
+    if limits["exhausted"]:
+        raise InsufficientCredits("No credits remaining")
+
+    amount = limits["credits_per_generation"]
+    if not reserve_credits(user_id, amount):
+        raise InsufficientCredits("No credits remaining")
+
+    return CreditReservation(user_id, amount)
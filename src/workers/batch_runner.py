@@ -0,0 +1,154 @@
+# src/workers/batch_runner.py
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from src.p01_dummy_pages_generator.Dummy_web_creator import generate_all_pages, load_page_assets
+from src.p02_screenshoter.Screenhoter import capture_pages
+from src.p02_screenshoter.pillow_renderer import render_pages
+from src.p03_video_creator.Video_creator import compile_snapshots_to_video, warm_up_encoder
+from src.p03_video_creator.Image_exporter import export_snapshots, OUTPUT_FILENAMES
+from src.utils.file_utils import (
+    user_dirs, static_url, SHARED_IMAGES_DIR, IMAGE_VARIANTS_DIR, TEMPLATE_FILE, CSS_FILE, SNAP_SOUND_FILE
+)
+from src.utils.cleanup import apply_retention
+from src.utils.pipeline_stubs import stubbed, stub_snapshot_processing
+
+
+# Encodes that may run while the browser captures the next keyword
+BATCH_ENCODE_CONCURRENCY = int(os.getenv("BATCH_ENCODE_CONCURRENCY", "2"))
+
+
+def _encode_item(item, dirs):
+    output_format = item.get("output_format", "mp4")
+    if output_format != "mp4":
+        export_snapshots(
+            snapshot_folder=str(dirs["snapshots"]),
+            output_dir=str(dirs["video"]),
+            output_format=output_format,
+            duration=item["duration_per_snapshot"],
+        )
+    else:
+        compile_snapshots_to_video(
+            snapshot_folder=str(dirs["snapshots"]),
+            output_video=str(dirs["video"] / "final_video.mp4"),
+            snap_sound=str(SNAP_SOUND_FILE),
+            duration=item["duration_per_snapshot"],
+            temp_dir=str(dirs["temp"]),
+            encoder_profile=item.get("encoder_profile", "quality"),
+        )
+    apply_retention(item["user_id"], "video")
+    return static_url(f"users/{item['user_id']}/video/{OUTPUT_FILENAMES[output_format]}")
+
+
+@asynccontextmanager
+async def _batch_browser():
+    """One Chromium for the whole batch (None when capture is stubbed out)."""
+    if stubbed("snapshots"):
+        yield None
+        return
+
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            yield browser
+        finally:
+            await browser.close()
+
+
+async def run_batch(items):
+    """
+    Run many generations as one scheduled unit and yield a result dict for
+    each item as soon as its video is ready (not necessarily in input order).
+
+    All items share the parsed templates/CSS, one Chromium instance and a
+    warmed-up encoder. Capture is sequential on the browser while encodes of
+    finished items run in background threads, so the browser never idles
+    waiting for ffmpeg.
+
+    Each item is a dict with the GenerateRequest fields plus `index` and `user_id`.
+    """
+
+    assets = load_page_assets(TEMPLATE_FILE, CSS_FILE)
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up_encoder))
+    encode_slots = asyncio.Semaphore(max(1, BATCH_ENCODE_CONCURRENCY))
+    pending = set()
+
+    def result(item, status, **fields):
+        return {"index": item["index"], "user_id": item["user_id"],
+                "keyword": item["keyword"], "status": status, **fields}
+
+    async def encode(item, dirs, html_count, snapshot_count):
+        async with encode_slots:
+            await warmup
+            try:
+                video_url = await asyncio.to_thread(_encode_item, item, dirs)
+            except Exception as e:
+                return result(item, "failed", error=f"Video compilation failed: {e}")
+        return result(item, "success", video_url=video_url,
+                      html_count=html_count, snapshot_count=snapshot_count)
+
+    try:
+        async with _batch_browser() as browser:
+            for item in items:
+                dirs = user_dirs(item["user_id"], create=True)
+
+                try:
+                    html_files = await asyncio.to_thread(
+                        generate_all_pages,
+                        keyword=item["keyword"],
+                        num_pages=item["num_pages"],
+                        pages_dir=str(dirs["pages"]),
+                        images_dir=str(dirs["images"]),
+                        shared_image_dir=str(SHARED_IMAGES_DIR),
+                        template_file=str(TEMPLATE_FILE),
+                        css_file=str(CSS_FILE),
+                        use_varied_fonts=item["use_varied_fonts"],
+                        assets=assets,
+                        variants_dir=str(IMAGE_VARIANTS_DIR)
+                    )
+                except Exception as e:
+                    yield result(item, "failed", error=f"HTML generation failed: {e}")
+                    continue
+
+                try:
+                    if browser is None:
+                        # PIPELINE_STUBS=snapshots (load tests); same precedence as /generate
+                        snapshots = await asyncio.to_thread(
+                            stub_snapshot_processing, dirs["pages"], dirs["snapshots"], item["keyword"]
+                        )
+                    elif item.get("renderer") == "pillow":
+                        # No browser needed; draw off the event loop
+                        snapshots = await asyncio.to_thread(
+                            render_pages, dirs["pages"], dirs["snapshots"], item["keyword"]
+                        )
+                    else:
+                        snapshots = await capture_pages(browser, dirs["pages"], dirs["snapshots"], item["keyword"],
+                                                        capture_mode=item.get("capture_mode"))
+                except Exception as e:
+                    yield result(item, "failed", error=f"Snapshot processing failed: {e}")
+                    continue
+
+                if not snapshots:
+                    yield result(item, "failed", error="No snapshots captured")
+                    continue
+
+                apply_retention(item["user_id"], "snapshots")
+
+                pending.add(asyncio.create_task(encode(item, dirs, len(html_files), len(snapshots))))
+
+                # Stream out whatever finished encoding while we were capturing
+                for task in [t for t in pending if t.done()]:
+                    pending.discard(task)
+                    yield task.result()
+
+        for task in asyncio.as_completed(pending):
+            yield await task
+    finally:
+        # Client gone / caller closed us early: don't leave encodes running unowned
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,450 @@
+# src/workers/job_broker.py
+
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from src.utils.file_utils import STORAGE_ROOT
+
+
+JOB_BROKER_URL = os.getenv("JOB_BROKER_URL", f"sqlite:///{STORAGE_ROOT / 'jobs.db'}")
+
+
+# =============================
+# 1. TASK + INTERFACE
+# =============================
+class Task:
+    """One pipeline stage of one job, as handed to a worker."""
+
+    def __init__(self, task_id, job_id, stage, payload, attempts, max_attempts, expired=False):
+        self.task_id = task_id
+        self.job_id = job_id
+        self.stage = stage
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        # Lease ran out on the last attempt: the task is already marked
+        # failed and is handed out once so the job can be settled
+        self.expired = expired
+
+    def __repr__(self):
+        state = " expired" if self.expired else ""
+        return f"Task({self.stage} job={self.job_id} attempt={self.attempts}/{self.max_attempts}{state})"
+
+
+class JobBroker(abc.ABC):
+    """
+    Work queue shared by API and render nodes.
+
+    Tasks are leased, not popped: a worker that dies stops heartbeating,
+    its lease expires and another worker claims the task again. Each claim
+    counts as an attempt; once `max_attempts` is used up the task fails.
+    A task whose lease runs out on its last attempt is returned by claim()
+    once more with `expired=True`, so the claiming worker settles the job
+    (status, refund, progress) exactly like any other final failure.
+
+    Jobs additionally carry a small status record (status, stage, result,
+    error) that the API serves to clients.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, job_id, stage, payload, max_attempts=3, delay=0.0):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def claim(self, stages, worker_id, lease_seconds):
+        """Lease the oldest runnable task for one of `stages` (or hand out an expired one), or return None."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def heartbeat(self, task, worker_id, lease_seconds):
+        """Extend a lease. Returns False if the worker no longer owns the task."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete(self, task, worker_id):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fail(self, task, worker_id, error, retry_delay=5.0):
+        """
+        Release a failed task. Returns True if it will be retried, False if
+        it failed for good, None if the worker no longer owns it.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def claim_refund(self, job_id):
+        """True for the first caller only, so a job's credits are refunded once."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def queue_depth(self):
+        """Number of tasks not yet done or failed (queued, delayed or leased)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_job_status(self, job_id, **fields):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_job_status(self, job_id):
+        raise NotImplementedError
+
+
+# =============================
+# 2. SQLITE BROKER (single host / tests)
+# =============================
+class SQLiteJobBroker(JobBroker):
+
+    def __init__(self, path):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,            -- queued, leased, done, failed
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_tasks_runnable ON tasks (stage, status, available_at);
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS refunds (
+                job_id TEXT PRIMARY KEY,
+                refunded_at REAL NOT NULL
+            );
+        """)
+
+    def enqueue(self, job_id, stage, payload, max_attempts=3, delay=0.0):
+        task_id = str(uuid.uuid4())
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO tasks (id, job_id, stage, payload, status, max_attempts, available_at, created_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (task_id, job_id, stage, json.dumps(payload), max_attempts, now + delay, now)
+        )
+        return task_id
+
+    def claim(self, stages, worker_id, lease_seconds):
+        conn = self._conn()
+        now = time.time()
+        placeholders = ",".join("?" for _ in stages)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT * FROM tasks WHERE stage IN ({placeholders}) AND ("
+                f"  (status = 'queued' AND available_at <= ?) OR"
+                f"  (status = 'leased' AND lease_expires_at < ?)"
+                f") ORDER BY created_at LIMIT 1",
+                (*stages, now, now)
+            ).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            if row["attempts"] >= row["max_attempts"]:
+                # Lease expired on the last attempt: the worker died for good
+                conn.execute(
+                    "UPDATE tasks SET status = 'failed', lease_owner = NULL, "
+                    "error = COALESCE(error, 'lease expired') WHERE id = ?",
+                    (row["id"],)
+                )
+                conn.execute("COMMIT")
+                return Task(row["id"], row["job_id"], row["stage"], json.loads(row["payload"]),
+                            row["attempts"], row["max_attempts"], expired=True)
+
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, "
+                "lease_owner = ?, lease_expires_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return Task(row["id"], row["job_id"], row["stage"], json.loads(row["payload"]),
+                    row["attempts"] + 1, row["max_attempts"])
+
+    def heartbeat(self, task, worker_id, lease_seconds):
+        cur = self._conn().execute(
+            "UPDATE tasks SET lease_expires_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + lease_seconds, task.task_id, worker_id)
+        )
+        return cur.rowcount == 1
+
+    def complete(self, task, worker_id):
+        self._conn().execute(
+            "UPDATE tasks SET status = 'done', lease_owner = NULL WHERE id = ? AND lease_owner = ?",
+            (task.task_id, worker_id)
+        )
+
+    def fail(self, task, worker_id, error, retry_delay=5.0):
+        retry = task.attempts < task.max_attempts
+        cur = self._conn().execute(
+            "UPDATE tasks SET status = ?, lease_owner = NULL, error = ?, available_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            ("queued" if retry else "failed", str(error),
+             time.time() + retry_delay * task.attempts, task.task_id, worker_id)
+        )
+        if cur.rowcount != 1:
+            return None
+        return retry
+
+    def claim_refund(self, job_id):
+        cur = self._conn().execute(
+            "INSERT OR IGNORE INTO refunds (job_id, refunded_at) VALUES (?, ?)",
+            (job_id, time.time())
+        )
+        return cur.rowcount == 1
+
+    def queue_depth(self):
+        row = self._conn().execute("SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'leased')").fetchone()
+        return row[0]
+
+    def set_job_status(self, job_id, **fields):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            data = json.loads(row["data"]) if row else {"job_id": job_id}
+            data.update(fields)
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+                (job_id, json.dumps(data), time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_job_status(self, job_id):
+        row = self._conn().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+
+# =============================
+# 3. REDIS BROKER (multi host)
+# =============================
+class RedisJobBroker(JobBroker):
+    """
+    Works with any Redis-protocol server (Redis, Valkey, KeyDB, Dragonfly).
+
+    Keys (all under `prefix`):
+      queue:<stage>  list of runnable task ids
+      delayed        zset task_id -> available_at (retries with backoff)
+      leases         zset task_id -> lease_expires_at
+      task:<id>      hash with the task record
+      job:<job_id>   hash with the job status record
+      refund:<job_id> set once the job's credits were given back
+
+    Moving a task between the queue, `delayed` and `leases` runs as one Lua
+    script, so a node dying halfway cannot lose the task.
+    """
+
+    # Pop the oldest task of a stage and lease it in the same step
+    _CLAIM_LUA = """
+        local task_id = redis.call('RPOP', KEYS[1])
+        if not task_id then return false end
+        local key = ARGV[3] .. task_id
+        redis.call('ZADD', KEYS[2], ARGV[1], task_id)
+        redis.call('HSET', key, 'status', 'leased', 'lease_owner', ARGV[2])
+        redis.call('HINCRBY', key, 'attempts', 1)
+        return task_id
+    """
+
+    # Take a due task out of `delayed` / `leases` (KEYS[1]) and put it back
+    # on its stage queue, or mark it failed if its last attempt expired
+    _REQUEUE_LUA = """
+        if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then return false end
+        local key = ARGV[2] .. 'task:' .. ARGV[1]
+        local stage = redis.call('HGET', key, 'stage')
+        if not stage then return false end
+        if ARGV[3] == 'lease' then
+            local attempts = tonumber(redis.call('HGET', key, 'attempts') or '0')
+            local max_attempts = tonumber(redis.call('HGET', key, 'max_attempts') or '1')
+            if attempts >= max_attempts then
+                redis.call('HSET', key, 'status', 'failed', 'lease_owner', '', 'error', 'lease expired')
+                return 'failed'
+            end
+            redis.call('HSET', key, 'status', 'queued', 'lease_owner', '')
+            redis.call('RPUSH', ARGV[2] .. 'queue:' .. stage, ARGV[1])
+        else
+            redis.call('LPUSH', ARGV[2] .. 'queue:' .. stage, ARGV[1])
+        end
+        return 'queued'
+    """
+
+    def __init__(self, url, prefix="snapper"):
+        import redis  # optional dependency, only needed for this backend
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._claim_script = self.redis.register_script(self._CLAIM_LUA)
+        self._requeue_script = self.redis.register_script(self._REQUEUE_LUA)
+
+    def _key(self, *parts):
+        return ":".join((self.prefix, *parts))
+
+    def enqueue(self, job_id, stage, payload, max_attempts=3, delay=0.0):
+        task_id = str(uuid.uuid4())
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key("task", task_id), mapping={
+            "job_id": job_id,
+            "stage": stage,
+            "payload": json.dumps(payload),
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts,
+        })
+        if delay > 0:
+            pipe.zadd(self._key("delayed"), {task_id: time.time() + delay})
+        else:
+            pipe.lpush(self._key("queue", stage), task_id)
+        pipe.execute()
+        return task_id
+
+    def _task(self, task_id, expired=False):
+        record = self.redis.hgetall(self._key("task", task_id))
+        return Task(task_id, record["job_id"], record["stage"], json.loads(record["payload"]),
+                    int(record["attempts"]), int(record["max_attempts"]), expired=expired)
+
+    def _requeue_due(self):
+        """Requeue due retries and expired leases; returns a task whose last attempt expired, if any."""
+        now = time.time()
+        prefix = self._key("")
+
+        for task_id in self.redis.zrangebyscore(self._key("delayed"), 0, now):
+            # ZREM inside the script succeeds for exactly one node
+            self._requeue_script(keys=[self._key("delayed")], args=[task_id, prefix, "delayed"])
+
+        for task_id in self.redis.zrangebyscore(self._key("leases"), 0, now):
+            outcome = self._requeue_script(keys=[self._key("leases")], args=[task_id, prefix, "lease"])
+            if outcome == "failed":
+                # Handed out once; the rest are picked up by the next claims
+                return self._task(task_id, expired=True)
+        return None
+
+    def claim(self, stages, worker_id, lease_seconds):
+        expired = self._requeue_due()
+        if expired is not None:
+            return expired
+
+        for stage in stages:
+            task_id = self._claim_script(
+                keys=[self._key("queue", stage), self._key("leases")],
+                args=[time.time() + lease_seconds, worker_id, self._key("task", "")]
+            )
+            if task_id is not None:
+                return self._task(task_id)
+        return None
+
+    def _owns(self, task, worker_id):
+        return self.redis.hget(self._key("task", task.task_id), "lease_owner") == worker_id
+
+    def heartbeat(self, task, worker_id, lease_seconds):
+        if not self._owns(task, worker_id):
+            return False
+        self.redis.zadd(self._key("leases"), {task.task_id: time.time() + lease_seconds}, xx=True)
+        return True
+
+    def complete(self, task, worker_id):
+        if not self._owns(task, worker_id):
+            return
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._key("leases"), task.task_id)
+        pipe.hset(self._key("task", task.task_id), mapping={"status": "done", "lease_owner": ""})
+        pipe.expire(self._key("task", task.task_id), 86400)
+        pipe.execute()
+
+    def fail(self, task, worker_id, error, retry_delay=5.0):
+        if not self._owns(task, worker_id):
+            return None
+        retry = task.attempts < task.max_attempts
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._key("leases"), task.task_id)
+        pipe.hset(self._key("task", task.task_id), mapping={
+            "status": "queued" if retry else "failed", "lease_owner": "", "error": str(error)
+        })
+        if retry:
+            pipe.zadd(self._key("delayed"), {task.task_id: time.time() + retry_delay * task.attempts})
+        pipe.execute()
+        return retry
+
+    def queue_depth(self):
+        queued = sum(self.redis.llen(key) for key in self.redis.scan_iter(match=self._key("queue", "*")))
+        return queued + self.redis.zcard(self._key("delayed")) + self.redis.zcard(self._key("leases"))
+
+    def claim_refund(self, job_id):
+        return bool(self.redis.set(self._key("refund", job_id), 1, nx=True, ex=7 * 86400))
+
+    def set_job_status(self, job_id, **fields):
+        self.redis.hset(self._key("job", job_id), mapping={k: json.dumps(v) for k, v in fields.items()})
+        self.redis.expire(self._key("job", job_id), 86400)
+
+    def get_job_status(self, job_id):
+        record = self.redis.hgetall(self._key("job", job_id))
+        if not record:
+            return None
+        return {"job_id": job_id, **{k: json.loads(v) for k, v in record.items()}}
+
+
+# =============================
+# 4. FACTORY
+# =============================
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def create_broker(url):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobBroker(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteJobBroker(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported JOB_BROKER_URL: {url}")
+
+
+def get_broker():
+    """Process-wide broker for JOB_BROKER_URL, created on first use."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = create_broker(JOB_BROKER_URL)
+        return _broker
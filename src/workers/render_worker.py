@@ -0,0 +1,395 @@
+# src/workers/render_worker.py
+
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+
+from src.p01_dummy_pages_generator.Dummy_web_creator import generate_all_pages
+from src.p02_screenshoter.Screenhoter import run_snapshot_processing_sync
+from src.p03_video_creator.Video_creator import compile_snapshots_to_video
+from src.p03_video_creator.Hls_creator import HlsSegmentWriter
+from src.p03_video_creator.Image_exporter import export_snapshots, OUTPUT_FILENAMES
+from src.utils.file_utils import (
+    user_dirs, static_url, SHARED_IMAGES_DIR, IMAGE_VARIANTS_DIR, TEMPLATE_FILE, CSS_FILE, SNAP_SOUND_FILE
+)
+from src.utils.checkpoint import JobCheckpoint, find_interrupted_jobs, claim_for_resume
+from src.utils.cleanup import apply_retention
+from src.utils.profiling import JobProfiler
+from src.utils.progress import JobProgress
+from src.workers.job_broker import get_broker
+
+from database import generation_log_writer, log_generation
+from src.utils.user_manager import refund_credits
+
+
+LEASE_SECONDS = float(os.getenv("WORKER_LEASE_SECONDS", "60"))
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+RETRY_DELAY = float(os.getenv("WORKER_RETRY_DELAY", "5.0"))
+
+STAGES = ("pages", "snapshots", "video")
+NEXT_STAGE = {"pages": "snapshots", "snapshots": "video", "video": None}
+
+
+# =============================
+# 1. STAGE HANDLERS
+# =============================
+# Each handler gets the job payload and returns a dict that is merged into
+# the payload for the next stage and into the job's public result.
+
+def _profiler(payload, dirs):
+    # Stages may land on different workers; each adds to the same bundle
+    return JobProfiler(dirs["root"]) if payload.get("profile") else None
+
+
+def _checkpoint(payload, stage):
+    # Outputs finished by an earlier attempt (or a crashed /generate) are kept
+    checkpoint = JobCheckpoint(payload["user_id"])
+    checkpoint.start(payload, stage, via="broker")
+    return checkpoint
+
+
+def run_pages_stage(payload):
+    dirs = user_dirs(payload["user_id"], create=True)
+    profiler = _profiler(payload, dirs)
+    checkpoint = _checkpoint(payload, "pages")
+    page_args = dict(
+        keyword=payload["keyword"],
+        num_pages=payload["num_pages"],
+        pages_dir=str(dirs["pages"]),
+        images_dir=str(dirs["images"]),
+        shared_image_dir=str(SHARED_IMAGES_DIR),
+        template_file=str(TEMPLATE_FILE),
+        css_file=str(CSS_FILE),
+        use_varied_fonts=payload["use_varied_fonts"],
+        variants_dir=str(IMAGE_VARIANTS_DIR),
+        checkpoint=checkpoint
+    )
+    try:
+        if profiler:
+            html_files = profiler.profile_call("pages", generate_all_pages, **page_args)
+        else:
+            html_files = generate_all_pages(**page_args)
+    finally:
+        checkpoint.flush()
+        if profiler:
+            profiler.bundle()
+    return {"html_count": len(html_files)}
+
+
+def run_snapshots_stage(payload):
+    dirs = user_dirs(payload["user_id"], create=True)
+    profiler = _profiler(payload, dirs)
+    checkpoint = _checkpoint(payload, "snapshots")
+    progress = JobProgress(payload["user_id"])
+
+    hls_writer = None
+    if payload.get("output_mode") == "hls":
+        # Encode while capturing; the playlist fills up as pages render
+        hls_writer = HlsSegmentWriter(
+            video_dir=dirs["video"],
+            snap_sound=SNAP_SOUND_FILE,
+            duration=payload["duration_per_snapshot"],
+            temp_dir=dirs["temp"],
+            encoder_profile=payload.get("encoder_profile", "quality"),
+            profiler=profiler,
+            on_segment=progress.segment,
+        )
+
+    def on_snapshot(path):
+        progress.snapshot(path, total=payload.get("html_count"))
+        if hls_writer:
+            hls_writer.add_frame(path)
+
+    try:
+        try:
+            snapshot_results = run_snapshot_processing_sync(
+                pages_dir=str(dirs["pages"]),
+                output_dir=str(dirs["snapshots"]),
+                keyword=payload["keyword"],
+                on_snapshot=on_snapshot,
+                profiler=profiler,
+                capture_mode=payload.get("capture_mode"),
+                renderer=payload.get("renderer"),
+                checkpoint=checkpoint
+            )
+        except Exception:
+            if hls_writer:
+                hls_writer.abort()
+            raise
+
+        if not snapshot_results:
+            if hls_writer:
+                hls_writer.abort()
+            raise RuntimeError("No snapshots captured")
+
+        result = {"snapshot_count": len(snapshot_results)}
+        if hls_writer:
+            hls_writer.finish(str(dirs["video"] / "final_video.mp4"))
+            result["video_encoded"] = True
+        return result
+    finally:
+        checkpoint.flush()
+        if profiler:
+            profiler.bundle()
+
+
+def run_video_stage(payload):
+    user_id = payload["user_id"]
+    dirs = user_dirs(user_id, create=True)
+    if payload.get("video_encoded"):
+        # Already produced progressively by the snapshots stage (HLS mode)
+        return {"video_url": static_url(f"users/{user_id}/video/final_video.mp4")}
+
+    profiler = _profiler(payload, dirs)
+    checkpoint = _checkpoint(payload, "video")
+    output_format = payload.get("output_format", "mp4")
+    try:
+        if output_format != "mp4":
+            export_args = dict(
+                snapshot_folder=str(dirs["snapshots"]),
+                output_dir=str(dirs["video"]),
+                output_format=output_format,
+                duration=payload["duration_per_snapshot"],
+            )
+            if profiler:
+                profiler.profile_call("export", export_snapshots, **export_args)
+            else:
+                export_snapshots(**export_args)
+            return {"video_url": static_url(f"users/{user_id}/video/{OUTPUT_FILENAMES[output_format]}")}
+
+        compile_snapshots_to_video(
+            snapshot_folder=str(dirs["snapshots"]),
+            output_video=str(dirs["video"] / "final_video.mp4"),
+            snap_sound=str(SNAP_SOUND_FILE),
+            duration=payload["duration_per_snapshot"],
+            temp_dir=str(dirs["temp"]),
+            encoder_profile=payload.get("encoder_profile", "quality"),
+            profiler=profiler,
+            checkpoint=checkpoint,
+            on_segment=JobProgress(user_id).segment,
+        )
+        return {"video_url": static_url(f"users/{user_id}/video/final_video.mp4")}
+    finally:
+        # Also on failure, so a failed stage's progress and profile are kept
+        checkpoint.flush()
+        if profiler:
+            profiler.bundle()
+
+
+STAGE_HANDLERS = {
+    "pages": run_pages_stage,
+    "snapshots": run_snapshots_stage,
+    "video": run_video_stage,
+}
+
+
+# =============================
+# 2. WORKER
+# =============================
+class RenderWorker:
+    """
+    Pulls pipeline stages from the broker and runs them.
+
+    A worker can serve any subset of STAGES, so browser-heavy (snapshots)
+    and encoder-heavy (video) nodes can be scaled separately. While a stage
+    runs, a heartbeat thread keeps its lease alive.
+    """
+
+    def __init__(self, broker=None, stages=STAGES, worker_id=None,
+                 lease_seconds=LEASE_SECONDS, poll_interval=POLL_INTERVAL):
+        self.broker = broker or get_broker()
+        self.stages = tuple(stages)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+    def _heartbeat_loop(self, task, done):
+        while not done.wait(self.lease_seconds / 3):
+            if not self.broker.heartbeat(task, self.worker_id, self.lease_seconds):
+                print(f"⚠️ [{self.worker_id}] Lost lease on {task}")
+                return
+
+    def _still_owns(self, task):
+        # The lease may have expired mid-stage and the task been claimed by
+        # another worker; its result must then be dropped, not acted on
+        if self.broker.heartbeat(task, self.worker_id, self.lease_seconds):
+            return True
+        print(f"⚠️ [{self.worker_id}] Lease on {task} was lost; dropping its result")
+        return False
+
+    def run_once(self):
+        """Run at most one task. Returns False if there was nothing to do."""
+        task = self.broker.claim(self.stages, self.worker_id, self.lease_seconds)
+        if task is None:
+            return False
+        if task.expired:
+            # Its worker died on the last attempt; settle the job here
+            print(f"💀 [{self.worker_id}] {task} lease expired on the last attempt")
+            self._finish_failed(task, "lease expired")
+            return True
+
+        print(f"🔧 [{self.worker_id}] Running {task}")
+        self.broker.set_job_status(task.job_id, status="running", stage=task.stage)
+        progress = JobProgress(task.job_id)
+        progress.stage(task.stage)
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(task, done), daemon=True)
+        heartbeat.start()
+
+        try:
+            result = STAGE_HANDLERS[task.stage](task.payload)
+            apply_retention(task.payload["user_id"], task.stage)
+        except Exception as e:
+            done.set()
+            heartbeat.join()
+            print(f"❌ [{self.worker_id}] {task} failed: {e}")
+            if not self._still_owns(task):
+                return True
+            retry = self.broker.fail(task, self.worker_id, e, retry_delay=RETRY_DELAY)
+            if retry is None:
+                print(f"⚠️ [{self.worker_id}] Lease on {task} was lost; dropping its failure")
+            elif retry:
+                self.broker.set_job_status(task.job_id, status="retrying", stage=task.stage, error=str(e))
+                progress.stage(task.stage, status="retrying", error=str(e))
+            else:
+                self._finish_failed(task, e)
+            return True
+
+        done.set()
+        heartbeat.join()
+        if not self._still_owns(task):
+            return True
+
+        payload = {**task.payload, **result}
+        next_stage = NEXT_STAGE[task.stage]
+        if next_stage:
+            self.broker.enqueue(task.job_id, next_stage, payload, max_attempts=task.max_attempts)
+            self.broker.set_job_status(task.job_id, status="queued", stage=next_stage, result=result)
+            progress.stage(next_stage, status="queued", **result)
+        else:
+            self._finish_success(task, payload)
+        self.broker.complete(task, self.worker_id)
+        return True
+
+    def _finish_success(self, task, payload):
+        result = {k: payload[k] for k in ("html_count", "snapshot_count", "video_url") if k in payload}
+        if payload.get("profile"):
+            result["profile_url"] = f"/profile/{payload['user_id']}"
+        self.broker.set_job_status(task.job_id, status="success", stage=task.stage, result=result, error=None)
+        JobCheckpoint(payload["user_id"]).finish("success")
+        JobProgress(task.job_id).complete(**result)
+        log_generation(user_id=payload.get("account_id") or payload["user_id"], keyword=payload["keyword"],
+                       status="success", num_pages=payload["num_pages"],
+                       duration=payload["duration_per_snapshot"], video_url=payload.get("video_url"),
+                       credits_used=payload.get("credits_reserved", 0))
+        print(f"🎉 [{self.worker_id}] Job {task.job_id} complete")
+
+    def _finish_failed(self, task, error):
+        payload = task.payload
+        self.broker.set_job_status(task.job_id, status="failed", stage=task.stage, error=str(error))
+        JobCheckpoint(payload["user_id"]).finish("failed")
+        JobProgress(task.job_id).failed(error)
+        # A job can reach here from its own failure and from an expired lease
+        if (payload.get("account_id") and payload.get("credits_reserved")
+                and self.broker.claim_refund(task.job_id)):
+            try:
+                refund_credits(payload["account_id"], payload["credits_reserved"])
+            except Exception as e:
+                print(f"⚠️ Could not refund credits for {payload['account_id']}: {e}")
+        log_generation(user_id=payload.get("account_id") or payload["user_id"], keyword=payload["keyword"],
+                       status="failed", num_pages=payload["num_pages"],
+                       duration=payload["duration_per_snapshot"], credits_used=0)
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        print(f"👷 Render worker {self.worker_id} serving stages: {', '.join(self.stages)}")
+        while not stop_event.is_set():
+            try:
+                if not self.run_once():
+                    stop_event.wait(self.poll_interval)
+            except Exception as e:
+                # Broker hiccup: back off instead of spinning
+                print(f"⚠️ [{self.worker_id}] Worker loop error: {e}")
+                stop_event.wait(self.poll_interval * 5)
+
+
+def start_worker_threads(count, stages=STAGES, stop_event=None):
+    """Start `count` in-process workers (used by the API for single-host setups)."""
+    stop_event = stop_event or threading.Event()
+    threads = []
+    for i in range(count):
+        worker = RenderWorker(stages=stages)
+        t = threading.Thread(target=worker.run_forever, args=(stop_event,),
+                             name=f"render-worker-{i}", daemon=True)
+        t.start()
+        threads.append(t)
+    return stop_event, threads
+
+
+def resume_interrupted_jobs(broker=None):
+    """
+    Re-queue /generate jobs that a crash or restart cut off. Each resumes at
+    the stage it was in; pages, snapshots and segments that were already
+    finished (and still pass their checksum) are skipped. The reserved
+    credits travel in the payload, so a final failure is still refunded.
+    """
+    broker = broker or get_broker()
+    resumed = []
+    for state in find_interrupted_jobs():
+        job_id = state["job_id"]
+        checkpoint = claim_for_resume(job_id)
+        if checkpoint is None:
+            continue
+
+        payload = checkpoint.state["request"]
+        stage = checkpoint.state.get("stage") or "pages"
+        if stage == "video" and payload.get("output_mode") == "hls":
+            # The playlist is written while capturing; rebuild it from there
+            stage = "snapshots"
+
+        try:
+            broker.set_job_status(job_id, status="queued", stage=stage, keyword=payload["keyword"], resumed=True)
+            broker.enqueue(job_id, stage, payload)
+        except Exception as e:
+            # Leave it for the next restart
+            print(f"⚠️ Could not resume job {job_id}: {e}")
+            checkpoint.state["via"] = "generate"
+            checkpoint.finish("running")
+            continue
+
+        resumed.append(job_id)
+        print(f"♻️ Resumed job {job_id} at stage '{stage}'")
+    return resumed
+
+
+# =============================
+# 3. CLI
+# =============================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run render workers against JOB_BROKER_URL")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="Comma-separated stages to serve (pages,snapshots,video)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Worker threads in this process")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    generation_log_writer.start()
+    stop_event, threads = start_worker_threads(args.concurrency, stages=stages)
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("🛑 Stopping render workers")
+        stop_event.set()
+        for t in threads:
+            t.join()
+    finally:
+        generation_log_writer.stop()
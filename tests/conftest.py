@@ -0,0 +1,8 @@
+# tests/conftest.py
+
+import sys
+from pathlib import Path
+
+# The app is run from the repository root (`python main.py`), so imports
+# are rooted there: `from src.workers.job_broker import ...`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,30 @@
+# tests/test_generation_log_writer.py
+
+from database import GenerationLogWriter
+
+
+def log_rows(writer, count):
+    for i in range(count):
+        writer.log(user_id=f"user-{i}", keyword="cats", status="success")
+
+
+def test_full_queue_drops_rows_without_blocking():
+    writer = GenerationLogWriter(max_queue_size=2)  # not started: nothing drains
+    log_rows(writer, 5)
+
+    assert writer.dropped == 3
+    assert writer._queue.qsize() == 2
+
+
+def test_stop_flushes_everything_queued_in_batches():
+    batches = []
+    writer = GenerationLogWriter(flush_size=2, flush_interval=0.1)
+    writer._flush = lambda rows: batches.append(list(rows)) if rows else None
+
+    log_rows(writer, 5)
+    writer.start()
+    writer.stop()
+
+    assert all(1 <= len(batch) <= 2 for batch in batches)
+    assert [row["user_id"] for batch in batches for row in batch] == [f"user-{i}" for i in range(5)]
+    assert writer.dropped == 0
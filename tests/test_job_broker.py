@@ -0,0 +1,59 @@
+# tests/test_job_broker.py
+
+import time
+
+import pytest
+
+from src.workers.job_broker import SQLiteJobBroker
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return SQLiteJobBroker(tmp_path / "jobs.db")
+
+
+def _expire_leases(broker):
+    broker._conn().execute("UPDATE tasks SET lease_expires_at = ?", (time.time() - 1,))
+
+
+def test_failed_task_is_retried_until_attempts_run_out(broker):
+    broker.enqueue("job-1", "pages", {"n": 1}, max_attempts=2)
+
+    task = broker.claim(["pages"], "w1", lease_seconds=60)
+    assert task.attempts == 1
+    assert broker.fail(task, "w1", "boom", retry_delay=0) is True
+
+    task = broker.claim(["pages"], "w1", lease_seconds=60)
+    assert task.attempts == 2
+    assert broker.fail(task, "w1", "boom", retry_delay=0) is False
+    assert broker.claim(["pages"], "w1", lease_seconds=60) is None
+
+
+def test_fail_by_a_worker_that_lost_the_lease_is_ignored(broker):
+    broker.enqueue("job-1", "pages", {}, max_attempts=3)
+    task = broker.claim(["pages"], "w1", lease_seconds=60)
+
+    _expire_leases(broker)
+    reclaimed = broker.claim(["pages"], "w2", lease_seconds=60)
+    assert reclaimed.task_id == task.task_id and reclaimed.attempts == 2
+
+    assert broker.fail(task, "w1", "late failure") is None
+    assert broker.heartbeat(reclaimed, "w2", lease_seconds=60)
+
+
+def test_lease_expiring_on_last_attempt_is_handed_out_once(broker):
+    broker.enqueue("job-1", "snapshots", {"credits_reserved": 2}, max_attempts=1)
+    broker.claim(["snapshots"], "w1", lease_seconds=60)
+
+    _expire_leases(broker)
+    expired = broker.claim(["snapshots"], "w2", lease_seconds=60)
+    assert expired.expired and expired.job_id == "job-1"
+    assert expired.payload == {"credits_reserved": 2}
+    assert broker.claim(["snapshots"], "w2", lease_seconds=60) is None
+    assert broker.queue_depth() == 0
+
+
+def test_refund_is_claimed_once_per_job(broker):
+    assert broker.claim_refund("job-1") is True
+    assert broker.claim_refund("job-1") is False
+    assert broker.claim_refund("job-2") is True
@@ -0,0 +1,95 @@
+# tests/test_pillow_renderer.py
+
+import argparse
+import asyncio
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from src.p02_screenshoter import pillow_renderer
+from src.p02_screenshoter.pillow_renderer import FONT_DIR, frame_similarity, render_pages
+
+FIXTURES = Path(__file__).parent / "fixtures" / "renderer"
+PAGES_DIR = FIXTURES / "pages"
+KEYWORD = "coffee"
+REFERENCE = FIXTURES / "reference" / "page_1_coffee.png"
+
+# Pillow frame vs. the checked-in Chromium frame of the same page: the
+# bundled fonts score ~0.99 SSIM / 0.015 MAE, DejaVu in their place ~0.82 /
+# 0.07, so a wrong font, cascade or highlight position fails this.
+SSIM_THRESHOLD = 0.95
+MAE_THRESHOLD = 0.04
+
+
+def test_matches_playwright_reference(tmp_path):
+    frames = render_pages(PAGES_DIR, tmp_path, KEYWORD)
+    assert [Path(p).name for p in frames] == [REFERENCE.name]
+
+    score = frame_similarity(REFERENCE, frames[0])
+    assert score["ssim"] >= SSIM_THRESHOLD, score
+    assert score["mae"] <= MAE_THRESHOLD, score
+
+
+def test_missing_bundled_font_fails_loudly(tmp_path, monkeypatch):
+    monkeypatch.setattr(pillow_renderer, "FONT_DIR", tmp_path)
+    monkeypatch.setattr(pillow_renderer, "SYSTEM_FONT_DIRS", ())
+    pillow_renderer._font_index.cache_clear()
+    pillow_renderer.load_font.cache_clear()
+    try:
+        with pytest.raises(RuntimeError, match="poppins"):
+            render_pages(PAGES_DIR, tmp_path / "out", KEYWORD)
+        assert not (tmp_path / "out").exists()
+    finally:
+        pillow_renderer._font_index.cache_clear()
+        pillow_renderer.load_font.cache_clear()
+
+
+# -------------------------------------------------
+# Re-capture the reference (needs Playwright + Chromium):
+#   PYTHONPATH=. python tests/test_pillow_renderer.py [--chromium /path/to/chrome]
+# -------------------------------------------------
+def _font_face_css():
+    """@font-face rules for the bundled files, so Chromium uses the same fonts offline"""
+    rules = []
+    for path in sorted(FONT_DIR.rglob("*.ttf")):
+        stem = path.stem
+        family = {"poppins": "Poppins", "merriweather": "Merriweather", "inter": "Inter",
+                  "open-sans": "Open Sans"}[path.parent.name]
+        italic = "Italic" in stem
+        if "[" in stem:
+            weight = "300 900" if family == "Merriweather" else "100 900" if family == "Inter" else "300 800"
+        else:
+            name = stem.split("-", 1)[1].replace("Italic", "") or "Regular"
+            weight = {v: k for k, v in pillow_renderer.WEIGHT_NAMES.items()}[name]
+        rules.append(f"@font-face {{ font-family: '{family}'; font-style: {'italic' if italic else 'normal'}; "
+                     f"font-weight: {weight}; src: url('{path.resolve().as_uri()}'); }}")
+    return "\n".join(rules)
+
+
+async def _capture_reference(chromium=None):
+    from playwright.async_api import async_playwright
+    from src.p02_screenshoter.Screenhoter import process_page, DEVICE_SCALE_FACTOR
+
+    css = _font_face_css()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, executable_path=chromium)
+        try:
+            context = await browser.new_context(viewport={"width": 1680, "height": 3200},
+                                                device_scale_factor=DEVICE_SCALE_FACTOR)
+            await context.route("https://fonts.googleapis.com/**",
+                                lambda route: route.fulfill(content_type="text/css", body=css))
+            page = await context.new_page()
+            saved = await process_page(page, PAGES_DIR / "page_1.html", KEYWORD, REFERENCE.parent, "css")
+            await context.close()
+        finally:
+            await browser.close()
+    return saved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-capture the Playwright reference frame")
+    parser.add_argument("--chromium", help="Chromium/Chrome executable (default: Playwright's own)")
+    args = parser.parse_args()
+    print(f"✅ Reference → {asyncio.run(_capture_reference(args.chromium))}")
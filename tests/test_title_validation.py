@@ -0,0 +1,59 @@
+# tests/test_title_validation.py
+
+import html
+import random
+import re
+
+import pytest
+
+from src.p01_dummy_pages_generator.Dummy_web_creator import (
+    build_dummy_html, generate_valid_title, new_title_stats, title_matches_keyword
+)
+
+
+@pytest.fixture(autouse=True)
+def seeded_random():
+    random.seed(1234)
+
+
+def rendered_h1(page):
+    """<h1> text as the browser's textContent sees it"""
+    return html.unescape(re.search(r"<h1>(.*?)</h1>", page).group(1))
+
+
+@pytest.mark.parametrize("keyword", ["AT&T", "<script>", "Tom & Jerry's \"Best\"", "5 > 3 & 2 < 4"])
+def test_html_special_keyword_matches_rendered_h1(keyword):
+    stats = new_title_stats()
+    title = generate_valid_title(keyword, 1, ["Why {keyword} matters", "Nothing to see"], ["Part #{}"], stats)
+    assert title_matches_keyword(title, keyword)
+
+    page = build_dummy_html(title, keyword, "", "missing-dir", ["Lorem.", "Ipsum.", "Dolor.", "Sit amet."], "", image_files=[])
+    h1 = rendered_h1(page)
+    assert h1 == title
+    assert keyword.lower() in h1.lower()
+    assert "<script>" not in page.split("<h1>")[1].split("</h1>")[0]
+
+
+def test_keyword_match_is_case_insensitive_and_rejects_blank():
+    assert title_matches_keyword("The CAFÉ & Bar guide", "café & bar")
+    assert not title_matches_keyword("The cafe guide", "café")
+    assert not title_matches_keyword("Anything", "")
+
+
+def test_falls_back_to_keyword_first_title():
+    stats = new_title_stats()
+    title = generate_valid_title("kittens", 7, ["No match here"], ["Page #{}"], stats, max_attempts=3)
+
+    assert title == "kittens — Page #7"
+    assert stats["fallbacks"] == 1
+    assert stats["attempts"] == 3
+    assert stats["per_template"]["No match here"] == {"attempts": 3, "matches": 0}
+
+
+def test_fallback_survives_stray_braces():
+    stats = new_title_stats()
+    title = generate_valid_title("a {b}", 2, ["{oops}"], ["#{broken"], stats, max_attempts=2)
+
+    assert title == "a {b}"
+    assert title_matches_keyword(title, "a {b}")
+    assert stats["fallbacks"] == 1